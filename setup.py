@@ -7,7 +7,12 @@ setup(
         "Extension of django-guardian to allow "
         "delegate permission checking to owner model."
     ),
-    packages=["smart_security"],
+    packages=[
+        "smart_security",
+        "smart_security.management",
+        "smart_security.management.commands",
+        "smart_security.templatetags",
+    ],
     python_requires=">=3.6",
     author="Piotr Domański",
     author_email="piotrjerzydomanski@gmail.com",
@@ -18,6 +23,8 @@ setup(
         "Framework :: Django :: 3.0",
         "Framework :: Django :: 3.1",
         "Framework :: Django :: 3.2",
+        "Framework :: Django :: 4.1",
+        "Framework :: Django :: 4.2",
         "Programming Language :: Python",
         "Topic :: Security",
         "Programming Language :: Python :: 3",
@@ -0,0 +1,26 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class SmartSecurityConfig(AppConfig):
+    name = "smart_security"
+    verbose_name = "Smart Security"
+
+    def ready(self):
+        from smart_security import signals  # noqa: F401
+        from smart_security.constants import SMART_SECURITY_WARM_UP_SETTING
+        from smart_security.manifest import load_configured_manifest
+        from smart_security.options import validate_model_options
+        from smart_security.registry import owner_path_registry
+        from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+        from smart_security.warmup import warm_up
+
+        security_model_classes = (
+            SmartSecurityObjectPermissionBackend._get_security_model_classes()
+        )
+        validate_model_options(security_model_classes)
+        if not load_configured_manifest(security_model_classes):
+            owner_path_registry.build(security_model_classes)
+        if getattr(settings, SMART_SECURITY_WARM_UP_SETTING, False):
+            # Connections are closed, so they aren't shared with forked workers.
+            warm_up(close_connections=True)
@@ -0,0 +1,258 @@
+import csv
+import json
+from itertools import islice
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    Type,
+)
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db.models import Max, Min, Model
+from django.db.models.constants import LOOKUP_SEP
+from guardian.ctypes import get_content_type
+
+from smart_security.fields import get_materialized_owner_field
+from smart_security.permission_models import (
+    filter_object_permissions,
+    get_object_field,
+    get_permissions_models,
+)
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+AUDIT_FORMATS = ("csv", "jsonl")
+PK_RANGE = Tuple[int, int]
+
+
+class AccessRecord(NamedTuple):
+    """
+    A user who has the permission for the object, directly, through a group
+    or as a superuser, who has all permissions for all objects.
+    """
+
+    object_pk: Any
+    owner_pk: Any
+    user_pk: Any
+    username: str
+    group: Optional[str]
+    is_superuser: bool = False
+
+
+def iter_effective_access(
+    model_class: Type[Model],
+    perm: str,
+    chunk_size: int = 1000,
+    pk_range: Optional[PK_RANGE] = None,
+    include_superusers: bool = True,
+) -> Iterator[AccessRecord]:
+    """
+    Streams users who have the object permission for objects of the model.
+    Objects are read in chunks joined to their owners by the path,
+    and grants of owners in the chunk are loaded with a few queries,
+    so memory is bounded by the chunk size. Inactive users aren't listed.
+    @param model_class: a model to audit
+    @param perm: a permission of the model, e.g. "view_samplemodel"
+    @param chunk_size: number of objects processed at once
+    @param pk_range: inclusive range of primary keys to audit, all objects by default
+    @param include_superusers: whether to list active superusers for every object
+    @return: access records ordered by object's primary key
+    """
+    backend = SmartSecurityObjectPermissionBackend
+    codename = backend._get_permission_codename(perm).split(".", maxsplit=1)[-1]
+    owner_model_class = model_class
+    owner_lookup = "pk"
+    security_model_class = backend._get_owner_model_class(model_class)
+    if security_model_class is not None:
+        owner_perm = backend._get_owner_perm(
+            model_class=model_class,
+            perm=codename,
+            security_model_class=security_model_class,
+        )
+        if owner_perm is not None:
+            owner_model_class = security_model_class
+            codename = owner_perm
+            owner_lookup = _get_owner_lookup(model_class, security_model_class)
+
+    permission = (
+        Permission.objects.filter(
+            content_type=get_content_type(owner_model_class), codename=codename
+        )
+        .select_related("content_type")
+        .first()
+    )
+    if permission is None:
+        return
+    superusers = _get_superusers() if include_superusers else []
+
+    queryset = model_class._base_manager.order_by("pk")
+    if pk_range is not None:
+        queryset = queryset.filter(pk__gte=pk_range[0], pk__lte=pk_range[1])
+    objects_and_owners = queryset.values_list("pk", owner_lookup).iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(objects_and_owners, chunk_size))
+        if not chunk:
+            return
+        grants = _get_grants(permission, {str(owner_pk) for _, owner_pk in chunk})
+        for object_pk, owner_pk in chunk:
+            for user_pk, username, group in grants.get(str(owner_pk), []):
+                yield AccessRecord(object_pk, owner_pk, user_pk, username, group)
+            for user_pk, username in superusers:
+                yield AccessRecord(object_pk, owner_pk, user_pk, username, None, True)
+
+
+def get_pk_ranges(model_class: Type[Model], count: int) -> List[PK_RANGE]:
+    """
+    Splits primary keys of the model into ranges of equal width,
+    e.g. to audit them in separate processes.
+    @param model_class: a model with integer primary key
+    @param count: number of ranges
+    @return: inclusive ranges of primary keys
+    """
+    bounds = model_class._base_manager.aggregate(min_pk=Min("pk"), max_pk=Max("pk"))
+    min_pk, max_pk = bounds["min_pk"], bounds["max_pk"]
+    if min_pk is None:
+        return []
+    if not isinstance(min_pk, int):
+        raise ValueError(
+            f"Primary key of {model_class._meta.label} must be an integer "
+            f"to split it into ranges!"
+        )
+    step = max(1, -(-(max_pk - min_pk + 1) // count))
+    return [
+        (start, min(start + step - 1, max_pk))
+        for start in range(min_pk, max_pk + 1, step)
+    ]
+
+
+def write_access_records(
+    records: Iterable[AccessRecord],
+    output: TextIO,
+    format_name: str,
+    header: bool = True,
+) -> int:
+    """
+    @param records: access records to write
+    @param output: a text stream to write to
+    @param format_name: one of AUDIT_FORMATS
+    @param header: whether to write names of columns of CSV
+    @return: number of written records
+    """
+    if format_name not in AUDIT_FORMATS:
+        raise ValueError(
+            f"Format must be one of {AUDIT_FORMATS}, current is '{format_name}'!"
+        )
+    written = 0
+    if format_name == "csv":
+        writer = csv.writer(output)
+        if header:
+            writer.writerow(AccessRecord._fields)
+        for record in records:
+            writer.writerow(record)
+            written += 1
+    else:
+        for record in records:
+            output.write(json.dumps(record._asdict(), default=str) + "\n")
+            written += 1
+    return written
+
+
+def _get_owner_lookup(
+    model_class: Type[Model], security_model_class: Type[Model]
+) -> str:
+    field = get_materialized_owner_field(
+        model_class=model_class, security_model_class=security_model_class
+    )
+    if field is not None and not field.null:
+        return field.attname
+    accessors = SmartSecurityObjectPermissionBackend._find_shortest_accessor(
+        model_class=model_class, security_model_class=security_model_class
+    )
+    return LOOKUP_SEP.join(accessors)
+
+
+def _get_superusers() -> List[Tuple[Any, str]]:
+    user_model = get_user_model()
+    return list(
+        user_model._default_manager.filter(is_active=True, is_superuser=True)
+        .order_by("pk")
+        .values_list("pk", user_model.USERNAME_FIELD)
+    )
+
+
+GRANTS_DICT = Dict[str, List[Tuple[Any, str, Optional[str]]]]
+
+
+def _get_grants(permission: Permission, owner_pks: Iterable[str]) -> GRANTS_DICT:
+    """
+    Loads users who have the permission for the owners,
+    expanding grants of groups into their members.
+    Superusers are listed separately, so their grants are skipped.
+    @return: a mapping from owner's primary key to user's primary key,
+    username and name of the group the permission is granted through
+    """
+    user_model = get_user_model()
+    username_lookup = LOOKUP_SEP.join(["user", user_model.USERNAME_FIELD])
+    active_users = {"user__is_active": True, "user__is_superuser": False}
+    owner_pks = list(owner_pks)
+    user_permissions_model, group_permissions_model = get_permissions_models(
+        permission.content_type
+    )
+    grants: GRANTS_DICT = {}
+    user_grants = filter_object_permissions(
+        user_permissions_model,
+        permission.content_type,
+        owner_pks,
+        permission=permission,
+        **active_users,
+    )
+    for owner_pk, user_pk, username in user_grants.values_list(
+        get_object_field(user_permissions_model), "user_id", username_lookup
+    ):
+        grants.setdefault(str(owner_pk), []).append((user_pk, username, None))
+
+    group_grants = [
+        (str(owner_pk), group_pk, group_name)
+        for owner_pk, group_pk, group_name in filter_object_permissions(
+            group_permissions_model,
+            permission.content_type,
+            owner_pks,
+            permission=permission,
+        ).values_list(
+            get_object_field(group_permissions_model), "group_id", "group__name"
+        )
+    ]
+    if not group_grants:
+        return grants
+    groups_field = user_model._meta.get_field("groups")
+    user_field_name = groups_field.m2m_field_name()
+    group_field_name = groups_field.m2m_reverse_field_name()
+    memberships = groups_field.remote_field.through.objects.filter(
+        **{
+            f"{group_field_name}_id__in": {group_pk for _, group_pk, _ in group_grants},
+            f"{user_field_name}__is_active": True,
+            f"{user_field_name}__is_superuser": False,
+        }
+    ).values_list(
+        f"{group_field_name}_id",
+        f"{user_field_name}_id",
+        LOOKUP_SEP.join([user_field_name, user_model.USERNAME_FIELD]),
+    )
+    members: Dict[Any, List[Tuple[Any, str]]] = {}
+    for group_pk, user_pk, username in memberships:
+        members.setdefault(group_pk, []).append((user_pk, username))
+    for owner_pk, group_pk, group_name in group_grants:
+        grants.setdefault(owner_pk, []).extend(
+            (user_pk, username, group_name)
+            for user_pk, username in members.get(group_pk, [])
+        )
+    return grants
@@ -0,0 +1,51 @@
+"""
+Workers of audit_access command. Processes which are spawned rather than
+forked import this module before Django is set up, so it's set up here
+before any model is imported.
+"""
+import os
+import tempfile
+
+import django
+from django.apps import apps
+
+if not apps.ready and "DJANGO_SETTINGS_MODULE" in os.environ:
+    django.setup()
+
+from django.db import connections  # noqa: E402
+
+from smart_security.audit import (  # noqa: E402
+    iter_effective_access,
+    write_access_records,
+)
+
+
+def init_worker():
+    # Forked workers mustn't use connections of the parent process.
+    connections.close_all()
+
+
+def audit_range(arguments):
+    """
+    Writes access records of a range of primary keys to a temporary file.
+    @param arguments: the model's label, the permission, the range,
+    the chunk size, the format and whether to include superusers
+    @return: the file's path and number of written records
+    """
+    model_label, perm, pk_range, chunk_size, format_name, include_superusers = arguments
+    model_class = apps.get_model(model_label)
+    file_descriptor, path = tempfile.mkstemp(suffix=f".{format_name}")
+    with os.fdopen(file_descriptor, "w", newline="") as output:
+        written = write_access_records(
+            iter_effective_access(
+                model_class,
+                perm,
+                chunk_size=chunk_size,
+                pk_range=pk_range,
+                include_superusers=include_superusers,
+            ),
+            output,
+            format_name,
+            header=False,
+        )
+    return path, written
@@ -0,0 +1,283 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Iterator, Optional, Tuple, List, Dict, Type, Set
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import Model
+from guardian.ctypes import get_content_type
+
+from smart_security.constants import (
+    SMART_SECURITY_DECISION_CACHE_SIZE_SETTING,
+    DEFAULT_DECISION_CACHE_SIZE,
+    SMART_SECURITY_OWNER_CACHE_SETTING,
+    SMART_SECURITY_OWNER_CACHE_TIMEOUT_SETTING,
+)
+from smart_security.permission_models import (
+    filter_object_permissions,
+    get_object_field,
+    get_permissions_models,
+)
+
+DECISION_KEY = Tuple[Any, int, str, str]
+
+
+class PermissionDecisionCache:
+    """
+    This class keeps permission decisions made during a single request.
+    The number of decisions is bounded, least recently used ones are dropped first.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._decisions: "OrderedDict[DECISION_KEY, bool]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: DECISION_KEY) -> Optional[bool]:
+        """
+        Returns the cached decision.
+        @param key: user's id, owner's content type id, owner's pk and codename
+        @return: the decision or None if it isn't cached
+        """
+        with self._lock:
+            decision = self._decisions.get(key)
+            if decision is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._decisions.move_to_end(key)
+            return decision
+
+    def set(self, key: DECISION_KEY, decision: bool) -> None:
+        with self._lock:
+            self._decisions[key] = decision
+            self._decisions.move_to_end(key)
+            if len(self._decisions) > self.max_size:
+                self._decisions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._decisions)
+
+
+_decision_cache: ContextVar[Optional[PermissionDecisionCache]] = ContextVar(
+    "smart_security_decision_cache", default=None
+)
+
+
+def get_decision_cache() -> Optional[PermissionDecisionCache]:
+    return _decision_cache.get()
+
+
+@contextmanager
+def permission_decision_cache(
+    max_size: Optional[int] = None,
+) -> Iterator[PermissionDecisionCache]:
+    """
+    Enables caching of permission decisions within the block.
+    @param max_size: maximum number of cached decisions,
+    SMART_SECURITY_DECISION_CACHE_SIZE setting by default
+    """
+    if max_size is None:
+        max_size = getattr(
+            settings,
+            SMART_SECURITY_DECISION_CACHE_SIZE_SETTING,
+            DEFAULT_DECISION_CACHE_SIZE,
+        )
+    cache = PermissionDecisionCache(max_size=max_size)
+    token = _decision_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _decision_cache.reset(token)
+
+
+class OwnerPermissionSnapshot:
+    """
+    This class keeps object permissions granted to users on owners,
+    directly and through groups. All grants of a user for a model
+    are loaded with a single query and reused for the rest of the request.
+    Permissions assigned later in the request aren't visible.
+    """
+
+    def __init__(self) -> None:
+        self.loads = 0
+        self._grants: Dict[Tuple[Any, int], Set[Tuple[str, str]]] = {}
+        self._lock = Lock()
+
+    def has_perm(self, user_obj: Any, codename: str, obj: Model) -> bool:
+        """
+        @param user_obj: an active user which isn't a superuser
+        @param codename: a permission's codename without app label
+        @param obj: an owner
+        @return: whether the permission is granted for the owner
+        """
+        grants = self.get_grants(user_obj, get_content_type(obj))
+        return (str(obj.pk), codename) in grants
+
+    def get_grants(
+        self, user_obj: Any, content_type: ContentType
+    ) -> Set[Tuple[str, str]]:
+        """
+        @return: owners' primary keys and codenames granted to the user
+        """
+        key = (user_obj.pk, content_type.pk)
+        with self._lock:
+            grants = self._grants.get(key)
+        if grants is None:
+            grants = self._load_grants(user_obj, content_type)
+            with self._lock:
+                self._grants[key] = grants
+                self.loads += 1
+        return grants
+
+    @classmethod
+    def _load_grants(
+        cls, user_obj: Any, content_type: ContentType
+    ) -> Set[Tuple[str, str]]:
+        user_model, group_model = get_permissions_models(content_type)
+        groups_lookup = f"group__{get_user_model().groups.field.related_query_name()}"
+        user_grants = (
+            filter_object_permissions(user_model, content_type, user=user_obj)
+            .order_by()
+            .values_list(get_object_field(user_model), "permission__codename")
+        )
+        group_grants = (
+            filter_object_permissions(
+                group_model, content_type, **{groups_lookup: user_obj}
+            )
+            .order_by()
+            .values_list(get_object_field(group_model), "permission__codename")
+        )
+        return {
+            (str(object_pk), codename)
+            for object_pk, codename in user_grants.union(group_grants)
+        }
+
+
+_owner_permission_snapshot: ContextVar[Optional[OwnerPermissionSnapshot]] = ContextVar(
+    "smart_security_owner_permission_snapshot", default=None
+)
+
+
+def get_owner_permission_snapshot() -> Optional[OwnerPermissionSnapshot]:
+    return _owner_permission_snapshot.get()
+
+
+@contextmanager
+def owner_permission_snapshot() -> Iterator[OwnerPermissionSnapshot]:
+    """
+    Enables answering owners' permissions from a snapshot within the block.
+    """
+    snapshot = OwnerPermissionSnapshot()
+    token = _owner_permission_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _owner_permission_snapshot.reset(token)
+
+
+class OwnerCache:
+    """
+    This class keeps owners' primary keys in Django's cache framework,
+    so they are shared between processes.
+    Every entry remembers generations of models on the rest of the path
+    to the owner. Changing a relationship of any of those models
+    starts a new generation, which invalidates dependent entries.
+    """
+
+    KEY_PREFIX = "smart_security:owner"
+    GENERATION_KEY_PREFIX = "smart_security:generation"
+
+    def __init__(self, alias: str = DEFAULT_CACHE_ALIAS) -> None:
+        self._cache = caches[alias]
+        self._timeout = getattr(
+            settings, SMART_SECURITY_OWNER_CACHE_TIMEOUT_SETTING, DEFAULT_TIMEOUT
+        )
+
+    def get_owner_pks(
+        self, objects: List[Model], path_models: List[Type[Model]]
+    ) -> Tuple[Dict[int, Any], Tuple[str, ...]]:
+        """
+        Returns cached owners' primary keys with a single cache request.
+        @param objects: objects of a single model to get owners
+        @param path_models: models on the rest of the path to the owner
+        @return: owners' primary keys by position of the object
+        and current generations of the path models
+        """
+        keys = [self._get_key(obj) for obj in objects]
+        generation_keys = [self._get_generation_key(model) for model in path_models]
+        values = self._cache.get_many(keys + generation_keys)
+        generations = tuple(
+            self._get_generation(generation_key, values.get(generation_key))
+            for generation_key in generation_keys
+        )
+        owner_pks = {}
+        for position, key in enumerate(keys):
+            value = values.get(key)
+            if value is not None:
+                owner_pk, entry_generations = value
+                if entry_generations == generations:
+                    owner_pks[position] = owner_pk
+        return owner_pks, generations
+
+    def set_owner_pks(
+        self,
+        objects_and_owner_pks: List[Tuple[Model, Any]],
+        generations: Tuple[str, ...],
+    ) -> None:
+        """
+        Stores owners' primary keys.
+        @param objects_and_owner_pks: objects and primary keys of their owners
+        @param generations: generations returned by get_owner_pks
+        """
+        self._cache.set_many(
+            {
+                self._get_key(obj): (owner_pk, generations)
+                for obj, owner_pk in objects_and_owner_pks
+            },
+            timeout=self._timeout,
+        )
+
+    def invalidate(self, obj: Model) -> None:
+        """
+        Removes the object's entry and entries which depend on the object.
+        @param obj: an object which relationship could change
+        """
+        self._cache.delete(self._get_key(obj))
+        self._cache.set(
+            self._get_generation_key(obj.__class__), uuid4().hex, timeout=None
+        )
+
+    def _get_generation(self, generation_key: str, generation: Optional[str]) -> str:
+        if generation is None:
+            generation = uuid4().hex
+            if not self._cache.add(generation_key, generation, timeout=None):
+                generation = self._cache.get(generation_key, generation)
+        return generation
+
+    @classmethod
+    def _get_key(cls, obj: Model) -> str:
+        return f"{cls.KEY_PREFIX}:{obj._meta.label_lower}:{obj.pk}"
+
+    @classmethod
+    def _get_generation_key(cls, model_class: Type[Model]) -> str:
+        return f"{cls.GENERATION_KEY_PREFIX}:{model_class._meta.label_lower}"
+
+
+def get_owner_cache() -> Optional[OwnerCache]:
+    """
+    @return: owner cache configured with SMART_SECURITY_OWNER_CACHE setting
+    or None if it's disabled
+    """
+    alias = getattr(settings, SMART_SECURITY_OWNER_CACHE_SETTING, None)
+    if alias is None:
+        return None
+    return OwnerCache(alias=alias)
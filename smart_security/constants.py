@@ -1,5 +1,21 @@
 ID_SUFFIX_REGEX = "_id$"
 IGNORE_SMART_SECURITY_OPTION = "ignore_smart_security"
+OWNER_PATH_OPTION = "smart_security_owner_path"
 META_ATTRIBUTE = "_meta"
 SHOULD_BE_CHECKED_ATTRIBUTE_SUFFIX = "_id"
 SMART_SECURITY_MODEL_CLASS_SETTING = "SMART_SECURITY_MODEL_CLASS"
+SMART_SECURITY_OWNER_RESOLUTION_SETTING = "SMART_SECURITY_OWNER_RESOLUTION"
+OWNER_RESOLUTION_QUERY = "query"
+OWNER_RESOLUTION_TRAVERSE = "traverse"
+SMART_SECURITY_DECISION_CACHE_SIZE_SETTING = "SMART_SECURITY_DECISION_CACHE_SIZE"
+DEFAULT_DECISION_CACHE_SIZE = 1024
+SMART_SECURITY_OWNER_CACHE_SETTING = "SMART_SECURITY_OWNER_CACHE"
+SMART_SECURITY_OWNER_CACHE_TIMEOUT_SETTING = "SMART_SECURITY_OWNER_CACHE_TIMEOUT"
+SMART_SECURITY_PATH_COST_ESTIMATOR_SETTING = "SMART_SECURITY_PATH_COST_ESTIMATOR"
+SMART_SECURITY_PATH_WEIGHTS_SETTING = "SMART_SECURITY_PATH_WEIGHTS"
+DEFAULT_PATH_COST_ESTIMATOR = "smart_security.estimators.HopCountCostEstimator"
+SMART_SECURITY_METRICS_COLLECTOR_SETTING = "SMART_SECURITY_METRICS_COLLECTOR"
+SMART_SECURITY_OWNER_PATH_MANIFEST_SETTING = "SMART_SECURITY_OWNER_PATH_MANIFEST"
+SMART_SECURITY_WARM_UP_SETTING = "SMART_SECURITY_WARM_UP"
+SMART_SECURITY_QUERY_BUDGET_SETTING = "SMART_SECURITY_QUERY_BUDGET"
+SMART_SECURITY_MODEL_OPTIONS_SETTING = "SMART_SECURITY_MODEL_OPTIONS"
@@ -0,0 +1,108 @@
+from math import log10
+from typing import Dict, Optional, Type
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Model
+from django.db.models.fields.related import ForeignKey
+
+from smart_security.constants import SMART_SECURITY_PATH_WEIGHTS_SETTING
+
+
+class PathCostEstimator:
+    """
+    Base class of estimators of the cost of following a relationship.
+    The path to the owner with the lowest total cost is chosen.
+    """
+
+    def get_cost(self, field: ForeignKey) -> float:
+        """
+        @param field: a foreign key followed from field.model to field.related_model
+        @return: a positive cost of joining the related model
+        """
+        raise NotImplementedError
+
+
+class HopCountCostEstimator(PathCostEstimator):
+    """
+    Every relationship costs the same, so the path with the fewest hops is chosen.
+    """
+
+    def get_cost(self, field: ForeignKey) -> float:
+        return 1.0
+
+
+class FieldWeightCostEstimator(PathCostEstimator):
+    """
+    Costs are declared explicitly per field
+    with SMART_SECURITY_PATH_WEIGHTS setting, e.g.
+    {"sample_app.SampleModel.owner": 2.5}. Other relationships cost 1.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None) -> None:
+        if weights is None:
+            weights = getattr(settings, SMART_SECURITY_PATH_WEIGHTS_SETTING, {})
+        self._weights = {key.lower(): weight for key, weight in weights.items()}
+
+    def get_cost(self, field: ForeignKey) -> float:
+        key = f"{field.model._meta.label_lower}.{field.name}".lower()
+        return self._weights.get(key, 1.0)
+
+
+class TableSizeCostEstimator(PathCostEstimator):
+    """
+    Joining a bigger table costs more. Relationships without an index
+    on the foreign key column are penalised, as filtering querysets
+    through the path joins them backwards. Sizes of tables are read
+    from statistics of the database where it keeps them, so tables aren't scanned.
+    """
+
+    NOT_INDEXED_PENALTY = 10.0
+    ROWS_ESTIMATE_QUERIES = {
+        "postgresql": "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+        "mysql": (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        ),
+        "oracle": "SELECT num_rows FROM user_tables WHERE table_name = UPPER(%s)",
+    }
+
+    def __init__(self) -> None:
+        self._rows_counts: Dict[Type[Model], int] = {}
+
+    def get_cost(self, field: ForeignKey) -> float:
+        cost = 1.0 + log10(1 + self._get_rows_count(field.related_model))
+        if not (field.db_index or field.unique):
+            cost += self.NOT_INDEXED_PENALTY
+        return cost
+
+    def _get_rows_count(self, model_class: Type[Model]) -> int:
+        rows_count = self._rows_counts.get(model_class)
+        if rows_count is None:
+            using = router.db_for_read(model_class)
+            try:
+                # A failed query mustn't abort the transaction the registry is built in.
+                with transaction.atomic(using=using):
+                    rows_count = self._estimate_rows_count(model_class, using)
+            except DatabaseError:
+                # Tables may not exist yet, e.g. before migrations.
+                rows_count = 0
+            self._rows_counts[model_class] = rows_count
+        return rows_count
+
+    def _estimate_rows_count(self, model_class: Type[Model], using: str) -> int:
+        connection = connections[using]
+        query = self.ROWS_ESTIMATE_QUERIES.get(connection.vendor)
+        if query is None:
+            # SQLite keeps no statistics unless it's analyzed, its tables are counted.
+            return model_class._base_manager.using(using).count()
+        table_name = model_class._meta.db_table
+        if connection.vendor == "postgresql":
+            table_name = connection.ops.quote_name(table_name)
+        with connection.cursor() as cursor:
+            cursor.execute(query, [table_name])
+            row = cursor.fetchone()
+        # Tables which were never analyzed have no or negative estimates.
+        if row is None or row[0] is None:
+            return 0
+        return max(0, int(row[0]))
@@ -0,0 +1,2 @@
+class SmartSecurityIncorrectConfigException(Exception):
+    pass
@@ -0,0 +1,201 @@
+from contextlib import ExitStack
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Type, Union
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.db import connections
+from django.db.models import Model
+
+from smart_security.constants import (
+    OWNER_RESOLUTION_TRAVERSE,
+    SMART_SECURITY_QUERY_BUDGET_SETTING,
+)
+from smart_security.fields import get_materialized_owner_field
+from smart_security.registry import owner_path_registry
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+
+class SmartSecurityQueryBudgetExceeded(Exception):
+    """
+    Raised when a permission check makes more queries than allowed.
+    The trace of the check is kept in the trace attribute.
+    """
+
+    def __init__(self, message: str, trace: Dict[str, Any]) -> None:
+        super().__init__(message)
+        self.trace = trace
+
+
+class _QueriesRecorder:
+    def __init__(self) -> None:
+        self.queries: List[Dict[str, Any]] = []
+        self._stack = ExitStack()
+
+    def __enter__(self) -> "_QueriesRecorder":
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.duration = perf_counter() - self._start
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "sql": sql,
+                    "params": [str(param) for param in params or ()],
+                    "duration": perf_counter() - start,
+                }
+            )
+
+    def get_step(self, name: str, **details: Any) -> Dict[str, Any]:
+        return {
+            "name": name,
+            **details,
+            "duration": self.duration,
+            "queries": self.queries,
+        }
+
+
+def explain_perm(
+    user_obj: Any,
+    perm: Union[str, Permission],
+    obj: Model,
+    query_budget: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Checks the permission like the backend does and explains how it was decided:
+    candidate paths to owners with their costs, the translated permission, the owner
+    and queries of every step. Decisions within a request aren't cached here.
+    @param user_obj: a user to check permission
+    @param perm: a permission of the object's model, e.g. "view_samplemodel"
+    @param obj: an object to check permission
+    @param query_budget: maximal number of queries of the check,
+    by default SMART_SECURITY_QUERY_BUDGET setting or unlimited
+    @return: a trace of the check, which can be dumped as JSON
+    @raise SmartSecurityQueryBudgetExceeded: when the check exceeds the budget
+    """
+    if query_budget is None:
+        query_budget = getattr(settings, SMART_SECURITY_QUERY_BUDGET_SETTING, None)
+    backend = SmartSecurityObjectPermissionBackend()
+    codename = backend._get_permission_codename(perm)
+    model_class = obj.__class__
+    trace: Dict[str, Any] = {
+        "model": model_class._meta.label,
+        "object_pk": obj.pk,
+        "perm": codename,
+    }
+    steps: List[Dict[str, Any]] = []
+    with _QueriesRecorder() as recorder:
+        security_model_classes = backend._get_security_model_classes()
+        owner_and_path = owner_path_registry.get_owner_and_path(
+            model_class=model_class, security_model_classes=security_model_classes
+        )
+        checked_obj, checked_perm = obj, codename
+        security_model_class = backend._get_owner_model_class(model_class)
+        owner_perm = None
+        if security_model_class is None:
+            reason = "the model is an owner or it has no path to any owner"
+        else:
+            owner_perm = backend._get_owner_perm(
+                model_class=model_class,
+                perm=codename,
+                security_model_class=security_model_class,
+            )
+            if owner_perm is None:
+                reason = (
+                    f"{security_model_class._meta.label} doesn't have "
+                    f"a permission translated from {codename}"
+                )
+            else:
+                reason = f"delegated to {security_model_class._meta.label}"
+                checked_obj = _resolve_owner(
+                    backend, model_class, obj, security_model_class, steps
+                )
+                checked_perm = owner_perm
+        trace["owner_perm"] = owner_perm
+        trace["delegated"] = owner_perm is not None
+        trace["reason"] = reason
+        trace["checked_model"] = checked_obj._meta.label
+        trace["checked_pk"] = checked_obj.pk
+        trace["checked_perm"] = checked_perm
+        with _QueriesRecorder() as guardian_recorder:
+            trace["result"] = backend._check_perm(user_obj, checked_perm, checked_obj)
+        steps.append(guardian_recorder.get_step("guardian_check"))
+    # Paths are searched again only to explain the choice, it isn't a part of the check.
+    trace["paths"] = [
+        {
+            "owner": candidate.security_model_class._meta.label,
+            "path": candidate.path,
+            "cost": candidate.cost,
+            "hops": candidate.hops,
+            "chosen": owner_and_path
+            == (candidate.security_model_class, candidate.path),
+        }
+        for candidate in owner_path_registry.get_path_candidates(
+            model_class=model_class, security_model_classes=security_model_classes
+        )
+    ]
+    trace["steps"] = steps
+    trace["duration"] = recorder.duration
+    trace["queries"] = len(recorder.queries)
+    trace["query_budget"] = query_budget
+    if query_budget is not None and trace["queries"] > query_budget:
+        raise SmartSecurityQueryBudgetExceeded(
+            f"Checking {codename} of {trace['model']} made {trace['queries']} "
+            f"queries, the budget is {query_budget}!",
+            trace,
+        )
+    return trace
+
+
+def _resolve_owner(
+    backend: SmartSecurityObjectPermissionBackend,
+    model_class: Type[Model],
+    obj: Model,
+    security_model_class: Type[Model],
+    steps: List[Dict[str, Any]],
+) -> Model:
+    """
+    Resolves the owner like the backend does, recording every step.
+    """
+    field = get_materialized_owner_field(
+        model_class=model_class, security_model_class=security_model_class
+    )
+    if field is not None and getattr(obj, field.attname) is not None:
+        with _QueriesRecorder() as recorder:
+            owner = backend._get_owner(
+                model_class=model_class,
+                obj=obj,
+                security_model_class=security_model_class,
+            )
+        steps.append(recorder.get_step("materialized_owner", field=field.name))
+        return owner
+    accessors = backend._find_shortest_accessor(
+        model_class=model_class, security_model_class=security_model_class
+    )
+    if backend._get_owner_resolution() != OWNER_RESOLUTION_TRAVERSE:
+        with _QueriesRecorder() as recorder:
+            owner = backend._get_owner(
+                model_class=model_class,
+                obj=obj,
+                security_model_class=security_model_class,
+            )
+        steps.append(recorder.get_step("owner_query", path=".".join(accessors)))
+        return owner
+    for accessor in accessors:
+        with _QueriesRecorder() as recorder:
+            obj = getattr(obj, accessor)
+        steps.append(
+            recorder.get_step(
+                "traverse", accessor=accessor, model=obj.__class__._meta.label
+            )
+        )
+    return obj
@@ -0,0 +1,70 @@
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from django.apps import apps
+from django.core import checks
+from django.db.models import Model, ForeignKey
+
+
+class MaterializedOwnerField(ForeignKey):
+    """
+    A foreign key to the owner which is kept up to date automatically,
+    so models far from the owner resolve it without following the path.
+    The value is computed before saving the model and updated whenever
+    a relationship on the path to the owner changes.
+    """
+
+    def __init__(self, to: Any, on_delete: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("related_name", "+")
+        super().__init__(to, on_delete, **kwargs)
+
+    def check(self, **kwargs: Any) -> List[checks.CheckMessage]:
+        errors = super().check(**kwargs)
+        if not apps.is_installed("smart_security"):
+            errors.append(
+                checks.Error(
+                    "smart_security must be in INSTALLED_APPS "
+                    "to update materialized owners.",
+                    obj=self,
+                    id="smart_security.E001",
+                )
+            )
+        return errors
+
+    def pre_save(self, model_instance: Model, add: bool) -> Any:
+        from smart_security.materialized import resolve_owner_pk
+
+        value = resolve_owner_pk(instance=model_instance, field=self)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+_materialized_owner_fields: Dict[
+    Tuple[Type[Model], Type[Model]], Optional[MaterializedOwnerField]
+] = {}
+
+
+def get_materialized_owner_field(
+    model_class: Type[Model], security_model_class: Type[Model]
+) -> Optional[MaterializedOwnerField]:
+    """
+    @param model_class: a model to check
+    @param security_model_class: a owner's class
+    @return: the model's materialized foreign key to the owner's class
+    or None if it doesn't have one
+    """
+    key = (model_class, security_model_class)
+    try:
+        return _materialized_owner_fields[key]
+    except KeyError:
+        pass
+    materialized_owner_field = None
+    for field in model_class._meta.concrete_fields:
+        if (
+            isinstance(field, MaterializedOwnerField)
+            and field.related_model == security_model_class
+        ):
+            materialized_owner_field = field
+            break
+    _materialized_owner_fields[key] = materialized_owner_field
+    return materialized_owner_field
@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from smart_security.audit import (
+    AUDIT_FORMATS,
+    get_pk_ranges,
+    iter_effective_access,
+    write_access_records,
+)
+from smart_security.audit_workers import audit_range, init_worker
+
+# Ranges are smaller than a worker's share, so uneven primary keys are balanced.
+RANGES_PER_WORKER = 4
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams users who have an object permission for objects of a model, "
+        "including permissions delegated to owners and granted through groups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", metavar="app_label.ModelName")
+        parser.add_argument("perm", help="A permission of the model.")
+        parser.add_argument("--format", choices=AUDIT_FORMATS, default="csv")
+        parser.add_argument(
+            "--output", help="A file to write, standard output by default."
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--exclude-superusers",
+            action="store_true",
+            help="Don't list superusers, who have the permission for every object.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes auditing ranges of primary keys.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model_class = apps.get_model(options["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                written = self._audit(model_class, output, options)
+            self.stderr.write(f"{written} records written to {options['output']}.")
+        else:
+            self._audit(model_class, self.stdout, options)
+
+    def _audit(self, model_class, output, options):
+        if options["workers"] <= 1:
+            return write_access_records(
+                iter_effective_access(
+                    model_class,
+                    options["perm"],
+                    chunk_size=options["chunk_size"],
+                    include_superusers=not options["exclude_superusers"],
+                ),
+                output,
+                options["format"],
+            )
+        try:
+            pk_ranges = get_pk_ranges(
+                model_class, options["workers"] * RANGES_PER_WORKER
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        written = write_access_records([], output, options["format"])
+        # Databases' connections can't be shared with forked processes.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], initializer=init_worker
+        ) as executor:
+            results = executor.map(
+                audit_range,
+                [
+                    (
+                        model_class._meta.label,
+                        options["perm"],
+                        pk_range,
+                        options["chunk_size"],
+                        options["format"],
+                        not options["exclude_superusers"],
+                    )
+                    for pk_range in pk_ranges
+                ],
+            )
+            # Ranges are written in order, every one through a temporary file,
+            # so memory doesn't depend on size of the table.
+            for path, range_written in results:
+                with open(path, newline="") as range_output:
+                    for line in range_output:
+                        output.write(line)
+                os.remove(path)
+                written += range_written
+        return written
@@ -0,0 +1,56 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_security.materialized import (
+    backfill_materialized_owners,
+    get_materialized_owner_fields,
+)
+
+
+class Command(BaseCommand):
+    help = "Fills materialized owner fields of existing objects in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            metavar="app_label.ModelName",
+            help="Models to backfill, all models with materialized owner by default.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--only-missing",
+            action="store_true",
+            help="Update only objects which materialized owner isn't filled.",
+        )
+
+    def handle(self, *args, **options):
+        models_and_fields = get_materialized_owner_fields()
+        if options["models"]:
+            try:
+                models_classes = {apps.get_model(label) for label in options["models"]}
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+            models_without_field = models_classes - {
+                model_class for model_class, _ in models_and_fields
+            }
+            if models_without_field:
+                raise CommandError(
+                    "Models don't have materialized owner: "
+                    + ", ".join(sorted(m._meta.label for m in models_without_field))
+                )
+            models_and_fields = [
+                (model_class, field)
+                for model_class, field in models_and_fields
+                if model_class in models_classes
+            ]
+        for model_class, field in models_and_fields:
+            updated = backfill_materialized_owners(
+                model_class=model_class,
+                field=field,
+                chunk_size=options["chunk_size"],
+                only_missing=options["only_missing"],
+            )
+            self.stdout.write(
+                f"{model_class._meta.label}.{field.name}: {updated} objects updated."
+            )
@@ -0,0 +1,47 @@
+import json
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_security.explain import SmartSecurityQueryBudgetExceeded, explain_perm
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks a permission of a user for an object and prints how it was decided: "
+        "paths to owners, the translated permission, the owner and queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("perm", help="A permission of the model.")
+        parser.add_argument("model", metavar="app_label.ModelName")
+        parser.add_argument("pk", help="A primary key of the object.")
+        parser.add_argument(
+            "--query-budget",
+            type=int,
+            help="Fail when the check makes more queries.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model_class = apps.get_model(options["model"])
+            obj = model_class._base_manager.get(pk=options["pk"])
+            user = get_user_model()._default_manager.get_by_natural_key(
+                options["username"]
+            )
+        except (LookupError, ValueError, ObjectDoesNotExist) as e:
+            raise CommandError(e)
+        try:
+            trace = explain_perm(
+                user, options["perm"], obj, query_budget=options["query_budget"]
+            )
+        except SmartSecurityQueryBudgetExceeded as e:
+            self._write_trace(e.trace)
+            raise CommandError(e)
+        self._write_trace(trace)
+
+    def _write_trace(self, trace):
+        self.stdout.write(json.dumps(trace, indent=2, default=str))
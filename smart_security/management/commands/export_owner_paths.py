@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from smart_security.manifest import build_manifest
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports paths to owner models and translated permissions "
+        "of all installed models to a manifest loaded at startup "
+        "with SMART_SECURITY_OWNER_PATH_MANIFEST setting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output", nargs="?", help="A file to write, standard output by default."
+        )
+
+    def handle(self, *args, **options):
+        manifest = build_manifest(
+            SmartSecurityObjectPermissionBackend._get_security_model_classes()
+        )
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(manifest, output, indent=2, sort_keys=True)
+            self.stdout.write(f"Owner path manifest written to {options['output']}.")
+        else:
+            self.stdout.write(json.dumps(manifest, indent=2, sort_keys=True))
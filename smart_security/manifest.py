@@ -0,0 +1,168 @@
+import hashlib
+import json
+from logging import getLogger
+from typing import Any, Dict, Sequence, Type
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Model
+
+from smart_security.constants import (
+    SMART_SECURITY_OWNER_PATH_MANIFEST_SETTING,
+    SMART_SECURITY_PATH_COST_ESTIMATOR_SETTING,
+    SMART_SECURITY_PATH_WEIGHTS_SETTING,
+    DEFAULT_PATH_COST_ESTIMATOR,
+)
+from smart_security.options import get_model_options
+from smart_security.registry import (
+    OWNER_PATHS_DICT,
+    PRELOADED_CODENAMES_DICT,
+    owner_path_registry,
+    permission_translation_index,
+)
+from smart_security.utils import BFSModelSearch
+
+logger = getLogger("smart_security")
+
+MANIFEST_VERSION = 1
+
+
+def compute_schema_hash(security_model_classes: Sequence[Type[Model]]) -> str:
+    """
+    Computes a hash of everything owner paths and permissions depend on:
+    installed models, their relationships and permissions,
+    owners' classes and path cost settings.
+    @param security_model_classes: owners' classes ordered by priority
+    @return: hex digest of the hash
+    """
+    relation_fields = BFSModelSearch._get_supported_relations()
+    models = []
+    for model_class in _get_models():
+        meta_data = model_class._meta
+        models.append(
+            [
+                meta_data.label_lower,
+                [
+                    [field.name, field.related_model._meta.label_lower, field.null]
+                    for field in meta_data.fields + meta_data.many_to_many
+                    if isinstance(field, relation_fields)
+                ],
+                list(meta_data.default_permissions),
+                [list(permission) for permission in meta_data.permissions],
+                get_model_options(model_class),
+            ]
+        )
+    schema = {
+        "version": MANIFEST_VERSION,
+        "security_model_classes": [
+            security_model_class._meta.label_lower
+            for security_model_class in security_model_classes
+        ],
+        "cost_estimator": getattr(
+            settings,
+            SMART_SECURITY_PATH_COST_ESTIMATOR_SETTING,
+            DEFAULT_PATH_COST_ESTIMATOR,
+        ),
+        "weights": getattr(settings, SMART_SECURITY_PATH_WEIGHTS_SETTING, {}),
+        "models": models,
+    }
+    serialized_schema = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha256(serialized_schema.encode()).hexdigest()
+
+
+def build_manifest(security_model_classes: Sequence[Type[Model]]) -> Dict[str, Any]:
+    """
+    Computes paths to owners and translated codenames for all installed models.
+    Models without path to any owner are marked with None.
+    @param security_model_classes: owners' classes ordered by priority
+    @return: the manifest serializable to JSON
+    """
+    owners_and_paths = owner_path_registry.build(security_model_classes)
+    models: Dict[str, Any] = {}
+    for model_class in _get_models():
+        owner_and_path = owners_and_paths[model_class]
+        if owner_and_path is None:
+            models[model_class._meta.label_lower] = None
+            continue
+        security_model_class, path = owner_and_path
+        entry: Dict[str, Any] = {
+            "owner": security_model_class._meta.label_lower,
+            "path": path,
+        }
+        # Django doesn't create content types nor permissions of auto-created models.
+        if path and not model_class._meta.auto_created:
+            permissions = {}
+            for codename in sorted(
+                permission_translation_index.get_model_codenames(model_class)
+            ):
+                translation = permission_translation_index.translate(
+                    model_class=model_class,
+                    codename=codename,
+                    security_model_class=security_model_class,
+                )
+                permissions[codename] = None if translation is None else translation[0]
+            entry["permissions"] = permissions
+        models[model_class._meta.label_lower] = entry
+    return {
+        "version": MANIFEST_VERSION,
+        "schema_hash": compute_schema_hash(security_model_classes),
+        "models": models,
+    }
+
+
+def load_manifest(path: str, security_model_classes: Sequence[Type[Model]]) -> bool:
+    """
+    Loads paths and translated codenames from the manifest file,
+    unless it's missing or stale.
+    @param path: a path of the manifest file
+    @param security_model_classes: owners' classes ordered by priority
+    @return: whether the manifest was loaded
+    """
+    try:
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError) as e:
+        logger.warning("Owner path manifest %s can't be read: %s", path, e)
+        return False
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get(
+        "schema_hash"
+    ) != compute_schema_hash(security_model_classes):
+        logger.warning(
+            "Owner path manifest %s is stale, paths are computed instead.", path
+        )
+        return False
+    owners_and_paths: OWNER_PATHS_DICT = {}
+    owner_codenames: PRELOADED_CODENAMES_DICT = {}
+    for label, entry in manifest["models"].items():
+        model_class = apps.get_model(label)
+        if entry is None:
+            owners_and_paths[model_class] = None
+            continue
+        security_model_class = apps.get_model(entry["owner"])
+        owners_and_paths[model_class] = (security_model_class, entry["path"])
+        for codename, owner_codename in entry.get("permissions", {}).items():
+            owner_codenames[
+                (model_class, codename, security_model_class)
+            ] = owner_codename
+    owner_path_registry.load(security_model_classes, owners_and_paths)
+    permission_translation_index.preload(owner_codenames)
+    return True
+
+
+def load_configured_manifest(security_model_classes: Sequence[Type[Model]]) -> bool:
+    """
+    Loads the manifest configured with SMART_SECURITY_OWNER_PATH_MANIFEST setting.
+    @param security_model_classes: owners' classes ordered by priority
+    @return: whether the manifest was loaded
+    """
+    path = getattr(settings, SMART_SECURITY_OWNER_PATH_MANIFEST_SETTING, None)
+    if path is None:
+        return False
+    return load_manifest(str(path), security_model_classes)
+
+
+def _get_models():
+    return sorted(
+        apps.get_models(include_auto_created=True),
+        key=lambda model_class: model_class._meta.label_lower,
+    )
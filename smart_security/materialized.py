@@ -0,0 +1,221 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.constants import LOOKUP_SEP
+
+from smart_security.fields import MaterializedOwnerField
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+# A model with materialized owner, its field, the path from the model
+# to the changed model and the rest of the path to the owner.
+CASCADE = Tuple[Type[Model], MaterializedOwnerField, List[str], List[str]]
+
+_cascades: Optional[Dict[Type[Model], List[CASCADE]]] = None
+
+
+def get_materialized_owner_fields() -> List[Tuple[Type[Model], MaterializedOwnerField]]:
+    """
+    @return: all installed models with materialized owner and their fields
+    """
+    return [
+        (model_class, field)
+        for model_class in apps.get_models()
+        for field in model_class._meta.concrete_fields
+        if isinstance(field, MaterializedOwnerField)
+    ]
+
+
+def get_owner_accessors(
+    model_class: Type[Model], field: MaterializedOwnerField
+) -> List[str]:
+    """
+    @return: the path from the model to the owner of materialized field,
+    which never contains materialized fields
+    """
+    return SmartSecurityObjectPermissionBackend._find_shortest_accessor(
+        model_class=model_class, security_model_class=field.related_model
+    )
+
+
+def resolve_owner_pk(instance: Model, field: MaterializedOwnerField) -> Any:
+    """
+    Computes the owner's primary key following the path from the instance.
+    Objects on the path which are already loaded aren't trusted,
+    as they may be out of date.
+    @return: the owner's primary key or None if the path is broken
+    """
+    accessors = get_owner_accessors(instance.__class__, field)
+    if not accessors:
+        return None
+    return _resolve_owner_pk(instance, accessors)
+
+
+def get_cascaded_attnames(model_class: Type[Model]) -> Set[str]:
+    """
+    @return: attribute names of the model's relationships which changes
+    are cascaded to materialized owners
+    """
+    attnames = {
+        model_class._meta.get_field(remaining[0]).attname
+        for _, _, _, remaining in _get_cascades().get(model_class, [])
+    }
+    for field in model_class._meta.concrete_fields:
+        if isinstance(field, MaterializedOwnerField):
+            accessors = get_owner_accessors(model_class, field)
+            if accessors:
+                attnames.add(model_class._meta.get_field(accessors[0]).attname)
+    return attnames
+
+
+def update_materialized_owners(
+    instance: Model,
+    update_fields: Optional[Iterable[str]] = None,
+    unchanged_fields: Iterable[str] = (),
+) -> None:
+    """
+    Updates materialized owners of objects which path to the owner
+    goes through the saved instance.
+    @param instance: a saved instance
+    @param update_fields: fields passed to save() or None if all were saved
+    @param unchanged_fields: attribute names of relationships which values
+    are known to be the same as before saving
+    """
+    unchanged_fields = set(unchanged_fields)
+    model_class = instance.__class__
+    if update_fields is not None:
+        update_fields = set(update_fields)
+        for field in model_class._meta.concrete_fields:
+            if (
+                isinstance(field, MaterializedOwnerField)
+                and field.name not in update_fields
+                and field.attname not in update_fields
+            ):
+                # The field's pre_save() isn't called when it isn't saved.
+                _update_owners(
+                    instance=instance,
+                    field=field,
+                    model_class=model_class,
+                    prefix=[],
+                    update_fields=update_fields,
+                    unchanged_fields=unchanged_fields,
+                )
+    for cascade_model_class, field, prefix, remaining in _get_cascades().get(
+        model_class, []
+    ):
+        _update_owners(
+            instance=instance,
+            field=field,
+            model_class=cascade_model_class,
+            prefix=prefix,
+            update_fields=update_fields,
+            unchanged_fields=unchanged_fields,
+            remaining=remaining,
+        )
+
+
+def backfill_materialized_owners(
+    model_class: Type[Model],
+    field: MaterializedOwnerField,
+    chunk_size: int = 1000,
+    only_missing: bool = False,
+) -> int:
+    """
+    Computes materialized owners of existing objects in chunks ordered
+    by primary key, with one query and one bulk update per chunk.
+    @param model_class: a model with materialized owner
+    @param field: the materialized field
+    @param chunk_size: number of objects updated at once
+    @param only_missing: whether to update only objects without owner
+    @return: number of updated objects
+    """
+    accessors = get_owner_accessors(model_class, field)
+    if not accessors:
+        return 0
+    lookup = LOOKUP_SEP.join(accessors + ["pk"])
+    queryset = model_class._base_manager.order_by("pk")
+    if only_missing:
+        queryset = queryset.filter(**{f"{field.name}__isnull": True})
+    updated = 0
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list("pk", lookup)[:chunk_size])
+        if not rows:
+            return updated
+        objects = [
+            model_class(**{"pk": pk, field.attname: owner_pk}) for pk, owner_pk in rows
+        ]
+        with transaction.atomic(using=queryset.db):
+            model_class._base_manager.using(queryset.db).bulk_update(
+                objects, [field.name]
+            )
+        updated += len(rows)
+        last_pk = rows[-1][0]
+
+
+def clear_cascades() -> None:
+    global _cascades
+    _cascades = None
+
+
+def _get_cascades() -> Dict[Type[Model], List[CASCADE]]:
+    global _cascades
+    cascades = _cascades
+    if cascades is None:
+        cascades = {}
+        for model_class, field in get_materialized_owner_fields():
+            accessors = get_owner_accessors(model_class, field)
+            path_model_class = model_class
+            for index in range(1, len(accessors)):
+                path_model_class = path_model_class._meta.get_field(
+                    accessors[index - 1]
+                ).related_model
+                cascades.setdefault(path_model_class, []).append(
+                    (model_class, field, accessors[:index], accessors[index:])
+                )
+        _cascades = cascades
+    return cascades
+
+
+def _update_owners(
+    instance: Model,
+    field: MaterializedOwnerField,
+    model_class: Type[Model],
+    prefix: List[str],
+    update_fields: Optional[Iterable[str]],
+    unchanged_fields: Set[str],
+    remaining: Optional[List[str]] = None,
+) -> None:
+    if remaining is None:
+        remaining = get_owner_accessors(model_class, field)
+        if not remaining:
+            return
+    next_field = instance._meta.get_field(remaining[0])
+    if next_field.attname in unchanged_fields or (
+        update_fields is not None
+        and next_field.name not in update_fields
+        and next_field.attname not in update_fields
+    ):
+        return
+    owner_pk = _resolve_owner_pk(instance, remaining)
+    lookup = LOOKUP_SEP.join(prefix + ["pk"])
+    model_class._base_manager.db_manager(hints={"instance": instance}).filter(
+        **{lookup: instance.pk}
+    ).update(**{field.attname: owner_pk})
+
+
+def _resolve_owner_pk(instance: Model, accessors: List[str]) -> Any:
+    backend = SmartSecurityObjectPermissionBackend
+    first_field = instance._meta.get_field(accessors[0])
+    related_value = getattr(instance, first_field.attname)
+    if related_value is None:
+        return None
+    owner_pks = backend._get_owner_pks(
+        obj=instance,
+        field=first_field,
+        accessors=accessors[1:],
+        related_values=[related_value],
+    )
+    return owner_pks.get(related_value)
@@ -0,0 +1,247 @@
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from logging import getLogger
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from smart_security.constants import SMART_SECURITY_METRICS_COLLECTOR_SETTING
+
+logger = getLogger("smart_security")
+
+PHASE_SECURITY_MODEL_RESOLUTION = "security_model_resolution"
+PHASE_PATH_LOOKUP = "path_lookup"
+PHASE_CODENAME_TRANSLATION = "codename_translation"
+PHASE_OWNER_RESOLUTION = "owner_resolution"
+PHASE_GUARDIAN_CHECK = "guardian_check"
+
+COUNTER_DELEGATED = "delegated"
+COUNTER_DIRECT = "direct"
+COUNTER_DECISION_CACHE_HITS = "decision_cache_hits"
+COUNTER_DECISION_CACHE_MISSES = "decision_cache_misses"
+COUNTER_OWNER_CACHE_HITS = "owner_cache_hits"
+COUNTER_OWNER_CACHE_MISSES = "owner_cache_misses"
+
+
+class MetricsCollector:
+    """
+    Base class of collectors of permission checking metrics.
+    """
+
+    def record(self, phase: str, duration: float, queries: int) -> None:
+        """
+        @param phase: a phase of permission checking, e.g. "owner_resolution"
+        @param duration: duration of the phase in seconds
+        @param queries: number of database queries made in the phase
+        """
+        raise NotImplementedError
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        """
+        @param counter: a counter, e.g. "delegated"
+        @param value: a value to add
+        """
+        raise NotImplementedError
+
+
+class InMemoryMetricsCollector(MetricsCollector):
+    """
+    Aggregates metrics in memory of the process.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._phases: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[str, int] = {}
+
+    def record(self, phase: str, duration: float, queries: int) -> None:
+        with self._lock:
+            stats = self._phases.setdefault(
+                phase, {"calls": 0, "duration": 0.0, "max_duration": 0.0, "queries": 0}
+            )
+            stats["calls"] += 1
+            stats["duration"] += duration
+            stats["max_duration"] = max(stats["max_duration"], duration)
+            stats["queries"] += queries
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        @return: a snapshot of aggregated phases and counters
+        """
+        with self._lock:
+            return {
+                "phases": {phase: dict(stats) for phase, stats in self._phases.items()},
+                "counters": dict(self._counters),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._phases = {}
+            self._counters = {}
+
+
+class CallbackMetricsCollector(MetricsCollector):
+    """
+    Passes every metric to a callback, e.g. to send it to a monitoring system.
+    The callback gets a dictionary with "phase", "duration" and "queries"
+    or with "counter" and "value" keys.
+    """
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        self._callback = callback
+
+    def record(self, phase: str, duration: float, queries: int) -> None:
+        self._callback({"phase": phase, "duration": duration, "queries": queries})
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        self._callback({"counter": counter, "value": value})
+
+
+class LoggingMetricsCollector(MetricsCollector):
+    """
+    Logs every metric with "smart_security" logger at debug level.
+    """
+
+    def record(self, phase: str, duration: float, queries: int) -> None:
+        logger.debug("%s took %.6fs and %d queries", phase, duration, queries)
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        logger.debug("%s increased by %d", counter, value)
+
+
+_metrics_collector: Optional[MetricsCollector] = None
+_metrics_collector_loaded = False
+
+
+def get_metrics_collector() -> Optional[MetricsCollector]:
+    """
+    @return: metrics collector configured with SMART_SECURITY_METRICS_COLLECTOR
+    setting or None if metrics are disabled
+    """
+    global _metrics_collector, _metrics_collector_loaded
+    if not _metrics_collector_loaded:
+        path = getattr(settings, SMART_SECURITY_METRICS_COLLECTOR_SETTING, None)
+        if path is None:
+            _metrics_collector = None
+        else:
+            collector_class_or_callback = import_string(path)
+            if isinstance(collector_class_or_callback, type) and issubclass(
+                collector_class_or_callback, MetricsCollector
+            ):
+                _metrics_collector = collector_class_or_callback()
+            else:
+                _metrics_collector = CallbackMetricsCollector(
+                    collector_class_or_callback
+                )
+        _metrics_collector_loaded = True
+    return _metrics_collector
+
+
+def reset_metrics_collector() -> None:
+    global _metrics_collector, _metrics_collector_loaded
+    _metrics_collector = None
+    _metrics_collector_loaded = False
+
+
+class _QueriesCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+_awaited_queries_counter: ContextVar[Optional[_QueriesCounter]] = ContextVar(
+    "smart_security_awaited_queries_counter", default=None
+)
+
+
+@contextmanager
+def _count_queries(queries_counter: _QueriesCounter) -> Iterator[None]:
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(queries_counter))
+        yield
+
+
+@contextmanager
+def measure(phase: str) -> Iterator[None]:
+    """
+    Records duration and number of queries of the phase,
+    when metrics are enabled. The block mustn't await, use measure_awaits().
+    """
+    collector = get_metrics_collector()
+    if collector is None:
+        yield
+        return
+    queries_counter = _QueriesCounter()
+    with _count_queries(queries_counter):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            collector.record(phase, perf_counter() - start, queries_counter.count)
+
+
+@contextmanager
+def measure_awaits(phase: str) -> Iterator[None]:
+    """
+    Records duration and number of queries of the phase which awaits,
+    when metrics are enabled. Connections are shared by concurrent coroutines,
+    so queries aren't intercepted across awaits: they are counted in blocks
+    of count_awaited_queries() and by add_awaited_queries() of the coroutine.
+    """
+    collector = get_metrics_collector()
+    if collector is None:
+        yield
+        return
+    queries_counter = _QueriesCounter()
+    token = _awaited_queries_counter.set(queries_counter)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        _awaited_queries_counter.reset(token)
+        collector.record(phase, perf_counter() - start, queries_counter.count)
+
+
+@contextmanager
+def count_awaited_queries() -> Iterator[None]:
+    """
+    Counts queries of the block for the enclosing measure_awaits() phase,
+    e.g. in a function run by sync_to_async on a worker thread.
+    The block mustn't await.
+    """
+    queries_counter = _awaited_queries_counter.get()
+    if queries_counter is None:
+        yield
+        return
+    with _count_queries(queries_counter):
+        yield
+
+
+def add_awaited_queries(count: int) -> None:
+    """
+    Adds queries made by the async ORM to the enclosing measure_awaits() phase.
+    """
+    queries_counter = _awaited_queries_counter.get()
+    if queries_counter is not None:
+        queries_counter.count += count
+
+
+def increment(counter: str, value: int = 1) -> None:
+    """
+    Increments the counter, when metrics are enabled.
+    """
+    collector = get_metrics_collector()
+    if collector is not None and value:
+        collector.increment(counter, value)
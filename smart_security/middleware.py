@@ -0,0 +1,50 @@
+import asyncio
+
+try:
+    from django.utils.decorators import sync_and_async_middleware
+except ImportError:
+    # Django < 3.1 calls middleware only synchronously.
+    def sync_and_async_middleware(function):
+        return function
+
+
+from smart_security.cache import permission_decision_cache, owner_permission_snapshot
+
+
+@sync_and_async_middleware
+def permission_decision_cache_middleware(get_response):
+    """
+    Caches permission decisions for the duration of a request.
+    """
+
+    async def async_middleware(request):
+        with permission_decision_cache():
+            return await get_response(request)
+
+    def middleware(request):
+        with permission_decision_cache():
+            return get_response(request)
+
+    if asyncio.iscoroutinefunction(get_response):
+        return async_middleware
+    return middleware
+
+
+@sync_and_async_middleware
+def owner_permission_snapshot_middleware(get_response):
+    """
+    Answers owners' permissions from a snapshot loaded once per user
+    for the duration of a request.
+    """
+
+    async def async_middleware(request):
+        with owner_permission_snapshot():
+            return await get_response(request)
+
+    def middleware(request):
+        with owner_permission_snapshot():
+            return get_response(request)
+
+    if asyncio.iscoroutinefunction(get_response):
+        return async_middleware
+    return middleware
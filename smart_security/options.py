@@ -0,0 +1,123 @@
+from typing import Any, Dict, Iterable, Optional, Type
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model
+from django.db.models.fields.related import ForeignKey
+
+from smart_security.constants import (
+    IGNORE_SMART_SECURITY_OPTION,
+    OWNER_PATH_OPTION,
+    SMART_SECURITY_MODEL_OPTIONS_SETTING,
+)
+from smart_security.exceptions import SmartSecurityIncorrectConfigException
+from smart_security.fields import MaterializedOwnerField
+
+MODEL_OPTIONS = (IGNORE_SMART_SECURITY_OPTION, OWNER_PATH_OPTION)
+
+
+def get_model_options(model_class: Type[Model]) -> Dict[str, Any]:
+    """
+    Returns smart security options of the model declared as its attributes,
+    overridden by SMART_SECURITY_MODEL_OPTIONS setting, e.g. for third-party models.
+    Options aren't declared on Meta, as Django rejects unknown Meta options.
+    @param model_class: a model to get options
+    @return: a mapping from option's name to its value
+    """
+    model_options = {
+        name: getattr(model_class, name)
+        for name in MODEL_OPTIONS
+        if hasattr(model_class, name)
+    }
+    model_options.update(
+        _get_configured_options().get(model_class._meta.label_lower, {})
+    )
+    return model_options
+
+
+def is_smart_security_ignored(model_class: Type[Model]) -> bool:
+    """
+    @return: whether permissions of the model are never delegated to owners
+    """
+    return bool(get_model_options(model_class).get(IGNORE_SMART_SECURITY_OPTION))
+
+
+def get_pinned_path(model_class: Type[Model]) -> Optional[str]:
+    """
+    @return: a path to the owner declared for the model or None if it's discovered
+    """
+    return get_model_options(model_class).get(OWNER_PATH_OPTION)
+
+
+def resolve_pinned_path(model_class: Type[Model], path: str) -> Type[Model]:
+    """
+    Follows the pinned path through the model graph.
+    @param model_class: a model which declares the path
+    @param path: a path of foreign keys' names separated by dots
+    @return: a model at the end of the path
+    @raise SmartSecurityIncorrectConfigException: when the path isn't valid
+    """
+    current_class = model_class
+    for accessor in path.split("."):
+        try:
+            field = current_class._meta.get_field(accessor)
+        except FieldDoesNotExist:
+            raise SmartSecurityIncorrectConfigException(
+                f"Owner path '{path}' of {model_class._meta.label} is wrong, "
+                f"{current_class._meta.label} doesn't have '{accessor}' field!"
+            )
+        # Materialized owners are maintained from the path, so they can't be a part of it.
+        if (
+            not isinstance(field, ForeignKey)
+            or isinstance(field, MaterializedOwnerField)
+            or field.null
+        ):
+            raise SmartSecurityIncorrectConfigException(
+                f"Owner path '{path}' of {model_class._meta.label} is wrong, "
+                f"'{accessor}' must be a not null foreign key!"
+            )
+        current_class = field.related_model
+    return current_class
+
+
+def validate_model_options(
+    security_model_classes: Iterable[Type[Model]],
+    models_classes: Optional[Iterable[Type[Model]]] = None,
+) -> None:
+    """
+    Validates options of all installed models against the model graph.
+    @param security_model_classes: owners' classes
+    @param models_classes: models to validate, all installed models by default
+    @raise SmartSecurityIncorrectConfigException: when options are wrong
+    """
+    for label in _get_configured_options():
+        try:
+            apps.get_model(label)
+        except (LookupError, ValueError) as e:
+            raise SmartSecurityIncorrectConfigException(
+                f"{SMART_SECURITY_MODEL_OPTIONS_SETTING} setting is wrong: {e}"
+            )
+    security_model_classes = list(security_model_classes)
+    if models_classes is None:
+        models_classes = apps.get_models()
+    for model_class in models_classes:
+        path = get_pinned_path(model_class)
+        if path is None:
+            continue
+        if is_smart_security_ignored(model_class):
+            raise SmartSecurityIncorrectConfigException(
+                f"{model_class._meta.label} can't both ignore smart security "
+                f"and pin owner path!"
+            )
+        owner_class = resolve_pinned_path(model_class, path)
+        if owner_class not in security_model_classes:
+            raise SmartSecurityIncorrectConfigException(
+                f"Owner path '{path}' of {model_class._meta.label} must lead "
+                f"to an owner model, current is {owner_class._meta.label}!"
+            )
+
+
+def _get_configured_options() -> Dict[str, Dict[str, Any]]:
+    configured_options = getattr(settings, SMART_SECURITY_MODEL_OPTIONS_SETTING, {})
+    return {label.lower(): value for label, value in configured_options.items()}
@@ -0,0 +1,92 @@
+from typing import Any, Iterable, Optional, Tuple, Type
+
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Model, QuerySet
+from guardian.utils import get_group_obj_perms_model, get_user_obj_perms_model
+
+DIRECT_OBJECT_FIELD = "content_object"
+GENERIC_OBJECT_FIELD = "object_pk"
+
+
+def get_permissions_models(
+    content_type: ContentType,
+) -> Tuple[Type[Model], Type[Model]]:
+    """
+    Returns models of user and group object permissions of the content type.
+    Direct permission models with a foreign key to the object are preferred
+    to guardian's generic ones, when they're declared.
+    @param content_type: a content type of objects
+    @return: user's and group's object permission models
+    """
+    model_class = content_type.model_class()
+    return get_user_obj_perms_model(model_class), get_group_obj_perms_model(model_class)
+
+
+def is_direct_permissions_model(permissions_model: Type[Model]) -> bool:
+    return not permissions_model.objects.is_generic()
+
+
+def get_object_field(permissions_model: Type[Model]) -> str:
+    """
+    @return: a field with object's primary key, a foreign key of direct
+    permission models or a text field of generic ones
+    """
+    if is_direct_permissions_model(permissions_model):
+        return DIRECT_OBJECT_FIELD
+    return GENERIC_OBJECT_FIELD
+
+
+def filter_object_permissions(
+    permissions_model: Type[Model],
+    content_type: ContentType,
+    object_pks: Optional[Iterable[Any]] = None,
+    **filters: Any,
+) -> QuerySet:
+    """
+    Filters object permissions of objects of the content type.
+    Direct permission models are filtered by the foreign key,
+    so an index of the object is used instead of comparing text.
+    @param permissions_model: a user's or group's object permission model
+    @param content_type: a content type of objects
+    @param object_pks: primary keys of objects, all objects by default
+    @param filters: other filters, e.g. a user or a permission
+    @return: a queryset of object permissions
+    """
+    if is_direct_permissions_model(permissions_model):
+        object_field = DIRECT_OBJECT_FIELD
+    else:
+        object_field = GENERIC_OBJECT_FIELD
+        filters["content_type"] = content_type
+        if object_pks is not None:
+            object_pks = [str(object_pk) for object_pk in object_pks]
+    if object_pks is not None:
+        filters[f"{object_field}__in"] = object_pks
+    return permissions_model.objects.filter(**filters)
+
+
+def build_object_permission(
+    permissions_model: Type[Model],
+    permission: Permission,
+    object_pk: Any,
+    **identity: Any,
+) -> Model:
+    """
+    Builds an object permission, which isn't saved.
+    @param permissions_model: a user's or group's object permission model
+    @param permission: a permission to grant
+    @param object_pk: a primary key of the object
+    @param identity: a user or a group, e.g. user=user
+    @return: an object permission
+    """
+    if is_direct_permissions_model(permissions_model):
+        object_attname = permissions_model._meta.get_field(DIRECT_OBJECT_FIELD).attname
+        return permissions_model(
+            permission=permission, **{object_attname: object_pk}, **identity
+        )
+    return permissions_model(
+        permission=permission,
+        content_type=permission.content_type,
+        object_pk=str(object_pk),
+        **identity,
+    )
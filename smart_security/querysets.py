@@ -0,0 +1,47 @@
+from django.db.models import Manager, QuerySet
+from django.db.models.constants import LOOKUP_SEP
+
+from smart_security.fields import get_materialized_owner_field
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+
+class SmartSecurityQuerySet(QuerySet):
+    def with_owner(self, only_path_columns: bool = False) -> "SmartSecurityQuerySet":
+        """
+        Loads objects together with objects on the path to the owner,
+        so resolving the owner doesn't need any extra query.
+        @param only_path_columns: load only primary keys and foreign keys
+        of objects on the path and don't join the owner's table
+        @return: a queryset with related objects on the path selected
+        """
+        backend = SmartSecurityObjectPermissionBackend
+        security_model_class = backend._get_owner_model_class(self.model)
+        if security_model_class is None:
+            return self.all()
+        field = get_materialized_owner_field(
+            model_class=self.model, security_model_class=security_model_class
+        )
+        if field is not None and not field.null:
+            # The owner's primary key is already a column of the model.
+            if only_path_columns:
+                return self.all()
+            return self.select_related(field.name)
+        accessors = backend._find_shortest_accessor(
+            model_class=self.model, security_model_class=security_model_class
+        )
+        if not only_path_columns:
+            return self.select_related(LOOKUP_SEP.join(accessors))
+        related_accessors = accessors[:-1]
+        if not related_accessors:
+            return self.all()
+        fields = [field.name for field in self.model._meta.concrete_fields]
+        model_class = self.model
+        for index, accessor in enumerate(related_accessors, start=1):
+            model_class = model_class._meta.get_field(accessor).related_model
+            prefix = related_accessors[:index]
+            fields.append(LOOKUP_SEP.join(prefix + [model_class._meta.pk.name]))
+            fields.append(LOOKUP_SEP.join(prefix + [accessors[index]]))
+        return self.select_related(LOOKUP_SEP.join(related_accessors)).only(*fields)
+
+
+SmartSecurityManager = Manager.from_queryset(SmartSecurityQuerySet)
@@ -0,0 +1,352 @@
+import re
+from typing import Dict, List, Optional, Type, Set, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Model
+from django.utils.module_loading import import_string
+from guardian.ctypes import get_content_type
+
+from smart_security.constants import (
+    SMART_SECURITY_PATH_COST_ESTIMATOR_SETTING,
+    DEFAULT_PATH_COST_ESTIMATOR,
+)
+from smart_security.estimators import PathCostEstimator
+from smart_security.options import (
+    get_pinned_path,
+    is_smart_security_ignored,
+    resolve_pinned_path,
+)
+from smart_security.utils import (
+    PathCandidate,
+    ReverseDijkstraModelSearch,
+    normalize_security_model_classes,
+    SECURITY_MODEL_CLASSES,
+    OWNER_PATH,
+    PINNED_PATHS_DICT,
+)
+
+OWNER_PATHS_DICT = Dict[Type[Model], Optional[OWNER_PATH]]
+TRANSLATION = Tuple[str, ContentType]
+TRANSLATIONS_DICT = Dict[Tuple[Type[Model], str, Type[Model]], Optional[TRANSLATION]]
+PRELOADED_CODENAMES_DICT = Dict[Tuple[Type[Model], str, Type[Model]], Optional[str]]
+
+
+class SecurityModelCache:
+    """
+    This class keeps resolved owners' classes and their content types,
+    so the SMART_SECURITY_MODEL_CLASS setting isn't parsed on every check.
+    """
+
+    def __init__(self) -> None:
+        self.security_model_classes: Optional[Tuple[Type[Model], ...]] = None
+        self._content_types: Dict[Type[Model], ContentType] = {}
+
+    def get_content_type(self, security_model_class: Type[Model]) -> ContentType:
+        content_type = self._content_types.get(security_model_class)
+        if content_type is None:
+            content_type = get_content_type(security_model_class)
+            self._content_types[security_model_class] = content_type
+        return content_type
+
+    def has_content_type(self, security_model_class: Type[Model]) -> bool:
+        return security_model_class in self._content_types
+
+    def clear(self) -> None:
+        self.security_model_classes = None
+        self._content_types = {}
+
+
+class OwnerPathRegistry:
+    """
+    This class keeps precomputed paths to owners' models.
+    Paths for all installed models are computed once per owners' classes,
+    so permission checking only needs a dictionary lookup.
+    """
+
+    def __init__(self) -> None:
+        self._owners_and_paths: Dict[Tuple[Type[Model], ...], OWNER_PATHS_DICT] = {}
+
+    def build(self, security_model_classes: SECURITY_MODEL_CLASSES) -> OWNER_PATHS_DICT:
+        """
+        Computes the nearest owner's class and path to it for all installed models.
+        @param security_model_classes: a owner's class or owners' classes
+        ordered by priority
+        @return: a mapping from model to the nearest owner's class and path to it
+        """
+        key = tuple(normalize_security_model_classes(security_model_classes))
+        owners_and_paths = self._search(key, apps.get_models(include_auto_created=True))
+        self._owners_and_paths[key] = owners_and_paths
+        return owners_and_paths
+
+    def get_owner_and_path(
+        self, model_class: Type[Model], security_model_classes: SECURITY_MODEL_CLASSES
+    ) -> Optional[OWNER_PATH]:
+        """
+        Returns the nearest owner's class and the shortest path to it.
+        @param model_class: a model to get path
+        @param security_model_classes: a owner's class or owners' classes
+        ordered by priority
+        @return: the owner's class and path to it or None if it doesn't exist
+        """
+        key = tuple(normalize_security_model_classes(security_model_classes))
+        owners_and_paths = self._owners_and_paths.get(key)
+        if owners_and_paths is None:
+            owners_and_paths = self.build(key)
+        try:
+            return owners_and_paths[model_class]
+        except KeyError:
+            # Model isn't registered in the app registry.
+            owner_and_path = self._search(key, list(owners_and_paths) + [model_class])[
+                model_class
+            ]
+            owners_and_paths[model_class] = owner_and_path
+            return owner_and_path
+
+    def get_path(
+        self, model_class: Type[Model], security_model_class: SECURITY_MODEL_CLASSES
+    ) -> Optional[str]:
+        """
+        Returns the shortest path from model to the nearest owner's class.
+        @param model_class: a model to get path
+        @param security_model_class: a owner's class or owners' classes
+        ordered by priority
+        @return: a path to the owner's class or None if it doesn't exist
+        """
+        owner_and_path = self.get_owner_and_path(
+            model_class=model_class, security_model_classes=security_model_class
+        )
+        if owner_and_path is None:
+            return None
+        return owner_and_path[1]
+
+    def load(
+        self,
+        security_model_classes: SECURITY_MODEL_CLASSES,
+        owners_and_paths: OWNER_PATHS_DICT,
+    ) -> None:
+        """
+        Loads precomputed paths, e.g. from the owner path manifest.
+        @param security_model_classes: a owner's class or owners' classes
+        ordered by priority
+        @param owners_and_paths: a mapping from model to the nearest owner's class
+        and path to it
+        """
+        key = tuple(normalize_security_model_classes(security_model_classes))
+        self._owners_and_paths[key] = dict(owners_and_paths)
+
+    def clear(self) -> None:
+        self._owners_and_paths.clear()
+
+    def get_path_candidates(
+        self, model_class: Type[Model], security_model_classes: SECURITY_MODEL_CLASSES
+    ) -> List[PathCandidate]:
+        """
+        Searches paths again to explain why the path of the model was chosen.
+        @param model_class: a model to get paths
+        @param security_model_classes: a owner's class or owners' classes
+        ordered by priority
+        @return: the cheapest path through every relationship of the model
+        leading to an owner, ordered from the chosen one
+        """
+        key = tuple(normalize_security_model_classes(security_model_classes))
+        if is_smart_security_ignored(model_class):
+            return []
+        models_classes = apps.get_models(include_auto_created=True)
+        if model_class not in models_classes:
+            models_classes.append(model_class)
+        search = self._create_search(key, models_classes)
+        search.search()
+        return search.get_candidates(model_class)
+
+    @classmethod
+    def _search(
+        cls,
+        security_model_classes: Tuple[Type[Model], ...],
+        models_classes: List[Type[Model]],
+    ) -> OWNER_PATHS_DICT:
+        """
+        Finds paths of the models, respecting paths pinned
+        and models ignored with models' options.
+        """
+        owners_and_paths = cls._create_search(
+            security_model_classes, models_classes
+        ).search()
+        # Ignored owners aren't reached by the search, but they're still its starts.
+        for model_class in models_classes:
+            if is_smart_security_ignored(model_class):
+                owners_and_paths[model_class] = None
+        return owners_and_paths
+
+    @classmethod
+    def _create_search(
+        cls,
+        security_model_classes: Tuple[Type[Model], ...],
+        models_classes: List[Type[Model]],
+    ) -> ReverseDijkstraModelSearch:
+        pinned_paths: PINNED_PATHS_DICT = {}
+        for model_class in models_classes:
+            pinned_owner_and_path = cls._get_pinned_owner_and_path(
+                model_class, security_model_classes
+            )
+            if pinned_owner_and_path is not None:
+                pinned_paths[model_class] = pinned_owner_and_path
+        ignored_models_classes = [
+            model_class
+            for model_class in models_classes
+            if is_smart_security_ignored(model_class)
+        ]
+        return ReverseDijkstraModelSearch(
+            security_model_classes=security_model_classes,
+            models_classes=models_classes,
+            cost_estimator=cls._get_cost_estimator(),
+            pinned_paths=pinned_paths,
+            ignored_models_classes=ignored_models_classes,
+        )
+
+    @classmethod
+    def _get_pinned_owner_and_path(
+        cls, model_class: Type[Model], security_model_classes: Tuple[Type[Model], ...]
+    ) -> Optional[OWNER_PATH]:
+        """
+        Returns the owner and path pinned with model's options
+        or None when the path is discovered. A pinned path is used
+        only when it leads to one of owners' classes.
+        """
+        path = get_pinned_path(model_class)
+        if path is None:
+            return None
+        owner_class = resolve_pinned_path(model_class, path)
+        if owner_class not in security_model_classes:
+            return None
+        return owner_class, path
+
+    @classmethod
+    def _get_cost_estimator(cls) -> PathCostEstimator:
+        cost_estimator_class = import_string(
+            getattr(
+                settings,
+                SMART_SECURITY_PATH_COST_ESTIMATOR_SETTING,
+                DEFAULT_PATH_COST_ESTIMATOR,
+            )
+        )
+        return cost_estimator_class()
+
+
+class PermissionTranslationIndex:
+    """
+    This class translates model's permissions into owner's permissions.
+    Permissions are loaded from the database once
+    and the index is reset whenever permissions change.
+    """
+
+    def __init__(self) -> None:
+        self._codenames: Optional[Dict[int, Set[str]]] = None
+        self._translations: TRANSLATIONS_DICT = {}
+        self._preloaded_owner_codenames: PRELOADED_CODENAMES_DICT = {}
+        self._preloaded_model_codenames: Dict[Type[Model], Set[str]] = {}
+
+    def translate(
+        self, model_class: Type[Model], codename: str, security_model_class: Type[Model]
+    ) -> Optional[TRANSLATION]:
+        """
+        Translates model's permission into owner's permission.
+        @param model_class: a model which permission is checked
+        @param codename: a permission's codename without app label
+        @param security_model_class: a owner's class
+        @return: owner's codename and content type
+        or None if the owner doesn't have such permission
+        """
+        key = (model_class, codename, security_model_class)
+        try:
+            return self._translations[key]
+        except KeyError:
+            pass
+        owner_content_type = security_model_cache.get_content_type(security_model_class)
+        translation: Optional[TRANSLATION] = None
+        if key in self._preloaded_owner_codenames:
+            preloaded_owner_codename = self._preloaded_owner_codenames[key]
+            if preloaded_owner_codename is not None:
+                translation = (preloaded_owner_codename, owner_content_type)
+            self._translations[key] = translation
+            return translation
+        owner_codename = self._translate_codename(
+            model_class=model_class,
+            codename=codename,
+            security_model_class=security_model_class,
+        )
+        if owner_codename in self._get_codenames(owner_content_type.pk):
+            translation = (owner_codename, owner_content_type)
+        self._translations[key] = translation
+        return translation
+
+    def get_model_codenames(self, model_class: Type[Model]) -> Set[str]:
+        """
+        Returns codenames of all permissions of the model.
+        @param model_class: a model to get permissions
+        @return: set of codenames
+        """
+        model_codenames = self._preloaded_model_codenames.get(model_class)
+        if model_codenames is not None:
+            return model_codenames
+        return self._get_codenames(get_content_type(model_class).pk)
+
+    def preload(self, owner_codenames: PRELOADED_CODENAMES_DICT) -> None:
+        """
+        Preloads translations, e.g. from the owner path manifest,
+        so they don't need the database. Preloaded translations are
+        discarded with the rest of the index whenever permissions change.
+        @param owner_codenames: a mapping from model, its codename
+        and owner's class to owner's codename or None if it can't be delegated
+        """
+        self._preloaded_owner_codenames = dict(owner_codenames)
+        self._preloaded_model_codenames = {}
+        for model_class, codename, _ in owner_codenames:
+            self._preloaded_model_codenames.setdefault(model_class, set()).add(codename)
+
+    def is_loaded(self) -> bool:
+        return self._codenames is not None
+
+    def load(self) -> Dict[int, Set[str]]:
+        """
+        Loads codenames of all permissions from the database.
+        @return: a mapping from content type's id to codenames
+        """
+        codenames: Dict[int, Set[str]] = {}
+        permissions = Permission.objects.order_by().values_list(
+            "content_type_id", "codename"
+        )
+        for permission_content_type_id, codename in permissions:
+            codenames.setdefault(permission_content_type_id, set()).add(codename)
+        self._codenames = codenames
+        return codenames
+
+    def clear(self) -> None:
+        self._codenames = None
+        self._translations = {}
+        self._preloaded_owner_codenames = {}
+        self._preloaded_model_codenames = {}
+
+    def _get_codenames(self, content_type_id: int) -> Set[str]:
+        codenames = self._codenames
+        if codenames is None:
+            codenames = self.load()
+        return codenames.get(content_type_id, set())
+
+    @classmethod
+    def _translate_codename(
+        cls, model_class: Type[Model], codename: str, security_model_class: Type[Model]
+    ) -> str:
+        # Model name is replaced only when it's a whole part of the codename,
+        # e.g. "view_broker" becomes "view_owner" but "view_testbroker" stays intact.
+        model_name_regex = (
+            r"(?<![^_])" + re.escape(model_class._meta.model_name) + r"(?![^_])"
+        )
+        return re.sub(model_name_regex, security_model_class._meta.model_name, codename)
+
+
+security_model_cache = SecurityModelCache()
+owner_path_registry = OwnerPathRegistry()
+permission_translation_index = PermissionTranslationIndex()
@@ -0,0 +1,245 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
+
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Model, QuerySet, Q
+from django.db.models.constants import LOOKUP_SEP
+from guardian.core import ObjectPermissionChecker
+from guardian.ctypes import get_content_type
+from guardian.shortcuts import get_objects_for_user as guardian_get_objects_for_user
+from guardian.utils import get_identity
+
+from smart_security.fields import get_materialized_owner_field
+from smart_security.permission_models import (
+    build_object_permission,
+    filter_object_permissions,
+    get_permissions_models,
+)
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+
+def get_objects_for_user(
+    user: Any,
+    perm: str,
+    klass: Union[Type[Model], QuerySet],
+    with_superuser: bool = True,
+) -> QuerySet:
+    """
+    Returns objects which user has the permission for.
+    When the permission can be delegated to the owner, objects are filtered
+    in the database with a subquery on the owner's object permissions.
+    @param user: a user to check permission
+    @param perm: a permission of the model, e.g. "view_samplemodel"
+    @param klass: a model or a queryset to filter
+    @param with_superuser: whether to return all objects for superuser
+    @return: a queryset of objects which user has the permission for
+    """
+    if isinstance(klass, QuerySet):
+        queryset = klass
+    else:
+        queryset = klass._default_manager.all()
+    if user.is_authenticated and not user.is_active:
+        return queryset.none()
+    if with_superuser and user.is_superuser:
+        return queryset
+    backend = SmartSecurityObjectPermissionBackend
+    model_class = queryset.model
+    security_model_class = backend._get_owner_model_class(model_class)
+    codename = backend._get_permission_codename(perm).split(".", maxsplit=1)[-1]
+    owner_perm = None
+    if security_model_class is not None:
+        owner_perm = backend._get_owner_perm(
+            model_class=model_class,
+            perm=codename,
+            security_model_class=security_model_class,
+        )
+    if security_model_class is None or owner_perm is None:
+        return guardian_get_objects_for_user(
+            user,
+            codename,
+            klass=queryset,
+            with_superuser=with_superuser,
+            accept_global_perms=False,
+        )
+    owners = guardian_get_objects_for_user(
+        user,
+        owner_perm,
+        klass=security_model_class,
+        with_superuser=with_superuser,
+        accept_global_perms=False,
+    )
+    accessors = backend._find_shortest_accessor(
+        model_class=model_class, security_model_class=security_model_class
+    )
+    lookup = LOOKUP_SEP.join(accessors + ["pk", "in"])
+    field = get_materialized_owner_field(
+        model_class=model_class, security_model_class=security_model_class
+    )
+    if field is None:
+        return queryset.filter(**{lookup: owners.values("pk")})
+    materialized_lookup = Q(**{f"{field.name}__in": owners.values("pk")})
+    if not field.null:
+        return queryset.filter(materialized_lookup)
+    # Objects which materialized owner isn't filled yet are filtered by the path.
+    return queryset.filter(
+        materialized_lookup
+        | Q(**{f"{field.name}__isnull": True, lookup: owners.values("pk")})
+    )
+
+
+def get_perms(user_or_group: Any, obj: Model) -> List[str]:
+    """
+    Returns permissions of the user or group for the object,
+    including permissions delegated to the owner.
+    @param user_or_group: a user or a group to get permissions
+    @param obj: an object to get permissions
+    @return: list of codenames of the object's permissions
+    """
+    backend = SmartSecurityObjectPermissionBackend()
+    if isinstance(user_or_group, Group):
+        checker = ObjectPermissionChecker(user_or_group)
+        return list(backend._get_perms(obj=obj, get_perms=checker.get_perms))
+    return list(backend.get_all_permissions(user_or_group, obj))
+
+
+def assign_perms(
+    perms: Iterable[Union[str, Permission]],
+    users_or_groups: Iterable[Any],
+    objects: Iterable[Model],
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Assigns object permissions to many users and groups at once.
+    Permissions which can be delegated are assigned to owners of objects,
+    so model's permissions, e.g. "view_samplemodel", can be passed.
+    Existing permissions are skipped.
+    @param perms: permissions of objects' models
+    @param users_or_groups: users and groups to assign permissions to
+    @param objects: objects to assign permissions for
+    @param batch_size: number of rows inserted with a single query
+    @return: number of assigned permissions, including already existing ones
+    """
+    users, groups = _split_users_and_groups(users_or_groups)
+    permissions_models: Dict[ContentType, Tuple[Type[Model], Type[Model]]] = {}
+    object_permissions: Dict[Type[Model], List[Model]] = {}
+    for permission, object_pk in _get_grants(perms, objects):
+        content_type = permission.content_type
+        if content_type not in permissions_models:
+            permissions_models[content_type] = get_permissions_models(content_type)
+        user_model, group_model = permissions_models[content_type]
+        object_permissions.setdefault(user_model, []).extend(
+            build_object_permission(user_model, permission, object_pk, user=user)
+            for user in users
+        )
+        object_permissions.setdefault(group_model, []).extend(
+            build_object_permission(group_model, permission, object_pk, group=group)
+            for group in groups
+        )
+    for permissions_model, model_object_permissions in object_permissions.items():
+        permissions_model.objects.bulk_create(
+            model_object_permissions, batch_size=batch_size, ignore_conflicts=True
+        )
+    return sum(
+        len(model_object_permissions)
+        for model_object_permissions in object_permissions.values()
+    )
+
+
+def remove_perms(
+    perms: Iterable[Union[str, Permission]],
+    users_or_groups: Iterable[Any],
+    objects: Iterable[Model],
+    batch_size: int = 1000,
+) -> int:
+    """
+    Removes object permissions of many users and groups at once.
+    Permissions which can be delegated are removed from owners of objects.
+    @param perms: permissions of objects' models
+    @param users_or_groups: users and groups to remove permissions from
+    @param objects: objects to remove permissions for
+    @param batch_size: number of objects' permissions removed with a single query
+    @return: number of removed permissions
+    """
+    object_pks_by_permission: Dict[Permission, List[Any]] = {}
+    for permission, object_pk in sorted(
+        _get_grants(perms, objects), key=lambda grant: (grant[0].pk, str(grant[1]))
+    ):
+        object_pks_by_permission.setdefault(permission, []).append(object_pk)
+    users, groups = _split_users_and_groups(users_or_groups)
+    removed = 0
+    for permission, object_pks in object_pks_by_permission.items():
+        content_type = permission.content_type
+        user_model, group_model = get_permissions_models(content_type)
+        for permissions_model, identity_field, identities in (
+            (user_model, "user", users),
+            (group_model, "group", groups),
+        ):
+            if not identities:
+                continue
+            for start in range(0, len(object_pks), batch_size):
+                end = start + batch_size
+                removed += filter_object_permissions(
+                    permissions_model,
+                    content_type,
+                    object_pks[start:end],
+                    permission=permission,
+                    **{f"{identity_field}__in": identities},
+                ).delete()[0]
+    return removed
+
+
+def _get_grants(
+    perms: Iterable[Union[str, Permission]], objects: Iterable[Model]
+) -> Set[Tuple[Permission, Any]]:
+    """
+    Translates model's permissions into permissions of owners
+    like permission checking does.
+    @return: permissions and primary keys of objects to grant them for
+    """
+    backend = SmartSecurityObjectPermissionBackend()
+    objects = list(objects)
+    codenames_and_object_pks: Set[Tuple[ContentType, str, Any]] = set()
+    for perm in perms:
+        codename = backend._get_permission_codename(perm)
+        for target_obj, target_perm in backend._get_objs_and_perms(objects, codename):
+            codenames_and_object_pks.add(
+                (
+                    get_content_type(target_obj),
+                    target_perm.split(".", maxsplit=1)[-1],
+                    target_obj.pk,
+                )
+            )
+    if not codenames_and_object_pks:
+        return set()
+    permissions_queryset = Permission.objects.select_related("content_type").filter(
+        content_type__in={ct for ct, _, _ in codenames_and_object_pks},
+        codename__in={codename for _, codename, _ in codenames_and_object_pks},
+    )
+    permissions = {
+        (permission.content_type_id, permission.codename): permission
+        for permission in permissions_queryset.order_by()
+    }
+    grants = set()
+    for content_type, codename, object_pk in codenames_and_object_pks:
+        try:
+            permission = permissions[(content_type.pk, codename)]
+        except KeyError:
+            raise Permission.DoesNotExist(
+                f"Permission {codename} of {content_type} doesn't exist!"
+            )
+        grants.add((permission, object_pk))
+    return grants
+
+
+def _split_users_and_groups(
+    users_or_groups: Iterable[Any],
+) -> Tuple[List[Any], List[Group]]:
+    users = []
+    groups = []
+    for user_or_group in users_or_groups:
+        user, group = get_identity(user_or_group)
+        if user is not None:
+            users.append(user)
+        else:
+            groups.append(group)
+    return users, groups
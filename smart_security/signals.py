@@ -0,0 +1,226 @@
+from typing import Any, Dict, Optional, Iterable, Set, Type
+
+from django.contrib.auth.models import Permission
+from django.core.signals import setting_changed
+from django.db.models.signals import post_save, post_delete, post_migrate, pre_save
+from django.db.models import Field, Model
+from django.dispatch import receiver
+
+from smart_security.cache import get_owner_cache
+from smart_security.materialized import (
+    clear_cascades,
+    get_cascaded_attnames,
+    update_materialized_owners,
+)
+from smart_security.metrics import reset_metrics_collector
+
+from smart_security.constants import (
+    SMART_SECURITY_METRICS_COLLECTOR_SETTING,
+    SMART_SECURITY_MODEL_CLASS_SETTING,
+    SMART_SECURITY_MODEL_OPTIONS_SETTING,
+    SMART_SECURITY_PATH_COST_ESTIMATOR_SETTING,
+    SMART_SECURITY_PATH_WEIGHTS_SETTING,
+)
+from smart_security.registry import (
+    owner_path_registry,
+    permission_translation_index,
+    security_model_cache,
+)
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+# An instance's attribute with values of relationships before saving.
+OLD_PATH_VALUES_ATTRIBUTE = "_smart_security_old_path_values"
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_migrate)
+def reset_permission_translation_index(**kwargs) -> None:
+    permission_translation_index.clear()
+
+
+@receiver(post_migrate)
+def reset_security_model_content_type(**kwargs) -> None:
+    security_model_cache.clear()
+
+
+@receiver(setting_changed)
+def reset_security_model_cache(setting: str, **kwargs) -> None:
+    if setting == SMART_SECURITY_MODEL_CLASS_SETTING:
+        security_model_cache.clear()
+
+
+@receiver(setting_changed)
+def reset_owner_path_registry(setting: str, **kwargs) -> None:
+    if setting in (
+        SMART_SECURITY_MODEL_OPTIONS_SETTING,
+        SMART_SECURITY_PATH_COST_ESTIMATOR_SETTING,
+        SMART_SECURITY_PATH_WEIGHTS_SETTING,
+    ):
+        owner_path_registry.clear()
+        clear_cascades()
+
+
+@receiver(setting_changed)
+def reset_metrics_collector_setting(setting: str, **kwargs) -> None:
+    if setting == SMART_SECURITY_METRICS_COLLECTOR_SETTING:
+        reset_metrics_collector()
+
+
+@receiver(pre_save)
+def record_path_values_before_save(
+    sender: Type[Model],
+    instance: Model,
+    raw: bool = False,
+    using: Optional[str] = None,
+    update_fields: Optional[Iterable[str]] = None,
+    **kwargs,
+) -> None:
+    """
+    Loads values of the instance's relationships on paths to owners
+    as they are in the database, so changes are handled only
+    when the values actually change.
+    """
+    old_values = None
+    if not raw and not instance._state.adding:
+        attnames = _get_saved_attnames(
+            model_class=sender,
+            attnames=_get_path_attnames(sender),
+            update_fields=update_fields,
+        )
+        if attnames:
+            old_values = (
+                sender._base_manager.using(using)
+                .filter(pk=instance.pk)
+                .values(*attnames)
+                .first()
+            )
+    if old_values is None:
+        instance.__dict__.pop(OLD_PATH_VALUES_ATTRIBUTE, None)
+    else:
+        setattr(instance, OLD_PATH_VALUES_ATTRIBUTE, old_values)
+
+
+@receiver(post_save)
+def invalidate_owner_cache_on_save(
+    sender: Type[Model],
+    instance: Model,
+    created: bool,
+    update_fields: Optional[Iterable[str]] = None,
+    **kwargs,
+) -> None:
+    if created:
+        return
+    _invalidate_owner_cache(
+        model_class=sender,
+        instance=instance,
+        update_fields=update_fields,
+        unchanged_fields=_get_unchanged_attnames(instance),
+    )
+
+
+@receiver(post_save)
+def update_materialized_owners_on_save(
+    sender: Type[Model],
+    instance: Model,
+    created: bool,
+    update_fields: Optional[Iterable[str]] = None,
+    raw: bool = False,
+    **kwargs,
+) -> None:
+    if created or raw:
+        return
+    update_materialized_owners(
+        instance=instance,
+        update_fields=update_fields,
+        unchanged_fields=_get_unchanged_attnames(instance),
+    )
+
+
+@receiver(post_delete)
+def invalidate_owner_cache_on_delete(
+    sender: Type[Model], instance: Model, **kwargs
+) -> None:
+    _invalidate_owner_cache(model_class=sender, instance=instance)
+
+
+def _invalidate_owner_cache(
+    model_class: Type[Model],
+    instance: Model,
+    update_fields: Optional[Iterable[str]] = None,
+    unchanged_fields: Iterable[str] = (),
+) -> None:
+    owner_cache = get_owner_cache()
+    if owner_cache is None:
+        return
+    first_field = _get_first_path_field(model_class)
+    if first_field is None:
+        # The model's relationships aren't on any path to the owner.
+        return
+    if update_fields is not None and not _get_saved_attnames(
+        model_class=model_class,
+        attnames={first_field.attname},
+        update_fields=update_fields,
+    ):
+        return
+    if first_field.attname in unchanged_fields:
+        return
+    owner_cache.invalidate(instance)
+
+
+def _get_first_path_field(model_class: Type[Model]) -> Optional[Field]:
+    """
+    @return: the model's relationship which starts the path to the owner
+    or None if the model has no path
+    """
+    path = owner_path_registry.get_path(
+        model_class=model_class,
+        security_model_class=(
+            SmartSecurityObjectPermissionBackend._get_security_model_classes()
+        ),
+    )
+    if not path:
+        return None
+    return model_class._meta.get_field(path.split(".")[0])
+
+
+def _get_path_attnames(model_class: Type[Model]) -> Set[str]:
+    """
+    @return: attribute names of the model's relationships which changes
+    must be handled after saving
+    """
+    attnames = get_cascaded_attnames(model_class)
+    if get_owner_cache() is not None:
+        first_field = _get_first_path_field(model_class)
+        if first_field is not None:
+            attnames.add(first_field.attname)
+    return attnames
+
+
+def _get_saved_attnames(
+    model_class: Type[Model],
+    attnames: Set[str],
+    update_fields: Optional[Iterable[str]],
+) -> Set[str]:
+    if update_fields is None:
+        return attnames
+    update_fields = set(update_fields)
+    return {
+        attname
+        for attname in attnames
+        if attname in update_fields
+        or model_class._meta.get_field(attname).name in update_fields
+    }
+
+
+def _get_unchanged_attnames(instance: Model) -> Set[str]:
+    """
+    @return: attribute names of relationships which values are the same
+    as before saving, empty if they weren't loaded
+    """
+    old_values: Dict[str, Any] = instance.__dict__.get(OLD_PATH_VALUES_ATTRIBUTE, {})
+    return {
+        attname
+        for attname, old_value in old_values.items()
+        if getattr(instance, attname) == old_value
+    }
@@ -1,23 +1,83 @@
+from functools import wraps
 from logging import getLogger
-from typing import Optional, Union, Type, List, Tuple
+from typing import (
+    Optional,
+    Union,
+    Type,
+    List,
+    Tuple,
+    Any,
+    Dict,
+    Iterable,
+    Set,
+    Callable,
+    cast,
+)
 
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import User, Permission
-from django.db.models import Model
-from guardian.backends import ObjectPermissionBackend
+from django.db.models import Model, ForeignKey, QuerySet
+from django.db.models.constants import LOOKUP_SEP
+from guardian.backends import ObjectPermissionBackend, check_support
+from guardian.core import ObjectPermissionChecker
 from guardian.ctypes import get_content_type
 
+from smart_security.cache import (
+    OwnerPermissionSnapshot,
+    get_decision_cache,
+    get_owner_cache,
+    get_owner_permission_snapshot,
+)
 from smart_security.constants import (
     SMART_SECURITY_MODEL_CLASS_SETTING,
+    SMART_SECURITY_OWNER_RESOLUTION_SETTING,
+    OWNER_RESOLUTION_QUERY,
+    OWNER_RESOLUTION_TRAVERSE,
+)
+from smart_security.exceptions import SmartSecurityIncorrectConfigException
+from smart_security.fields import get_materialized_owner_field
+from smart_security.metrics import (
+    COUNTER_DECISION_CACHE_HITS,
+    COUNTER_DECISION_CACHE_MISSES,
+    COUNTER_DELEGATED,
+    COUNTER_DIRECT,
+    COUNTER_OWNER_CACHE_HITS,
+    COUNTER_OWNER_CACHE_MISSES,
+    PHASE_CODENAME_TRANSLATION,
+    PHASE_GUARDIAN_CHECK,
+    PHASE_OWNER_RESOLUTION,
+    PHASE_PATH_LOOKUP,
+    PHASE_SECURITY_MODEL_RESOLUTION,
+    add_awaited_queries,
+    count_awaited_queries,
+    increment,
+    measure,
+    measure_awaits,
+)
+from smart_security.registry import (
+    owner_path_registry,
+    permission_translation_index,
+    security_model_cache,
 )
-from smart_security.utils import ModelOwnerPathFinder
 
 logger = getLogger("smart_security")
 
+ASYNC_ORM_SUPPORTED = hasattr(QuerySet, "__aiter__")
+
+NOT_LOADED_DICT = Dict[Tuple[ForeignKey, Tuple[str, ...]], List[Tuple[int, Model]]]
 
-class SmartSecurityIncorrectConfigException(Exception):
-    pass
+
+def _sync_to_async(function: Callable) -> Callable:
+    # asgiref is installed with Django 3.0+, it's needed only by async checks.
+    from asgiref.sync import sync_to_async
+
+    @wraps(function)
+    def counted_function(*args: Any, **kwargs: Any) -> Any:
+        with count_awaited_queries():
+            return function(*args, **kwargs)
+
+    return sync_to_async(counted_function)
 
 
 class SmartSecurityObjectPermissionBackend(ObjectPermissionBackend):
@@ -25,39 +85,681 @@ class SmartSecurityObjectPermissionBackend(ObjectPermissionBackend):
         self, user_obj: User, perm: Union[str, Permission], obj: Optional[Model] = None
     ) -> bool:
         perm = self._get_permission_codename(perm)
-        if obj is not None:
-            obj, perm = self._get_obj_and_perm(obj, perm)
+        if obj is None:
+            return super().has_perm(user_obj, perm, obj=obj)
+        obj, perm = self._get_obj_and_perm(obj, perm)
+        return self._has_perm(user_obj, perm, obj)
+
+    async def ahas_perm(
+        self, user_obj: User, perm: Union[str, Permission], obj: Optional[Model] = None
+    ) -> bool:
+        """
+        Asynchronous variant of has_perm for ASGI views.
+        The owner is resolved with the async ORM when Django provides it,
+        the rest of blocking calls run in a single thread hop.
+        """
+        perm = self._get_permission_codename(perm)
+        if obj is None or not self._can_resolve_owners_async():
+            return await _sync_to_async(self.has_perm)(user_obj, perm, obj)
+        await self._aload_metadata()
+        obj, perm = await self._aget_obj_and_perm(obj, perm)
+        return await _sync_to_async(self._has_perm)(user_obj, perm, obj)
+
+    def _has_perm(self, user_obj: User, perm: str, obj: Model) -> bool:
+        decision_cache = get_decision_cache()
+        if decision_cache is None:
+            with measure(PHASE_GUARDIAN_CHECK):
+                return self._check_perm(user_obj, perm, obj)
+        key = (
+            user_obj.pk,
+            get_content_type(obj).pk,
+            str(obj.pk),
+            perm.split(".", maxsplit=1)[-1],
+        )
+        decision = decision_cache.get(key)
+        if decision is None:
+            increment(COUNTER_DECISION_CACHE_MISSES)
+            with measure(PHASE_GUARDIAN_CHECK):
+                decision = self._check_perm(user_obj, perm, obj)
+            decision_cache.set(key, decision)
+        else:
+            increment(COUNTER_DECISION_CACHE_HITS)
+        return decision
+
+    def _check_perm(self, user_obj: User, perm: str, obj: Model) -> bool:
+        snapshot = get_owner_permission_snapshot()
+        if snapshot is not None:
+            support, user_obj = check_support(user_obj, obj)
+            if not support:
+                return False
+            decision = self._check_snapshot_perm(snapshot, user_obj, perm, obj)
+            if decision is not None:
+                return decision
         return super().has_perm(user_obj, perm, obj=obj)
 
-    def _get_obj_and_perm(self, obj: Model, perm: str) -> Tuple[Model, str]:
-        security_model_class = self._get_security_model_class()
+    @classmethod
+    def _check_snapshot_perm(
+        cls, snapshot: OwnerPermissionSnapshot, user_obj: Any, perm: str, obj: Model
+    ) -> Optional[bool]:
+        """
+        Answers owner's permission from the snapshot
+        or returns None if it must be checked by guardian.
+        """
+        app_label, _, codename = perm.rpartition(".")
+        if obj.__class__ not in cls._get_security_model_classes() or (
+            app_label and app_label != obj._meta.app_label
+        ):
+            return None
+        if not user_obj.is_active:
+            return False
+        if user_obj.is_superuser:
+            return True
+        return snapshot.has_perm(user_obj, codename, obj)
+
+    def get_all_permissions(
+        self, user_obj: User, obj: Optional[Model] = None
+    ) -> Set[str]:
+        """
+        Returns permissions of the object, including permissions delegated
+        to the owner. The owner is resolved once and all its permissions
+        are fetched at once.
+        """
+        support, user_obj = check_support(user_obj, obj)
+        if not support:
+            return set()
+        checker = ObjectPermissionChecker(user_obj)
+        return self._get_perms(obj=cast(Model, obj), get_perms=checker.get_perms)
+
+    def get_group_permissions(
+        self, user_obj: User, obj: Optional[Model] = None
+    ) -> Set[str]:
+        """
+        Returns permissions of the object granted by user's groups,
+        including permissions delegated to the owner.
+        """
+        support, user_obj = check_support(user_obj, obj)
+        if not support:
+            return set()
+        checker = ObjectPermissionChecker(user_obj)
+        return self._get_perms(obj=cast(Model, obj), get_perms=checker.get_group_perms)
+
+    def _get_perms(
+        self, obj: Model, get_perms: Callable[[Model], Iterable[str]]
+    ) -> Set[str]:
         model_class = obj.__class__
-        if security_model_class != model_class:
-            owner = self._get_owner(
+        security_model_class = self._get_owner_model_class(model_class)
+        if security_model_class is None:
+            return set(get_perms(obj))
+        model_codenames = permission_translation_index.get_model_codenames(model_class)
+        owner_perms_by_codename: Dict[str, str] = {}
+        for codename in model_codenames:
+            owner_perm = self._get_owner_perm(
                 model_class=model_class,
+                perm=codename,
                 security_model_class=security_model_class,
+            )
+            if owner_perm is not None:
+                owner_perms_by_codename[codename] = owner_perm
+        perms: Set[str] = set()
+        if owner_perms_by_codename:
+            owner = self._get_owner(
+                model_class=model_class,
                 obj=obj,
+                security_model_class=security_model_class,
+            )
+            owner_perms = set(get_perms(owner))
+            perms.update(
+                codename
+                for codename, owner_perm in owner_perms_by_codename.items()
+                if owner_perm in owner_perms
             )
-            owner_perm = perm.replace(
-                self._get_permission_name_from_model_class(model_class=model_class),
-                self._get_permission_name_from_model_class(
-                    model_class=security_model_class
-                ),
+        if len(owner_perms_by_codename) < len(model_codenames):
+            # Permissions which can't be delegated are checked on the object itself.
+            perms.update(
+                codename
+                for codename in get_perms(obj)
+                if codename not in owner_perms_by_codename
             )
-            if self._should_apply_smart_security(owner, owner_perm):
-                obj = owner
-                perm = owner_perm
+        return perms
+
+    def has_perm_many(
+        self, user_obj: User, perm: Union[str, Permission], objects: Iterable[Model]
+    ) -> List[bool]:
+        """
+        Checks permission for many objects with a constant number of queries.
+        Owners are resolved with one query per model
+        and permissions are fetched with one prefetch per checked model.
+        @param user_obj: a user to check permission
+        @param perm: a permission to check
+        @param objects: objects to check permission for
+        @return: results of permission checking in order of given objects
+        """
+        objects = list(objects)
+        if not objects:
+            return []
+        perm = self._get_permission_codename(perm)
+        support, user_obj = check_support(user_obj, objects[0])
+        if not support:
+            return [False] * len(objects)
+        checked_objects_and_perms = self._get_objs_and_perms(objects, perm)
+        return self._measure_check_perms(user_obj, checked_objects_and_perms)
+
+    async def ahas_perm_many(
+        self, user_obj: User, perm: Union[str, Permission], objects: Iterable[Model]
+    ) -> List[bool]:
+        """
+        Asynchronous variant of has_perm_many.
+        @param user_obj: a user to check permission
+        @param perm: a permission to check
+        @param objects: objects to check permission for
+        @return: results of permission checking in order of given objects
+        """
+        objects = list(objects)
+        if not objects or not self._can_resolve_owners_async():
+            return await _sync_to_async(self.has_perm_many)(user_obj, perm, objects)
+        perm = self._get_permission_codename(perm)
+        support, user_obj = check_support(user_obj, objects[0])
+        if not support:
+            return [False] * len(objects)
+        await self._aload_metadata()
+        checked_objects_and_perms = await self._aget_objs_and_perms(objects, perm)
+        return await _sync_to_async(self._measure_check_perms)(
+            user_obj, checked_objects_and_perms
+        )
+
+    @classmethod
+    def _measure_check_perms(
+        cls, user_obj: Any, checked_objects_and_perms: List[Tuple[Model, str]]
+    ) -> List[bool]:
+        with measure(PHASE_GUARDIAN_CHECK):
+            return cls._check_perms(user_obj, checked_objects_and_perms)
+
+    @classmethod
+    def _check_perms(
+        cls, user_obj: Any, checked_objects_and_perms: List[Tuple[Model, str]]
+    ) -> List[bool]:
+        snapshot = get_owner_permission_snapshot()
+        results: List[Optional[bool]] = [None] * len(checked_objects_and_perms)
+        if snapshot is not None:
+            for position, (checked_obj, checked_perm) in enumerate(
+                checked_objects_and_perms
+            ):
+                results[position] = cls._check_snapshot_perm(
+                    snapshot, user_obj, checked_perm, checked_obj
+                )
+        checker = ObjectPermissionChecker(user_obj)
+        objects_to_prefetch: Dict[Type[Model], Dict[Any, Model]] = {}
+        for result, (checked_obj, _) in zip(results, checked_objects_and_perms):
+            if result is None:
+                objects_to_prefetch.setdefault(checked_obj.__class__, {})[
+                    checked_obj.pk
+                ] = checked_obj
+        for model_objects in objects_to_prefetch.values():
+            checker.prefetch_perms(list(model_objects.values()))
+        return [
+            checker.has_perm(checked_perm, checked_obj) if result is None else result
+            for result, (checked_obj, checked_perm) in zip(
+                results, checked_objects_and_perms
+            )
+        ]
+
+    def _get_objs_and_perms(
+        self, objects: List[Model], perm: str
+    ) -> List[Tuple[Model, str]]:
+        objs_and_perms: List[Tuple[Model, str]] = [(obj, perm) for obj in objects]
+        for (
+            model_class,
+            positions,
+            security_model_class,
+            owner_perm,
+        ) in self._get_delegations(objects, perm):
+            with measure(PHASE_OWNER_RESOLUTION):
+                owners = self._get_owners(
+                    model_class=model_class,
+                    objects=[objects[position] for position in positions],
+                    security_model_class=security_model_class,
+                )
+            for position, owner in zip(positions, owners):
+                objs_and_perms[position] = (owner, owner_perm)
+        return objs_and_perms
+
+    async def _aget_objs_and_perms(
+        self, objects: List[Model], perm: str
+    ) -> List[Tuple[Model, str]]:
+        objs_and_perms: List[Tuple[Model, str]] = [(obj, perm) for obj in objects]
+        for (
+            model_class,
+            positions,
+            security_model_class,
+            owner_perm,
+        ) in self._get_delegations(objects, perm):
+            with measure_awaits(PHASE_OWNER_RESOLUTION):
+                owners = await self._aget_owners(
+                    model_class=model_class,
+                    objects=[objects[position] for position in positions],
+                    security_model_class=security_model_class,
+                )
+            for position, owner in zip(positions, owners):
+                objs_and_perms[position] = (owner, owner_perm)
+        return objs_and_perms
+
+    def _get_delegations(
+        self, objects: List[Model], perm: str
+    ) -> List[Tuple[Type[Model], List[int], Type[Model], str]]:
+        """
+        Groups objects by model and returns models which permission
+        is delegated to the owner, with positions of their objects,
+        the owner's class and the owner's permission.
+        """
+        objects_by_model: Dict[Type[Model], List[int]] = {}
+        for position, obj in enumerate(objects):
+            objects_by_model.setdefault(obj.__class__, []).append(position)
+        with measure(PHASE_SECURITY_MODEL_RESOLUTION):
+            self._get_security_model_classes()
+        delegations = []
+        for model_class, positions in objects_by_model.items():
+            with measure(PHASE_PATH_LOOKUP):
+                security_model_class = self._get_owner_model_class(model_class)
+            owner_perm = None
+            if security_model_class is not None:
+                with measure(PHASE_CODENAME_TRANSLATION):
+                    owner_perm = self._get_owner_perm(
+                        model_class=model_class,
+                        perm=perm,
+                        security_model_class=security_model_class,
+                    )
+            if security_model_class is None or owner_perm is None:
+                increment(COUNTER_DIRECT, len(positions))
+                continue
+            increment(COUNTER_DELEGATED, len(positions))
+            delegations.append(
+                (model_class, positions, security_model_class, owner_perm)
+            )
+        return delegations
+
+    def _get_obj_and_perm(self, obj: Model, perm: str) -> Tuple[Model, str]:
+        model_class = obj.__class__
+        with measure(PHASE_SECURITY_MODEL_RESOLUTION):
+            self._get_security_model_classes()
+        with measure(PHASE_PATH_LOOKUP):
+            security_model_class = self._get_owner_model_class(model_class)
+        if security_model_class is not None:
+            with measure(PHASE_CODENAME_TRANSLATION):
+                owner_perm = self._get_owner_perm(
+                    model_class=model_class,
+                    perm=perm,
+                    security_model_class=security_model_class,
+                )
+            if owner_perm is not None:
+                with measure(PHASE_OWNER_RESOLUTION):
+                    obj = self._get_owner(
+                        model_class=model_class,
+                        security_model_class=security_model_class,
+                        obj=obj,
+                    )
+                increment(COUNTER_DELEGATED)
+                return obj, owner_perm
+        increment(COUNTER_DIRECT)
         return obj, perm
 
+    async def _aget_obj_and_perm(self, obj: Model, perm: str) -> Tuple[Model, str]:
+        objs_and_perms = await self._aget_objs_and_perms([obj], perm)
+        return objs_and_perms[0]
+
+    @classmethod
+    def _get_owner_perm(
+        cls, model_class: Type[Model], perm: str, security_model_class: Type[Model]
+    ) -> Optional[str]:
+        """
+        Returns owner's permission codename
+        or None when the permission can't be delegated to the owner.
+        """
+        if not cls._find_shortest_accessor(
+            model_class=model_class, security_model_class=security_model_class
+        ):
+            return None
+        codename = perm.split(".", maxsplit=1)[-1]
+        translation = permission_translation_index.translate(
+            model_class=model_class,
+            codename=codename,
+            security_model_class=security_model_class,
+        )
+        if translation is None:
+            return None
+        owner_codename, _ = translation
+        return owner_codename
+
     def _get_owner(
         self, model_class: Type[Model], obj: Model, security_model_class: Type[Model]
     ) -> Model:
+        materialized_owner = self._get_materialized_owner(
+            model_class=model_class, obj=obj, security_model_class=security_model_class
+        )
+        if materialized_owner is not None:
+            return materialized_owner
         shortest = self._find_shortest_accessor(
             model_class=model_class, security_model_class=security_model_class
         )
-        for accessor in shortest:
-            obj = getattr(obj, accessor)
-        return obj
+        if self._get_owner_resolution() == OWNER_RESOLUTION_TRAVERSE:
+            for accessor in shortest:
+                obj = getattr(obj, accessor)
+            return obj
+        return self._get_owners(
+            model_class=model_class,
+            objects=[obj],
+            security_model_class=security_model_class,
+        )[0]
+
+    def _get_owners(
+        self,
+        model_class: Type[Model],
+        objects: List[Model],
+        security_model_class: Type[Model],
+    ) -> List[Model]:
+        if self._get_owner_resolution() == OWNER_RESOLUTION_TRAVERSE:
+            return [
+                self._get_owner(
+                    model_class=model_class,
+                    obj=obj,
+                    security_model_class=security_model_class,
+                )
+                for obj in objects
+            ]
+        owners, not_loaded = self._walk_owners(
+            model_class=model_class,
+            objects=objects,
+            security_model_class=security_model_class,
+        )
+        for (field, remaining_accessors), positions_and_objects in not_loaded.items():
+            owner_pks = self._get_not_loaded_owner_pks(
+                objects=[obj for _, obj in positions_and_objects],
+                field=field,
+                accessors=list(remaining_accessors),
+            )
+            self._set_owners(
+                owners=owners,
+                security_model_class=security_model_class,
+                positions_and_objects=positions_and_objects,
+                owner_pks=owner_pks,
+            )
+        return cast(List[Model], owners)
+
+    async def _aget_owners(
+        self,
+        model_class: Type[Model],
+        objects: List[Model],
+        security_model_class: Type[Model],
+    ) -> List[Model]:
+        if self._get_owner_resolution() == OWNER_RESOLUTION_TRAVERSE:
+            return await _sync_to_async(self._get_owners)(
+                model_class=model_class,
+                objects=objects,
+                security_model_class=security_model_class,
+            )
+        owners, not_loaded = self._walk_owners(
+            model_class=model_class,
+            objects=objects,
+            security_model_class=security_model_class,
+        )
+        for (field, remaining_accessors), positions_and_objects in not_loaded.items():
+            owner_pks = await self._aget_not_loaded_owner_pks(
+                objects=[obj for _, obj in positions_and_objects],
+                field=field,
+                accessors=list(remaining_accessors),
+            )
+            self._set_owners(
+                owners=owners,
+                security_model_class=security_model_class,
+                positions_and_objects=positions_and_objects,
+                owner_pks=owner_pks,
+            )
+        return cast(List[Model], owners)
+
+    def _walk_owners(
+        self,
+        model_class: Type[Model],
+        objects: List[Model],
+        security_model_class: Type[Model],
+    ) -> Tuple[List[Optional[Model]], NOT_LOADED_DICT]:
+        """
+        Returns owners which are already loaded (None for the rest)
+        and objects which relation isn't loaded. These objects are grouped
+        by the rest of the path, so every group is resolved with one query.
+        """
+        shortest = self._find_shortest_accessor(
+            model_class=model_class, security_model_class=security_model_class
+        )
+        owners: List[Optional[Model]] = []
+        not_loaded: NOT_LOADED_DICT = {}
+        for position, obj in enumerate(objects):
+            materialized_owner = self._get_materialized_owner(
+                model_class=model_class,
+                obj=obj,
+                security_model_class=security_model_class,
+            )
+            if materialized_owner is not None:
+                owners.append(materialized_owner)
+                continue
+            last_loaded, field, accessors = self._walk_loaded_relations(obj, shortest)
+            if field is None:
+                owners.append(last_loaded)
+            else:
+                owners.append(None)
+                not_loaded.setdefault((field, tuple(accessors)), []).append(
+                    (position, last_loaded)
+                )
+        return owners, not_loaded
+
+    @classmethod
+    def _get_materialized_owner(
+        cls, model_class: Type[Model], obj: Model, security_model_class: Type[Model]
+    ) -> Optional[Model]:
+        """
+        Returns the owner stored in the model's materialized owner field
+        or None if the model doesn't have one or it isn't filled yet.
+        """
+        field = get_materialized_owner_field(
+            model_class=model_class, security_model_class=security_model_class
+        )
+        if field is None:
+            return None
+        owner_pk = getattr(obj, field.attname)
+        if owner_pk is None:
+            return None
+        return cls._build_owner(
+            security_model_class=security_model_class, owner_pk=owner_pk, obj=obj
+        )
+
+    @classmethod
+    def _set_owners(
+        cls,
+        owners: List[Optional[Model]],
+        security_model_class: Type[Model],
+        positions_and_objects: List[Tuple[int, Model]],
+        owner_pks: List[Any],
+    ) -> None:
+        for (position, obj), owner_pk in zip(positions_and_objects, owner_pks):
+            owners[position] = cls._build_owner(
+                security_model_class=security_model_class,
+                owner_pk=owner_pk,
+                obj=obj,
+            )
+
+    @classmethod
+    def _get_not_loaded_owner_pks(
+        cls, objects: List[Model], field: ForeignKey, accessors: List[str]
+    ) -> List[Any]:
+        """
+        Returns owners' primary keys of objects which relation isn't loaded,
+        using the owner cache when it's enabled.
+        """
+        if not accessors and field.target_field.primary_key:
+            return [getattr(obj, field.attname) for obj in objects]
+        owner_cache = get_owner_cache()
+        if owner_cache is None:
+            cached_owner_pks: Dict[int, Any] = {}
+        else:
+            cached_owner_pks, generations = owner_cache.get_owner_pks(
+                objects=objects,
+                path_models=cls._get_path_models(field=field, accessors=accessors),
+            )
+        not_cached = [
+            obj
+            for position, obj in enumerate(objects)
+            if position not in cached_owner_pks
+        ]
+        if owner_cache is not None:
+            increment(COUNTER_OWNER_CACHE_HITS, len(cached_owner_pks))
+            increment(COUNTER_OWNER_CACHE_MISSES, len(not_cached))
+        owner_pks_by_related_value = {}
+        if not_cached:
+            owner_pks_by_related_value = cls._get_owner_pks(
+                obj=not_cached[0],
+                field=field,
+                accessors=accessors,
+                related_values=[getattr(obj, field.attname) for obj in not_cached],
+            )
+            if owner_cache is not None:
+                owner_cache.set_owner_pks(
+                    objects_and_owner_pks=[
+                        (obj, owner_pks_by_related_value[getattr(obj, field.attname)])
+                        for obj in not_cached
+                        if obj.pk is not None
+                    ],
+                    generations=generations,
+                )
+        return [
+            cached_owner_pks[position]
+            if position in cached_owner_pks
+            else owner_pks_by_related_value[getattr(obj, field.attname)]
+            for position, obj in enumerate(objects)
+        ]
+
+    @classmethod
+    async def _aget_not_loaded_owner_pks(
+        cls, objects: List[Model], field: ForeignKey, accessors: List[str]
+    ) -> List[Any]:
+        if not accessors and field.target_field.primary_key:
+            return [getattr(obj, field.attname) for obj in objects]
+        if get_owner_cache() is not None:
+            # Django's cache has no async API in all supported versions.
+            return await _sync_to_async(cls._get_not_loaded_owner_pks)(
+                objects=objects, field=field, accessors=accessors
+            )
+        owner_pks_by_related_value = await cls._aget_owner_pks(
+            obj=objects[0],
+            field=field,
+            accessors=accessors,
+            related_values=[getattr(obj, field.attname) for obj in objects],
+        )
+        return [
+            owner_pks_by_related_value[getattr(obj, field.attname)] for obj in objects
+        ]
+
+    @classmethod
+    def _get_path_models(
+        cls, field: ForeignKey, accessors: List[str]
+    ) -> List[Type[Model]]:
+        """
+        Returns models which relationships are followed after the field.
+        """
+        path_models = []
+        model_class = field.related_model
+        for accessor in accessors:
+            path_models.append(model_class)
+            model_class = model_class._meta.get_field(accessor).related_model
+        return path_models
+
+    @classmethod
+    def _walk_loaded_relations(
+        cls, obj: Model, accessors: List[str]
+    ) -> Tuple[Model, Optional[ForeignKey], List[str]]:
+        """
+        Follows the path as long as related objects are already loaded.
+        @return: the last loaded object, the first not loaded relation
+        (None if the whole path is loaded) and the rest of the path
+        """
+        for index, accessor in enumerate(accessors, start=1):
+            field = obj._meta.get_field(accessor)
+            if not field.is_cached(obj):
+                return obj, field, accessors[index:]
+            obj = field.get_cached_value(obj)
+        return obj, None, []
+
+    @classmethod
+    def _get_owner_pks(
+        cls,
+        obj: Model,
+        field: ForeignKey,
+        accessors: List[str],
+        related_values: List[Any],
+    ) -> Dict[Any, Any]:
+        if not accessors and field.target_field.primary_key:
+            return {related_value: related_value for related_value in related_values}
+        target_name = field.target_field.attname
+        lookup = LOOKUP_SEP.join(accessors + ["pk"])
+        manager = field.related_model._base_manager.db_manager(hints={"instance": obj})
+        return dict(
+            manager.filter(**{f"{target_name}__in": set(related_values)}).values_list(
+                target_name, lookup
+            )
+        )
+
+    @classmethod
+    async def _aget_owner_pks(
+        cls,
+        obj: Model,
+        field: ForeignKey,
+        accessors: List[str],
+        related_values: List[Any],
+    ) -> Dict[Any, Any]:
+        target_name = field.target_field.attname
+        lookup = LOOKUP_SEP.join(accessors + ["pk"])
+        manager = field.related_model._base_manager.db_manager(hints={"instance": obj})
+        queryset = manager.filter(
+            **{f"{target_name}__in": set(related_values)}
+        ).values_list(target_name, lookup)
+        # The async ORM runs the query on its own thread.
+        add_awaited_queries(1)
+        return {related_value: owner_pk async for related_value, owner_pk in queryset}
+
+    @classmethod
+    def _build_owner(
+        cls, security_model_class: Type[Model], owner_pk: Any, obj: Model
+    ) -> Model:
+        owner = security_model_class(pk=owner_pk)
+        owner._state.adding = False
+        owner._state.db = obj._state.db
+        return owner
+
+    @classmethod
+    def _can_resolve_owners_async(cls) -> bool:
+        """
+        Owners can be resolved without a thread only with the async ORM
+        (Django 4.1+), otherwise the whole check runs in a thread.
+        """
+        return ASYNC_ORM_SUPPORTED
+
+    @classmethod
+    async def _aload_metadata(cls) -> None:
+        """
+        Loads permissions and owners' content types in a thread,
+        unless they are already loaded, so they can be used in async code.
+        """
+        security_model_classes = cls._get_security_model_classes()
+        if permission_translation_index.is_loaded() and all(
+            security_model_cache.has_content_type(security_model_class)
+            for security_model_class in security_model_classes
+        ):
+            return
+        await _sync_to_async(cls._load_metadata)(security_model_classes)
+
+    @classmethod
+    def _load_metadata(cls, security_model_classes: Iterable[Type[Model]]) -> None:
+        if not permission_translation_index.is_loaded():
+            permission_translation_index.load()
+        for security_model_class in security_model_classes:
+            security_model_cache.get_content_type(security_model_class)
 
     @classmethod
     def _get_permission_codename(cls, perm: Union[str, Permission]) -> str:
@@ -66,21 +768,33 @@ class SmartSecurityObjectPermissionBackend(ObjectPermissionBackend):
         return perm
 
     @classmethod
-    def _should_apply_smart_security(cls, owner: Model, owner_perm: str) -> bool:
-        content_type = get_content_type(obj=owner)
-        return Permission.objects.filter(
-            codename=owner_perm, content_type=content_type
-        ).exists()
+    def _get_owner_model_class(cls, model_class: Type[Model]) -> Optional[Type[Model]]:
+        """
+        Returns the nearest owner's class of the model
+        or None if the model is an owner or it has no path to any owner.
+        """
+        owner_and_path = owner_path_registry.get_owner_and_path(
+            model_class=model_class,
+            security_model_classes=cls._get_security_model_classes(),
+        )
+        if owner_and_path is None or owner_and_path[0] == model_class:
+            return None
+        return owner_and_path[0]
 
     @classmethod
     def _find_shortest_accessor(
         cls, model_class: Type[Model], security_model_class: Type[Model]
     ) -> List[str]:
-        finder = ModelOwnerPathFinder()
-        shortest = finder.find_shortest_path_to_owner_model(
-            model_to_search_class=model_class,
-            security_model_class=security_model_class,
+        owner_and_path = owner_path_registry.get_owner_and_path(
+            model_class=model_class,
+            security_model_classes=cls._get_security_model_classes(),
         )
+        if owner_and_path is not None and owner_and_path[0] == security_model_class:
+            shortest: Optional[str] = owner_and_path[1]
+        else:
+            shortest = owner_path_registry.get_path(
+                model_class=model_class, security_model_class=security_model_class
+            )
         if shortest is not None:
             accessors_sequence = shortest.split(".")
         else:
@@ -88,14 +802,30 @@ class SmartSecurityObjectPermissionBackend(ObjectPermissionBackend):
         return accessors_sequence
 
     @classmethod
-    def _get_permission_name_from_model_class(cls, model_class: Type[Model]) -> str:
-        return model_class.__name__.lower()
+    def _get_security_model_class(cls) -> Type[Model]:
+        """
+        Returns the owner's class with the highest priority.
+        """
+        return cls._get_security_model_classes()[0]
 
     @classmethod
-    def _get_security_model_class(cls) -> Type[Model]:
-        smart_security_model_class_name = cls._get_smart_security_model_class_name()
-        security_model_class = cls._get_model_class(smart_security_model_class_name)
-        return security_model_class
+    def _get_security_model_classes(cls) -> Tuple[Type[Model], ...]:
+        security_model_classes = security_model_cache.security_model_classes
+        if security_model_classes is None:
+            if not apps.is_installed("smart_security"):
+                # Receivers of changes are connected when the app is ready.
+                raise SmartSecurityIncorrectConfigException(
+                    "smart_security must be in INSTALLED_APPS, otherwise "
+                    "decisions aren't updated when permissions or paths change!"
+                )
+            security_model_classes = tuple(
+                cls._get_model_class(smart_security_model_class_name)
+                for smart_security_model_class_name in (
+                    cls._get_smart_security_model_class_names()
+                )
+            )
+            security_model_cache.security_model_classes = security_model_classes
+        return security_model_classes
 
     @classmethod
     def _get_model_class(cls, smart_security_model_class_name: str) -> Type[Model]:
@@ -119,7 +849,21 @@ class SmartSecurityObjectPermissionBackend(ObjectPermissionBackend):
         return security_model_class
 
     @classmethod
-    def _get_smart_security_model_class_name(cls) -> str:
+    def _get_owner_resolution(cls) -> str:
+        owner_resolution = getattr(
+            settings,
+            SMART_SECURITY_OWNER_RESOLUTION_SETTING,
+            OWNER_RESOLUTION_QUERY,
+        )
+        if owner_resolution not in (OWNER_RESOLUTION_QUERY, OWNER_RESOLUTION_TRAVERSE):
+            raise SmartSecurityIncorrectConfigException(
+                f"SMART_SECURITY_OWNER_RESOLUTION must be '{OWNER_RESOLUTION_QUERY}' "
+                f"or '{OWNER_RESOLUTION_TRAVERSE}', current is '{owner_resolution}'!"
+            )
+        return owner_resolution
+
+    @classmethod
+    def _get_smart_security_model_class_names(cls) -> List[str]:
         smart_security_model_class_name = getattr(
             settings,
             SMART_SECURITY_MODEL_CLASS_SETTING,
@@ -129,4 +873,11 @@ class SmartSecurityObjectPermissionBackend(ObjectPermissionBackend):
             raise SmartSecurityIncorrectConfigException(
                 "SMART_SECURITY_MODEL_CLASS setting must be different then None!"
             )
-        return smart_security_model_class_name
+        if isinstance(smart_security_model_class_name, str):
+            return [smart_security_model_class_name]
+        smart_security_model_class_names = list(smart_security_model_class_name)
+        if not smart_security_model_class_names:
+            raise SmartSecurityIncorrectConfigException(
+                "SMART_SECURITY_MODEL_CLASS setting must contain at least one model!"
+            )
+        return smart_security_model_class_names
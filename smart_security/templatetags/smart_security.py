@@ -0,0 +1,60 @@
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Type
+
+from django import template
+from django.db.models import Model
+
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+register = template.Library()
+
+
+class ObjectPermissionResults:
+    """
+    Results of permission checking for many objects, read per object
+    in templates with ``allows`` filter or by iterating over pairs
+    of object and result.
+    """
+
+    def __init__(self, objects: List[Model], results: List[bool]) -> None:
+        self._pairs = list(zip(objects, results))
+        self._results: Dict[Tuple[Type[Model], Any], bool] = {
+            (obj.__class__, obj.pk): result for obj, result in self._pairs
+        }
+
+    def allows(self, obj: Model) -> bool:
+        """
+        @return: whether the permission is granted for the object,
+        False for objects which weren't checked
+        """
+        return self._results.get((obj.__class__, obj.pk), False)
+
+    def __iter__(self) -> Iterator[Tuple[Model, bool]]:
+        return iter(self._pairs)
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+
+@register.simple_tag
+def has_perm_many(
+    user: Any, perm: str, objects: Iterable[Model]
+) -> ObjectPermissionResults:
+    """
+    Checks object permission for all objects at once
+    with a constant number of queries, e.g.::
+
+        {% has_perm_many request.user "view_samplemodel" page_obj as can_view %}
+        {% for obj in page_obj %}
+            {% if can_view|allows:obj %}...{% endif %}
+        {% endfor %}
+    """
+    objects = list(objects)
+    backend = SmartSecurityObjectPermissionBackend()
+    return ObjectPermissionResults(
+        objects=objects, results=backend.has_perm_many(user, perm, objects)
+    )
+
+
+@register.filter
+def allows(results: ObjectPermissionResults, obj: Model) -> bool:
+    return results.allows(obj)
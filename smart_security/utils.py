@@ -1,9 +1,29 @@
 from collections import deque
-from typing import Type, Deque, Tuple, Dict, Optional
+from heapq import heappush, heappop
+from typing import (
+    Any,
+    NamedTuple,
+    Type,
+    Deque,
+    Tuple,
+    Dict,
+    Optional,
+    Iterable,
+    List,
+    Sequence,
+    Union,
+)
 
 from django.db.models import Model, Field
 from django.db.models.fields.related import ForeignKey
 
+from smart_security.fields import MaterializedOwnerField
+from smart_security.estimators import PathCostEstimator, HopCountCostEstimator
+
+SECURITY_MODEL_CLASSES = Union[Type[Model], Sequence[Type[Model]]]
+OWNER_PATH = Tuple[Type[Model], str]
+PINNED_PATHS_DICT = Dict[Type[Model], OWNER_PATH]
+
 
 class ModelOwnerPathFinder:
     """
@@ -17,12 +37,13 @@ class ModelOwnerPathFinder:
     def find_shortest_path_to_owner_model(
         cls,
         model_to_search_class: Type[Model],
-        security_model_class: Type[Model],
+        security_model_class: SECURITY_MODEL_CLASSES,
     ) -> Optional[str]:
         """
         A method to investigate the shortest path to owner's class
         @param model_to_search_class: a model to investigate path
-        @param security_model_class: a owner's class
+        @param security_model_class: a owner's class or owners' classes
+        ordered by priority
         @return: a path to the owner's class
         """
 
@@ -32,36 +53,145 @@ class ModelOwnerPathFinder:
         )
         return bfs_search.search()
 
+    @classmethod
+    def find_nearest_owner_model(
+        cls,
+        model_to_search_class: Type[Model],
+        security_model_classes: Sequence[Type[Model]],
+    ) -> Optional[OWNER_PATH]:
+        """
+        A method to investigate the nearest owner's class
+        @param model_to_search_class: a model to investigate path
+        @param security_model_classes: owners' classes ordered by priority
+        @return: the nearest owner's class and a path to it
+        """
+
+        bfs_search = BFSModelSearch(
+            model_to_search_class=model_to_search_class,
+            security_model_class=security_model_classes,
+        )
+        return bfs_search.search_owner()
+
+    @classmethod
+    def find_all_paths_to_owner_model(
+        cls,
+        security_model_class: Type[Model],
+        models_classes: Iterable[Type[Model]],
+    ) -> Dict[Type[Model], Optional[str]]:
+        """
+        A method to investigate the shortest paths to owner's class
+        for many models at once
+        @param security_model_class: a owner's class
+        @param models_classes: all models of the application
+        @return: a mapping from model to the path to the owner's class
+        """
+
+        owners_and_paths = cls.find_all_paths_to_owner_models(
+            security_model_classes=[security_model_class],
+            models_classes=models_classes,
+        )
+        return {
+            model_class: None if owner_and_path is None else owner_and_path[1]
+            for model_class, owner_and_path in owners_and_paths.items()
+        }
+
+    @classmethod
+    def find_all_paths_to_owner_models(
+        cls,
+        security_model_classes: Sequence[Type[Model]],
+        models_classes: Iterable[Type[Model]],
+        cost_estimator: Optional[PathCostEstimator] = None,
+        pinned_paths: Optional[PINNED_PATHS_DICT] = None,
+        ignored_models_classes: Iterable[Type[Model]] = (),
+    ) -> Dict[Type[Model], Optional[OWNER_PATH]]:
+        """
+        A method to investigate the nearest owner's class
+        for many models at once
+        @param security_model_classes: owners' classes ordered by priority
+        @param models_classes: all models of the application
+        @param cost_estimator: an estimator of relationships' costs,
+        by default every relationship costs the same
+        @param pinned_paths: a mapping from model to the owner's class
+        and the path it must use
+        @param ignored_models_classes: models which are never a part of any path
+        @return: a mapping from model to the nearest owner's class and a path to it
+        """
+
+        reverse_dijkstra_search = ReverseDijkstraModelSearch(
+            security_model_classes=security_model_classes,
+            models_classes=models_classes,
+            cost_estimator=cost_estimator,
+            pinned_paths=pinned_paths,
+            ignored_models_classes=ignored_models_classes,
+        )
+        return reverse_dijkstra_search.search()
+
 
 ANCESTORS_DICT = Dict[Type[Model], Tuple[Type[Model], ForeignKey]]
 
 
+def normalize_security_model_classes(
+    security_model_class: SECURITY_MODEL_CLASSES,
+) -> List[Type[Model]]:
+    """
+    Returns owners' classes ordered by priority without duplicates.
+    """
+    if isinstance(security_model_class, type):
+        return [security_model_class]
+    return list(dict.fromkeys(security_model_class))
+
+
 class BFSModelSearch:
     def __init__(
-        self, model_to_search_class: Type[Model], security_model_class: Type[Model]
+        self,
+        model_to_search_class: Type[Model],
+        security_model_class: SECURITY_MODEL_CLASSES,
     ):
         self._model_to_search_class = model_to_search_class
-        self._security_model_class = security_model_class
+        self._security_model_classes = normalize_security_model_classes(
+            security_model_class
+        )
 
     def search(self) -> Optional[str]:
         """
         BFS search to find shortest path to owner model.
         :return: shortest path to owner model or None if it doesn't exist.
         """
+        owner_and_path = self.search_owner()
+        if owner_and_path is None:
+            return None
+        return owner_and_path[1]
+
+    def search_owner(self) -> Optional[OWNER_PATH]:
+        """
+        BFS search to find the nearest owner model.
+        When many owner models are equally near,
+        the first one in order of priority is chosen.
+        :return: the nearest owner model and shortest path to it
+        or None if it doesn't exist.
+        """
         ancestors: ANCESTORS_DICT = {}
 
-        queue_of_models: Deque[Type[Model]] = deque()
-        queue_of_models.append(self._model_to_search_class)
-        while queue_of_models:
-            # An BFS algorithm to find the shortest path to owner's class.
-            current_class = queue_of_models.popleft()
-            if current_class == self._security_model_class:
-                return self._process_ancestors(ancestors)
-            self._process_current_class(
-                ancestors=ancestors,
-                current_class=current_class,
-                queue_of_models=queue_of_models,
-            )
+        current_level = [self._model_to_search_class]
+        while current_level:
+            # An BFS algorithm processing models level by level,
+            # so all owners at the same distance are compared.
+            owners = [
+                model_class
+                for model_class in self._security_model_classes
+                if model_class in current_level
+            ]
+            if owners:
+                owner = owners[0]
+                return owner, self._process_ancestors(ancestors, owner)
+            queue_of_models: Deque[Type[Model]] = deque()
+            for current_class in current_level:
+                self._process_current_class(
+                    ancestors=ancestors,
+                    current_class=current_class,
+                    queue_of_models=queue_of_models,
+                )
+            current_level = list(queue_of_models)
         return None
 
     @classmethod
@@ -74,10 +204,8 @@ class BFSModelSearch:
         meta_data = current_class._meta
         fields_and_many_to_many_relations = meta_data.fields + meta_data.many_to_many
         for field in fields_and_many_to_many_relations:
-            relation_fields = BFSModelSearch._get_supported_relations()
             if (
-                isinstance(field, relation_fields)
-                and not field.null
+                BFSModelSearch._is_supported_relation(field)
                 and field.related_model not in ancestors
             ):
                 next_class = field.related_model
@@ -88,11 +216,202 @@ class BFSModelSearch:
     def _get_supported_relations(cls) -> Tuple[Type[Field], ...]:
         return tuple([ForeignKey])
 
-    def _process_ancestors(self, ancestors: ANCESTORS_DICT) -> str:
+    @classmethod
+    def _is_supported_relation(cls, field: Field) -> bool:
+        # Materialized owners are shortcuts maintained from the path,
+        # so they can't be a part of it.
+        return (
+            isinstance(field, cls._get_supported_relations())
+            and not isinstance(field, MaterializedOwnerField)
+            and not field.null
+        )
+
+    def _process_ancestors(
+        self, ancestors: ANCESTORS_DICT, security_model_class: Type[Model]
+    ) -> str:
         result = ""
-        current_element = self._security_model_class
+        current_element = security_model_class
         field_delimiter = "."
         while current_element != self._model_to_search_class:
             current_element, foreign_key_field = ancestors[current_element]
             result = foreign_key_field.name + field_delimiter + result
         return result[: -len(field_delimiter)]
+
+
+INCOMING_RELATIONS_DICT = Dict[Type[Model], List[Tuple[Type[Model], ForeignKey, int]]]
+
+
+class PathCandidate(NamedTuple):
+    """
+    The cheapest path to an owner through one of model's relationships,
+    or the pinned path of the model.
+    """
+
+    security_model_class: Type[Model]
+    path: str
+    cost: float
+    hops: int
+
+
+class ReverseDijkstraModelSearch:
+    """
+    Dijkstra search started from owners' models which follows relationships
+    backwards. A single traversal finds the nearest owner and the cheapest
+    path to it for all the models of the application.
+    """
+
+    def __init__(
+        self,
+        security_model_classes: Sequence[Type[Model]],
+        models_classes: Iterable[Type[Model]],
+        cost_estimator: Optional[PathCostEstimator] = None,
+        pinned_paths: Optional[PINNED_PATHS_DICT] = None,
+        ignored_models_classes: Iterable[Type[Model]] = (),
+    ):
+        self._security_model_classes = normalize_security_model_classes(
+            security_model_classes
+        )
+        self._models_classes = list(models_classes)
+        if cost_estimator is None:
+            cost_estimator = HopCountCostEstimator()
+        self._cost_estimator = cost_estimator
+        self._pinned_paths = pinned_paths or {}
+        self._ignored_models_classes = set(ignored_models_classes)
+        self._candidates: Dict[Type[Model], List[Tuple[Any, ...]]] = {}
+
+    def search(self) -> Dict[Type[Model], Optional[OWNER_PATH]]:
+        """
+        Reverse Dijkstra search to find the nearest owner models.
+        Ties are broken deterministically by number of hops,
+        owner's priority and finally by order of fields on the path
+        as they're declared, so equally short paths are the ones BFS finds.
+        Pinned models reach their owners only by pinned paths,
+        so models related to them delegate to the same owners,
+        and ignored models are never a part of any path.
+        :return: the nearest owner model and cheapest path to it for every model,
+        None for models without path.
+        """
+        incoming_relations = self._get_incoming_relations()
+        paths: Dict[Type[Model], Optional[OWNER_PATH]] = {}
+        self._candidates = {}
+
+        # Paths are compared by positions of their fields in models,
+        # model's label is unique, so models themselves are never compared.
+        heap: List[
+            Tuple[float, int, int, Tuple[int, ...], str, Tuple[str, ...], Type[Model]]
+        ] = []
+        for priority, security_model_class in enumerate(self._security_model_classes):
+            heappush(
+                heap,
+                (
+                    0.0,
+                    0,
+                    priority,
+                    (),
+                    security_model_class._meta.label,
+                    (),
+                    security_model_class,
+                ),
+            )
+        for model_class, (
+            security_model_class,
+            pinned_path,
+        ) in self._pinned_paths.items():
+            fields = self._get_path_fields(model_class, pinned_path)
+            entry = (
+                sum(self._get_cost(field) for field in fields),
+                len(fields),
+                self._security_model_classes.index(security_model_class),
+                tuple(self._get_position(field) for field in fields),
+                model_class._meta.label,
+                tuple(field.name for field in fields),
+                model_class,
+            )
+            self._candidates.setdefault(model_class, []).append(entry)
+            heappush(heap, entry)
+        while heap:
+            cost, hops, priority, positions, _, path, current_class = heappop(heap)
+            if current_class in paths:
+                continue
+            paths[current_class] = (
+                self._security_model_classes[priority],
+                ".".join(path),
+            )
+            for previous_class, field, position in incoming_relations.get(
+                current_class, []
+            ):
+                if previous_class in self._pinned_paths:
+                    continue
+                entry = (
+                    cost + self._get_cost(field),
+                    hops + 1,
+                    priority,
+                    (position,) + positions,
+                    previous_class._meta.label,
+                    (field.name,) + path,
+                    previous_class,
+                )
+                # Paths through models found later are kept only as candidates.
+                self._candidates.setdefault(previous_class, []).append(entry)
+                if previous_class not in paths:
+                    heappush(heap, entry)
+
+        for model_class in self._models_classes:
+            paths.setdefault(model_class, None)
+        return paths
+
+    def get_candidates(self, model_class: Type[Model]) -> List[PathCandidate]:
+        """
+        Returns paths to owners considered for the model by the last search,
+        one through every relationship leading to an owner.
+        :return: candidates ordered from the chosen one,
+        empty for owners and models without path
+        """
+        return [
+            PathCandidate(
+                security_model_class=self._security_model_classes[priority],
+                path=".".join(path),
+                cost=cost,
+                hops=hops,
+            )
+            for cost, hops, priority, _, _, path, _ in sorted(
+                self._candidates.get(model_class, [])
+            )
+        ]
+
+    def _get_cost(self, field: ForeignKey) -> float:
+        field_cost = self._cost_estimator.get_cost(field)
+        if field_cost <= 0:
+            raise ValueError(
+                f"Cost of {field.model._meta.label}.{field.name} "
+                f"must be positive, current is {field_cost}!"
+            )
+        return field_cost
+
+    @classmethod
+    def _get_position(cls, field: ForeignKey) -> int:
+        meta_data = field.model._meta
+        return (meta_data.fields + meta_data.many_to_many).index(field)
+
+    @classmethod
+    def _get_path_fields(cls, model_class: Type[Model], path: str) -> List[ForeignKey]:
+        fields = []
+        current_class = model_class
+        for accessor in path.split("."):
+            field = current_class._meta.get_field(accessor)
+            fields.append(field)
+            current_class = field.related_model
+        return fields
+
+    def _get_incoming_relations(self) -> INCOMING_RELATIONS_DICT:
+        incoming_relations: INCOMING_RELATIONS_DICT = {}
+        for model_class in self._models_classes:
+            if model_class in self._ignored_models_classes:
+                continue
+            meta_data = model_class._meta
+            for position, field in enumerate(meta_data.fields + meta_data.many_to_many):
+                if BFSModelSearch._is_supported_relation(field):
+                    incoming_relations.setdefault(field.related_model, []).append(
+                        (model_class, field, position)
+                    )
+        return incoming_relations
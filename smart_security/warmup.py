@@ -0,0 +1,76 @@
+from logging import getLogger
+from typing import Optional, Sequence, Type
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, connections
+from django.db.models import Model
+
+from smart_security.fields import get_materialized_owner_field
+from smart_security.registry import permission_translation_index
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+
+logger = getLogger("smart_security")
+
+
+def warm_up(
+    close_connections: bool = False,
+    models_classes: Optional[Sequence[Type[Model]]] = None,
+) -> bool:
+    """
+    Precomputes everything permission checking needs for all installed models,
+    so the first requests of a process don't pay for it: paths to owners,
+    content types and translated permissions. It can be called from
+    AppConfig.ready() or a post-fork hook of the server.
+    Database isn't required, e.g. during migrate, then only paths are computed.
+    Object permissions aren't loaded, as decisions are cached only within requests.
+    @param close_connections: whether to close databases' connections afterwards,
+    so they aren't shared with forked processes
+    @param models_classes: models to warm up, all installed models by default
+    @return: whether the database was available
+    """
+    backend = SmartSecurityObjectPermissionBackend
+    security_model_classes = backend._get_security_model_classes()
+    if models_classes is None:
+        models_classes = apps.get_models(include_auto_created=True)
+    owner_models_classes = []
+    for model_class in models_classes:
+        security_model_class = backend._get_owner_model_class(model_class)
+        if security_model_class is not None:
+            backend._find_shortest_accessor(
+                model_class=model_class, security_model_class=security_model_class
+            )
+            get_materialized_owner_field(
+                model_class=model_class, security_model_class=security_model_class
+            )
+            # Django creates neither content types nor permissions of auto-created models.
+            if not model_class._meta.auto_created:
+                owner_models_classes.append((model_class, security_model_class))
+    try:
+        # Content types of auto-created models aren't stored by Django.
+        ContentType.objects.get_for_models(
+            *(
+                model_class
+                for model_class in models_classes
+                if not model_class._meta.auto_created
+            ),
+            *security_model_classes,
+        )
+        backend._load_metadata(security_model_classes)
+        for model_class, security_model_class in owner_models_classes:
+            for codename in permission_translation_index.get_model_codenames(
+                model_class
+            ):
+                backend._get_owner_perm(
+                    model_class=model_class,
+                    perm=codename,
+                    security_model_class=security_model_class,
+                )
+    except DatabaseError as e:
+        # Tables don't exist yet, e.g. before the first migration.
+        logger.warning("Permissions aren't warmed up, database isn't ready: %s", e)
+        return False
+    finally:
+        if close_connections:
+            connections.close_all()
+    return True
@@ -0,0 +1,210 @@
+"""
+Synthetic model graphs and measurements of permission checking,
+used by the benchmark management command.
+"""
+import random
+import time
+from itertools import count
+from typing import Any, Dict, List, Optional, Type
+
+from django.apps.registry import Apps
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, reset_queries
+from django.db.models import CASCADE, ForeignKey, Model
+from django.test.utils import CaptureQueriesContext, override_settings
+from guardian.models import UserObjectPermission
+
+from smart_security.smart_security import SmartSecurityObjectPermissionBackend
+from smart_security.utils import ModelOwnerPathFinder
+
+GRAPH_SHAPES = ("chain", "fan_in", "diamond", "unreachable", "many_models")
+DEFAULT_SCENARIOS = [
+    ("chain", 1),
+    ("chain", 8),
+    ("fan_in", 32),
+    ("diamond", 4),
+    ("unreachable", 1),
+    ("many_models", 300),
+]
+RANDOM_SEED = 1
+
+_graph_ids = count(1)
+
+
+class SyntheticGraph:
+    """
+    Models generated for a benchmark. Permissions of the start model
+    are delegated to the owner model (unless it's unreachable).
+    """
+
+    def __init__(self, name: str, apps: Optional[Apps] = None) -> None:
+        self.name = name
+        self._apps = apps
+        self._prefix = f"Bench{next(_graph_ids)}"
+        self.models_classes: List[Type[Model]] = []
+        self.owner_class = self.create_model("Owner", {})
+        self.start_class = self.owner_class
+
+    def create_model(
+        self, name: str, relations: Dict[str, Type[Model]], null: bool = False
+    ) -> Type[Model]:
+        meta_attributes: Dict[str, Any] = {"app_label": "test_app"}
+        if self._apps is not None:
+            meta_attributes["apps"] = self._apps
+        attributes: Dict[str, Any] = {
+            "__module__": __name__,
+            "Meta": type("Meta", (), meta_attributes),
+        }
+        for field_name, related_model_class in relations.items():
+            attributes[field_name] = ForeignKey(
+                related_model_class, on_delete=CASCADE, null=null
+            )
+        model_class = type(self._prefix + name, (Model,), attributes)
+        self.models_classes.append(model_class)
+        return model_class
+
+
+def build_graph(shape: str, size: int, apps: Optional[Apps] = None) -> SyntheticGraph:
+    """
+    Generates models of the graph.
+    @param shape: one of GRAPH_SHAPES
+    @param size: depth of chains and diamonds, width of fan-in
+    or number of models
+    @param apps: an app registry of models, by default the global one
+    @return: the graph
+    """
+    graph = SyntheticGraph(name=f"{shape}-{size}", apps=apps)
+    if shape == "chain":
+        for level in range(size):
+            graph.start_class = graph.create_model(
+                f"Chain{level}", {"parent": graph.start_class}
+            )
+    elif shape == "fan_in":
+        brokers = {
+            f"broker_{index:03d}": graph.create_model(
+                f"Broker{index}", {"owner": graph.owner_class}
+            )
+            for index in range(size)
+        }
+        graph.start_class = graph.create_model("Start", brokers)
+    elif shape == "diamond":
+        for level in range(size):
+            left = graph.create_model(f"Left{level}", {"parent": graph.start_class})
+            right = graph.create_model(f"Right{level}", {"parent": graph.start_class})
+            graph.start_class = graph.create_model(
+                f"Join{level}", {"left": left, "right": right}
+            )
+    elif shape == "unreachable":
+        graph.create_model("Nullable", {"owner": graph.owner_class}, null=True)
+        graph.start_class = graph.create_model("Dummy", {})
+    elif shape == "many_models":
+        generator = random.Random(RANDOM_SEED)
+        for index in range(size):
+            graph.start_class = graph.create_model(
+                f"Model{index}",
+                {"parent": generator.choice(graph.models_classes)},
+            )
+    else:
+        raise ValueError(f"Shape must be one of {GRAPH_SHAPES}, current is '{shape}'!")
+    return graph
+
+
+def measure_path_computation(graph: SyntheticGraph, repeats: int) -> float:
+    """
+    @return: the best time in seconds of computing paths for all models
+    of the graph, which is less noisy than average for short timings
+    """
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        ModelOwnerPathFinder.find_all_paths_to_owner_models(
+            security_model_classes=[graph.owner_class],
+            models_classes=graph.models_classes,
+        )
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def measure_permission_checks(
+    graph: SyntheticGraph, checks: int, objects_count: int
+) -> Dict[str, float]:
+    """
+    Creates tables and objects of the graph and checks permissions
+    of the start model. Tables have to be created outside of a transaction.
+    @return: latencies in seconds and numbers of queries per check
+    """
+    with connection.schema_editor() as schema_editor:
+        for model_class in graph.models_classes:
+            schema_editor.create_model(model_class)
+
+    user = User.objects.create(username=f"benchmark-{graph.name}")
+    objects = [_create_object(graph.start_class) for _ in range(objects_count)]
+    owner_perm = _create_view_permission(graph.owner_class)
+    perm = _create_view_permission(graph.start_class)
+    path = ModelOwnerPathFinder.find_shortest_path_to_owner_model(
+        graph.start_class, graph.owner_class
+    )
+    # Permission is granted for every second object.
+    for obj in objects[::2]:
+        if path:
+            owner = obj
+            for accessor in path.split("."):
+                owner = getattr(owner, accessor)
+            UserObjectPermission.objects.assign_perm(owner_perm, user, owner)
+        else:
+            UserObjectPermission.objects.assign_perm(perm, user, obj)
+
+    backend = SmartSecurityObjectPermissionBackend()
+    with override_settings(SMART_SECURITY_MODEL_CLASS=graph.owner_class._meta.label):
+        fresh_objects = list(graph.start_class._base_manager.order_by("pk"))
+        checked_objects = [
+            fresh_objects[index % objects_count] for index in range(checks)
+        ]
+        # Warm up the registry and permissions' index.
+        backend.has_perm(user, perm, fresh_objects[0])
+
+        start = time.perf_counter()
+        for obj in checked_objects:
+            backend.has_perm(user, perm, obj)
+        has_perm_latency = (time.perf_counter() - start) / checks
+        # Queries log has a limit, so it's emptied before counting.
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            for obj in checked_objects:
+                backend.has_perm(user, perm, obj)
+        has_perm_queries = len(queries) / checks
+
+        start = time.perf_counter()
+        backend.has_perm_many(user, perm, fresh_objects)
+        has_perm_many_latency = (time.perf_counter() - start) / objects_count
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            backend.has_perm_many(user, perm, fresh_objects)
+        has_perm_many_queries = len(queries)
+
+    return {
+        "has_perm_latency": has_perm_latency,
+        "has_perm_queries": has_perm_queries,
+        "has_perm_many_latency": has_perm_many_latency,
+        "has_perm_many_queries": has_perm_many_queries,
+    }
+
+
+def _create_object(model_class: Type[Model]) -> Model:
+    related_objects = {
+        field.name: _create_object(field.related_model)
+        for field in model_class._meta.fields
+        if isinstance(field, ForeignKey) and not field.null
+    }
+    return model_class._base_manager.create(**related_objects)
+
+
+def _create_view_permission(model_class: Type[Model]) -> str:
+    codename = f"view_{model_class._meta.model_name}"
+    Permission.objects.get_or_create(
+        codename=codename,
+        content_type=ContentType.objects.get_for_model(model_class),
+        defaults={"name": f"Can view {model_class._meta.verbose_name}"},
+    )
+    return codename
@@ -0,0 +1,138 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+
+from test_app.benchmarks import (
+    DEFAULT_SCENARIOS,
+    GRAPH_SHAPES,
+    build_graph,
+    measure_path_computation,
+    measure_permission_checks,
+)
+
+LATENCY_METRICS = ("path_computation", "has_perm_latency", "has_perm_many_latency")
+QUERIES_METRICS = ("has_perm_queries", "has_perm_many_queries")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures latency and queries of permission checking "
+        "on synthetic model graphs, using a test SQLite database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            metavar="SHAPE:SIZE",
+            help=f"A graph to measure, shape is one of {', '.join(GRAPH_SHAPES)}.",
+        )
+        parser.add_argument("--checks", type=int, default=200)
+        parser.add_argument("--objects", type=int, default=20)
+        parser.add_argument("--repeats", type=int, default=20)
+        parser.add_argument("--output", help="A file to write results as JSON.")
+        parser.add_argument("--baseline", help="A JSON file with previous results.")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.25,
+            help="Allowed relative slowdown compared to the baseline.",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error when results are worse than the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = self._parse_scenarios(options["scenarios"])
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            results = {}
+            for shape, size in scenarios:
+                graph = build_graph(shape, size)
+                result = {
+                    "models": len(graph.models_classes),
+                    "path_computation": measure_path_computation(
+                        graph, repeats=options["repeats"]
+                    ),
+                }
+                result.update(
+                    measure_permission_checks(
+                        graph,
+                        checks=options["checks"],
+                        objects_count=options["objects"],
+                    )
+                )
+                results[graph.name] = result
+        finally:
+            runner.teardown_databases(old_config)
+
+        report = {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "scenarios": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = self._compare(
+                results, baseline["scenarios"], options["max_regression"]
+            )
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} metrics regressed.")
+
+    @classmethod
+    def _parse_scenarios(cls, scenarios):
+        if not scenarios:
+            return DEFAULT_SCENARIOS
+        parsed = []
+        for scenario in scenarios:
+            shape, _, size = scenario.partition(":")
+            if shape not in GRAPH_SHAPES or not size.isdigit():
+                raise CommandError(
+                    f"Scenario must be SHAPE:SIZE, shape is one of "
+                    f"{', '.join(GRAPH_SHAPES)}, current is '{scenario}'!"
+                )
+            parsed.append((shape, int(size)))
+        return parsed
+
+    def _compare(self, results, baseline, max_regression):
+        """
+        Prints metrics compared to the baseline.
+        Number of queries mustn't grow at all, latencies may grow
+        by max_regression as timings are noisy.
+        @return: names of regressed metrics
+        """
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                self.stderr.write(f"{name}: not in the baseline")
+                continue
+            for metric in LATENCY_METRICS + QUERIES_METRICS:
+                current, previous = result[metric], baseline[name][metric]
+                if metric in QUERIES_METRICS:
+                    regressed = current > previous
+                else:
+                    regressed = current > previous * (1 + max_regression)
+                change = (current - previous) / previous if previous else 0.0
+                line = (
+                    f"{name} {metric}: {previous:.6g} -> {current:.6g} ({change:+.1%})"
+                )
+                if regressed:
+                    regressions.append(f"{name} {metric}")
+                    self.stderr.write(f"{line} REGRESSION")
+                else:
+                    self.stderr.write(line)
+        return regressions
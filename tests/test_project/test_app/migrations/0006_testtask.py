@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("test_app", "0005_dummymodel"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TestTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "broker",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="test_app.testbroker",
+                    ),
+                ),
+                (
+                    "other_broker",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="test_app.testotherbroker",
+                    ),
+                ),
+            ],
+        ),
+    ]
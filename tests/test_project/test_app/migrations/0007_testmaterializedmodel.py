@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import smart_security.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("test_app", "0006_testtask"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TestMaterializedModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "owner",
+                    smart_security.fields.MaterializedOwnerField(
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="test_app.testowner",
+                    ),
+                ),
+                (
+                    "test",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="test_app.testanotherstartmodel",
+                    ),
+                ),
+            ],
+        ),
+    ]
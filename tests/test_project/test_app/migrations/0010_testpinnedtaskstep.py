@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("test_app", "0009_testignoredmodel_testpinnedtask"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TestPinnedTaskStep",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="test_app.testpinnedtask",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -6,6 +6,11 @@ from django.db.models import (
     TextField,
 )
 
+from guardian.models import GroupObjectPermissionBase, UserObjectPermissionBase
+
+from smart_security.fields import MaterializedOwnerField
+from smart_security.querysets import SmartSecurityManager
+
 
 class TestOwner(Model):
     name = TextField(primary_key=True)
@@ -33,10 +38,59 @@ class TestOtherBroker(Model):
 class TestStartModel(Model):
     broker = ForeignKey(TestBroker, on_delete=CASCADE)
 
+    objects = SmartSecurityManager()
+
 
 class TestAnotherStartModel(Model):
     test = ForeignKey(TestStartModel, on_delete=CASCADE)
 
+    objects = SmartSecurityManager()
+
+
+class TestTask(Model):
+    broker = ForeignKey(TestBroker, on_delete=CASCADE)
+    other_broker = ForeignKey(TestOtherBroker, on_delete=CASCADE)
+
+
+class TestMaterializedModel(Model):
+    test = ForeignKey(TestAnotherStartModel, on_delete=CASCADE)
+    owner = MaterializedOwnerField(TestOwner, on_delete=CASCADE, null=True)
+
+    objects = SmartSecurityManager()
+
+
+class TestIgnoredModel(Model):
+    broker = ForeignKey(TestBroker, on_delete=CASCADE)
+
+    ignore_smart_security = True
+
+
+class TestPinnedTask(Model):
+    broker = ForeignKey(TestBroker, on_delete=CASCADE)
+    other_broker = ForeignKey(TestOtherBroker, on_delete=CASCADE)
+
+    smart_security_owner_path = "other_broker.another"
+
+
+class TestPinnedTaskStep(Model):
+    task = ForeignKey(TestPinnedTask, on_delete=CASCADE)
+
+
+class TestProject(Model):
+    name = TextField()
+
+
+class TestProjectUserObjectPermission(UserObjectPermissionBase):
+    content_object = ForeignKey(TestProject, on_delete=CASCADE)
+
+
+class TestProjectGroupObjectPermission(GroupObjectPermissionBase):
+    content_object = ForeignKey(TestProject, on_delete=CASCADE)
+
+
+class TestProjectTask(Model):
+    project = ForeignKey(TestProject, on_delete=CASCADE)
+
 
 class DummyModel(Model):
     name = TextField(primary_key=True)
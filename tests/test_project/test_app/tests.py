@@ -1,21 +1,102 @@
-from django.contrib.auth.models import User, Permission
-from django.test import TestCase, override_settings
-from guardian.models import UserObjectPermission
+import asyncio
+import io
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.apps.registry import Apps
+from django.contrib.auth.models import User, Permission, Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.management import call_command, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import options as django_options
+from django.db.models.signals import post_save
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from guardian.models import UserObjectPermission, GroupObjectPermission
 
 from smart_security.smart_security import (
+    ASYNC_ORM_SUPPORTED,
     SmartSecurityObjectPermissionBackend,
     SmartSecurityIncorrectConfigException,
 )
-from smart_security.utils import ModelOwnerPathFinder
+from smart_security.audit import AccessRecord, get_pk_ranges, iter_effective_access
+from smart_security.audit_workers import audit_range, init_worker
+from smart_security.cache import (
+    OwnerPermissionSnapshot,
+    PermissionDecisionCache,
+    get_decision_cache,
+    get_owner_permission_snapshot,
+    owner_permission_snapshot,
+    permission_decision_cache,
+)
+from smart_security.estimators import (
+    FieldWeightCostEstimator,
+    TableSizeCostEstimator,
+)
+from smart_security.explain import SmartSecurityQueryBudgetExceeded, explain_perm
+from smart_security.manifest import (
+    build_manifest,
+    load_configured_manifest,
+    load_manifest,
+)
+from smart_security.metrics import get_metrics_collector
+from smart_security.options import validate_model_options
+from smart_security.middleware import (
+    owner_permission_snapshot_middleware,
+    permission_decision_cache_middleware,
+)
+from smart_security.registry import (
+    OwnerPathRegistry,
+    PermissionTranslationIndex,
+    owner_path_registry,
+    permission_translation_index,
+    security_model_cache,
+)
+from smart_security.shortcuts import (
+    assign_perms,
+    get_objects_for_user,
+    get_perms,
+    remove_perms,
+)
+from smart_security.utils import (
+    ModelOwnerPathFinder,
+    BFSModelSearch,
+    ReverseDijkstraModelSearch,
+)
+from smart_security.warmup import warm_up
+from test_app.benchmarks import SyntheticGraph, build_graph
 from test_app.models import (
     TestStartModel,
     TestOwner,
+    TestIgnoredModel,
+    TestPinnedTask,
+    TestPinnedTaskStep,
+    TestProject,
+    TestProjectGroupObjectPermission,
+    TestProjectTask,
+    TestProjectUserObjectPermission,
     TestAnotherStartModel,
     TestBroker,
     TestOtherBroker,
     DummyModel,
+    TestTask,
+    TestMaterializedModel,
 )
 
+try:
+    from asgiref.sync import async_to_sync
+except ImportError:
+    # asgiref is installed with Django 3.0+.
+    async_to_sync = None
+
 
 class InspectorTests(TestCase):
     def test_simple_inspection(self):
@@ -57,6 +138,540 @@ class InspectorTests(TestCase):
         )
 
 
+class MultipleOwnersInspectorTests(TestCase):
+    def test_nearest_owner(self):
+        x = ModelOwnerPathFinder()
+        self.assertEqual(
+            x.find_nearest_owner_model(TestAnotherStartModel, [TestOwner, TestBroker]),
+            (TestBroker, "test.broker"),
+        )
+        self.assertEqual(
+            x.find_nearest_owner_model(TestOtherBroker, [TestBroker, TestOwner]),
+            (TestOwner, "another"),
+        )
+        self.assertIsNone(
+            x.find_nearest_owner_model(DummyModel, [TestBroker, TestOwner])
+        )
+
+    def test_priority_of_equally_near_owners(self):
+        x = ModelOwnerPathFinder()
+        self.assertEqual(
+            x.find_nearest_owner_model(TestTask, [TestOtherBroker, TestBroker]),
+            (TestOtherBroker, "other_broker"),
+        )
+        self.assertEqual(
+            x.find_nearest_owner_model(TestTask, [TestBroker, TestOtherBroker]),
+            (TestBroker, "broker"),
+        )
+
+    def test_all_paths(self):
+        paths = ModelOwnerPathFinder.find_all_paths_to_owner_models(
+            security_model_classes=[TestOtherBroker, TestBroker],
+            models_classes=[
+                TestOwner,
+                TestBroker,
+                TestOtherBroker,
+                TestStartModel,
+                TestAnotherStartModel,
+                TestTask,
+                DummyModel,
+            ],
+        )
+        self.assertEqual(
+            paths,
+            {
+                TestOwner: None,
+                TestBroker: (TestBroker, ""),
+                TestOtherBroker: (TestOtherBroker, ""),
+                TestStartModel: (TestBroker, "broker"),
+                TestAnotherStartModel: (TestBroker, "test.broker"),
+                TestTask: (TestOtherBroker, "other_broker"),
+                DummyModel: None,
+            },
+        )
+
+
+class OwnerPathRegistryTests(TestCase):
+    def test_paths_match_path_finder(self):
+        registry = OwnerPathRegistry()
+        finder = ModelOwnerPathFinder()
+        for model_class in [
+            TestStartModel,
+            TestAnotherStartModel,
+            TestBroker,
+            TestOtherBroker,
+            DummyModel,
+        ]:
+            self.assertEqual(
+                registry.get_path(model_class, TestOwner),
+                finder.find_shortest_path_to_owner_model(model_class, TestOwner),
+            )
+
+    def test_paths_are_computed_once(self):
+        registry = OwnerPathRegistry()
+        registry.build(TestOwner)
+        with mock.patch.object(BFSModelSearch, "search") as search:
+            self.assertEqual(
+                registry.get_path(TestAnotherStartModel, TestOwner),
+                "test.broker.owner",
+            )
+            self.assertIsNone(registry.get_path(DummyModel, TestOwner))
+        search.assert_not_called()
+
+    def test_other_security_model(self):
+        registry = OwnerPathRegistry()
+        self.assertEqual(
+            registry.get_path(TestAnotherStartModel, TestBroker), "test.broker"
+        )
+        self.assertIsNone(registry.get_path(TestOtherBroker, TestBroker))
+
+
+class ModelOptionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.other_broker = TestOtherBroker.objects.create(another=self.other_owner)
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        self.addCleanup(owner_path_registry.clear)
+        owner_path_registry.clear()
+
+    def test_ignored_model(self):
+        self.assertTrue(TestIgnoredModel.ignore_smart_security)
+        self.assertNotIn("ignore_smart_security", django_options.DEFAULT_NAMES)
+        self.assertIsNone(owner_path_registry.get_path(TestIgnoredModel, TestOwner))
+        ignored = TestIgnoredModel.objects.create(broker=self.broker)
+        permission_translation_index.clear()
+        self.assertFalse(
+            self.backend.has_perm(self.user, "view_testignoredmodel", ignored)
+        )
+        self.assertFalse(permission_translation_index.is_loaded())
+        UserObjectPermission.objects.assign_perm(
+            "view_testignoredmodel", self.user, ignored
+        )
+        self.assertTrue(
+            self.backend.has_perm(self.user, "view_testignoredmodel", ignored)
+        )
+
+    def test_pinned_path(self):
+        self.assertEqual(
+            owner_path_registry.get_path(TestPinnedTask, TestOwner),
+            "other_broker.another",
+        )
+        self.assertEqual(
+            owner_path_registry.get_path(TestTask, TestOwner), "broker.owner"
+        )
+        task = TestPinnedTask.objects.create(
+            broker=self.broker, other_broker=self.other_broker
+        )
+        self.assertFalse(self.backend.has_perm(self.user, "view_testpinnedtask", task))
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.other_owner
+        )
+        self.assertTrue(self.backend.has_perm(self.user, "view_testpinnedtask", task))
+
+    def test_descendant_of_pinned_model(self):
+        self.assertEqual(
+            owner_path_registry.get_path(TestPinnedTaskStep, TestOwner),
+            "task.other_broker.another",
+        )
+        task = TestPinnedTask.objects.create(
+            broker=self.broker, other_broker=self.other_broker
+        )
+        step = TestPinnedTaskStep.objects.create(task=task)
+        self.assertFalse(
+            self.backend.has_perm(self.user, "view_testpinnedtaskstep", step)
+        )
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.other_owner
+        )
+        self.assertTrue(
+            self.backend.has_perm(self.user, "view_testpinnedtaskstep", step)
+        )
+
+    @override_settings(SMART_SECURITY_MODEL_CLASS="test_app.TestBroker")
+    def test_pinned_path_to_not_owner(self):
+        self.assertEqual(
+            owner_path_registry.get_path(TestPinnedTask, TestBroker), "broker"
+        )
+        with self.assertRaises(SmartSecurityIncorrectConfigException):
+            validate_model_options([TestBroker])
+
+    @override_settings(
+        SMART_SECURITY_MODEL_OPTIONS={
+            "test_app.TestTask": {"smart_security_owner_path": "other_broker.another"},
+            "test_app.TestStartModel": {"ignore_smart_security": True},
+        }
+    )
+    def test_options_setting(self):
+        validate_model_options([TestOwner])
+        self.assertEqual(
+            owner_path_registry.get_path(TestTask, TestOwner), "other_broker.another"
+        )
+        self.assertIsNone(owner_path_registry.get_path(TestStartModel, TestOwner))
+        # Ignored models aren't a part of paths of other models.
+        self.assertIsNone(
+            owner_path_registry.get_path(TestAnotherStartModel, TestOwner)
+        )
+
+    def test_validation(self):
+        validate_model_options([TestOwner])
+        for model_options in [
+            {"test_app.Missing": {}},
+            {"test_app.TestTask": {"smart_security_owner_path": "broker.missing"}},
+            {"test_app.TestTask": {"smart_security_owner_path": "broker"}},
+            {"test_app.TestMaterializedModel": {"smart_security_owner_path": "owner"}},
+            {"test_app.TestPinnedTask": {"ignore_smart_security": True}},
+        ]:
+            with override_settings(SMART_SECURITY_MODEL_OPTIONS=model_options):
+                with self.assertRaises(SmartSecurityIncorrectConfigException):
+                    validate_model_options([TestOwner])
+
+
+class PathCostEstimatorTests(TestCase):
+    def test_ties_are_broken_by_priority_of_paths(self):
+        registry = OwnerPathRegistry()
+        self.assertEqual(registry.get_path(TestTask, TestOwner), "broker.owner")
+
+    def test_ties_are_broken_by_order_of_fields(self):
+        graph = SyntheticGraph("ties", apps=Apps())
+        broker_class = graph.create_model("Broker", {"owner": graph.owner_class})
+        other_class = graph.create_model("Other", {"another": graph.owner_class})
+        task_class = graph.create_model(
+            "Task", {"z_broker": broker_class, "a_other": other_class}
+        )
+        child_class = graph.create_model(
+            "Child", {"z_other": other_class, "a_broker": broker_class}
+        )
+        paths = ModelOwnerPathFinder.find_all_paths_to_owner_models(
+            security_model_classes=[graph.owner_class],
+            models_classes=graph.models_classes,
+        )
+        for model_class, path in [
+            (task_class, "z_broker.owner"),
+            (child_class, "z_other.another"),
+        ]:
+            self.assertEqual(paths[model_class], (graph.owner_class, path))
+            self.assertEqual(
+                ModelOwnerPathFinder.find_shortest_path_to_owner_model(
+                    model_class, graph.owner_class
+                ),
+                path,
+            )
+
+    def test_field_weights(self):
+        estimator = FieldWeightCostEstimator({"test_app.TestTask.broker": 5})
+        paths = ModelOwnerPathFinder.find_all_paths_to_owner_models(
+            security_model_classes=[TestOwner],
+            models_classes=apps.get_models(),
+            cost_estimator=estimator,
+        )
+        self.assertEqual(paths[TestTask], (TestOwner, "other_broker.another"))
+        self.assertEqual(paths[TestAnotherStartModel], (TestOwner, "test.broker.owner"))
+
+    @override_settings(
+        SMART_SECURITY_PATH_COST_ESTIMATOR=(
+            "smart_security.estimators.FieldWeightCostEstimator"
+        ),
+        SMART_SECURITY_PATH_WEIGHTS={"test_app.TestTask.broker": 5},
+    )
+    def test_estimator_setting(self):
+        registry = OwnerPathRegistry()
+        self.assertEqual(registry.get_path(TestTask, TestOwner), "other_broker.another")
+
+    def test_cheaper_path_beats_priority(self):
+        estimator = FieldWeightCostEstimator({"test_app.TestTask.other_broker": 0.5})
+        paths = ModelOwnerPathFinder.find_all_paths_to_owner_models(
+            security_model_classes=[TestBroker, TestOtherBroker],
+            models_classes=apps.get_models(),
+            cost_estimator=estimator,
+        )
+        self.assertEqual(paths[TestTask], (TestOtherBroker, "other_broker"))
+
+    def test_costs_must_be_positive(self):
+        estimator = FieldWeightCostEstimator({"test_app.TestBroker.owner": 0})
+        with self.assertRaises(ValueError):
+            ModelOwnerPathFinder.find_all_paths_to_owner_models(
+                security_model_classes=[TestOwner],
+                models_classes=apps.get_models(),
+                cost_estimator=estimator,
+            )
+
+    def test_table_size(self):
+        owner = TestOwner.objects.create(name="owner")
+        TestBroker.objects.bulk_create(TestBroker(owner=owner) for _ in range(99))
+        estimator = TableSizeCostEstimator()
+        self.assertAlmostEqual(
+            estimator.get_cost(TestBroker._meta.get_field("owner")), 1 + math.log10(2)
+        )
+        self.assertAlmostEqual(
+            estimator.get_cost(TestTask._meta.get_field("broker")), 3
+        )
+
+    def test_table_size_from_statistics(self):
+        estimator = TableSizeCostEstimator()
+        queries = {"sqlite": "SELECT 999 WHERE %s = 'test_app_testbroker'"}
+        with mock.patch.object(estimator, "ROWS_ESTIMATE_QUERIES", queries):
+            with self.assertNumQueries(3):
+                cost = estimator.get_cost(TestTask._meta.get_field("broker"))
+        self.assertAlmostEqual(cost, 4)
+
+    def test_table_size_of_missing_table(self):
+        graph = SyntheticGraph("missing", apps=Apps())
+        broker_class = graph.create_model("Broker", {"owner": graph.owner_class})
+        estimator = TableSizeCostEstimator()
+        with transaction.atomic():
+            self.assertEqual(
+                estimator.get_cost(broker_class._meta.get_field("owner")), 1
+            )
+            self.assertFalse(TestBroker.objects.exists())
+
+
+class BenchmarkGraphTests(SimpleTestCase):
+    def setUp(self):
+        self.apps = Apps()
+
+    def get_start_path(self, shape, size):
+        graph = build_graph(shape, size, apps=self.apps)
+        paths = ModelOwnerPathFinder.find_all_paths_to_owner_models(
+            security_model_classes=[graph.owner_class],
+            models_classes=graph.models_classes,
+        )
+        return paths[graph.start_class]
+
+    def test_chain(self):
+        _, path = self.get_start_path("chain", 3)
+        self.assertEqual(path, "parent.parent.parent")
+
+    def test_fan_in(self):
+        _, path = self.get_start_path("fan_in", 3)
+        self.assertEqual(path, "broker_000.owner")
+
+    def test_diamond(self):
+        _, path = self.get_start_path("diamond", 2)
+        self.assertEqual(path, "left.parent.left.parent")
+
+    def test_unreachable(self):
+        self.assertIsNone(self.get_start_path("unreachable", 1))
+
+    def test_many_models(self):
+        graph = build_graph("many_models", 50, apps=self.apps)
+        self.assertEqual(len(graph.models_classes), 51)
+        paths = ModelOwnerPathFinder.find_all_paths_to_owner_models(
+            security_model_classes=[graph.owner_class],
+            models_classes=graph.models_classes,
+        )
+        self.assertNotIn(None, paths.values())
+
+
+class OwnerPathManifestTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "owner_paths.json")
+        call_command("export_owner_paths", self.path, stdout=io.StringIO())
+        self.addCleanup(owner_path_registry.clear)
+        self.addCleanup(permission_translation_index.clear)
+        owner_path_registry.clear()
+        permission_translation_index.clear()
+
+    def test_manifest(self):
+        with open(self.path) as manifest_file:
+            models = json.load(manifest_file)["models"]
+        self.assertEqual(
+            models["test_app.testanotherstartmodel"],
+            {
+                "owner": "test_app.testowner",
+                "path": "test.broker.owner",
+                "permissions": {
+                    "add_testanotherstartmodel": "add_testowner",
+                    "change_testanotherstartmodel": "change_testowner",
+                    "delete_testanotherstartmodel": "delete_testowner",
+                    "view_testanotherstartmodel": "view_testowner",
+                },
+            },
+        )
+        self.assertEqual(
+            models["test_app.testowner"], {"owner": "test_app.testowner", "path": ""}
+        )
+        self.assertIsNone(models["test_app.dummymodel"])
+
+    def test_export_to_stdout(self):
+        out = io.StringIO()
+        call_command("export_owner_paths", stdout=out)
+        with open(self.path) as manifest_file:
+            self.assertEqual(out.getvalue(), manifest_file.read() + "\n")
+        self.assertIn('\n  "models": {\n', out.getvalue())
+
+    def test_manifest_of_auto_created_models(self):
+        through_model_class = User.groups.through
+        manifest = build_manifest([Group])
+        self.assertEqual(
+            manifest["models"][through_model_class._meta.label_lower],
+            {"owner": "auth.group", "path": "group"},
+        )
+        self.assertFalse(
+            ContentType.objects.filter(
+                app_label="auth", model=through_model_class._meta.model_name
+            ).exists()
+        )
+
+    @override_settings(SMART_SECURITY_OWNER_PATH_MANIFEST=None)
+    def test_manifest_is_not_configured(self):
+        self.assertFalse(load_configured_manifest([TestOwner]))
+
+    def test_load_manifest(self):
+        with override_settings(SMART_SECURITY_OWNER_PATH_MANIFEST=self.path):
+            with mock.patch.object(ReverseDijkstraModelSearch, "search") as search:
+                self.assertTrue(load_configured_manifest([TestOwner]))
+        search.assert_not_called()
+        ContentType.objects.get_for_model(TestOwner)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                owner_path_registry.get_path(TestAnotherStartModel, TestOwner),
+                "test.broker.owner",
+            )
+            self.assertIsNone(owner_path_registry.get_path(DummyModel, TestOwner))
+            self.assertEqual(
+                permission_translation_index.translate(
+                    TestBroker, "not_unique_permission", TestOwner
+                )[0],
+                "not_unique_permission",
+            )
+            self.assertIsNone(
+                permission_translation_index.translate(
+                    TestBroker, "unique_permission", TestOwner
+                )
+            )
+
+    def test_stale_manifest(self):
+        with self.assertLogs("smart_security", "WARNING"):
+            self.assertFalse(load_manifest(self.path, [TestBroker]))
+
+    def test_missing_manifest(self):
+        with self.assertLogs("smart_security", "WARNING"):
+            self.assertFalse(load_manifest(self.path + ".missing", [TestOwner]))
+
+
+class PermissionTranslationIndexTests(TestCase):
+    def setUp(self):
+        self.owner_content_type = ContentType.objects.get_for_model(TestOwner)
+
+    def test_translate(self):
+        index = PermissionTranslationIndex()
+        self.assertEqual(
+            index.translate(
+                TestAnotherStartModel, "view_testanotherstartmodel", TestOwner
+            ),
+            ("view_testowner", self.owner_content_type),
+        )
+        self.assertEqual(
+            index.translate(TestBroker, "not_unique_permission", TestOwner),
+            ("not_unique_permission", self.owner_content_type),
+        )
+        self.assertIsNone(index.translate(TestBroker, "unique_permission", TestOwner))
+
+    def test_translation_is_exact(self):
+        self.assertEqual(
+            PermissionTranslationIndex._translate_codename(
+                TestBroker, "view_testbrokerage", TestOwner
+            ),
+            "view_testbrokerage",
+        )
+        self.assertEqual(
+            PermissionTranslationIndex._translate_codename(
+                TestBroker, "testbroker_share", TestOwner
+            ),
+            "testowner_share",
+        )
+
+    def test_permissions_are_loaded_once(self):
+        index = PermissionTranslationIndex()
+        index.translate(TestStartModel, "view_teststartmodel", TestOwner)
+        with self.assertNumQueries(0):
+            index.translate(TestBroker, "view_testbroker", TestOwner)
+            index.translate(TestBroker, "change_testbroker", TestOwner)
+
+    def test_index_is_reset_on_permission_change(self):
+        self.assertIsNone(
+            permission_translation_index.translate(
+                TestBroker, "share_testbroker", TestOwner
+            )
+        )
+        permission = Permission.objects.create(
+            codename="share_testowner", content_type=self.owner_content_type
+        )
+        self.assertEqual(
+            permission_translation_index.translate(
+                TestBroker, "share_testbroker", TestOwner
+            ),
+            ("share_testowner", self.owner_content_type),
+        )
+        permission.delete()
+        self.assertIsNone(
+            permission_translation_index.translate(
+                TestBroker, "share_testbroker", TestOwner
+            )
+        )
+
+
+class WarmUpTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.owner = TestOwner.objects.create(name="owner")
+        self.start_models = [
+            TestStartModel.objects.create(
+                broker=TestBroker.objects.create(owner=self.owner)
+            )
+            for _ in range(2)
+        ]
+        self.backend = SmartSecurityObjectPermissionBackend()
+        permission_translation_index.clear()
+        security_model_cache.clear()
+        ContentType.objects.clear_cache()
+        self.addCleanup(permission_translation_index.clear)
+
+    def test_warm_up(self):
+        with self.assertNumQueries(2):
+            self.assertTrue(warm_up())
+        # Only owner and permissions are queried, like on a warm process.
+        with CaptureQueriesContext(connection) as first_queries:
+            self.backend.has_perm(
+                self.user, "view_teststartmodel", self.start_models[0]
+            )
+        with CaptureQueriesContext(connection) as next_queries:
+            self.backend.has_perm(
+                self.user, "view_teststartmodel", self.start_models[1]
+            )
+        self.assertEqual(len(first_queries), len(next_queries))
+
+    @override_settings(SMART_SECURITY_MODEL_CLASS="auth.Group")
+    def test_auto_created_models(self):
+        through_model_class = User.groups.through
+        self.assertTrue(warm_up(models_classes=[through_model_class]))
+        self.assertEqual(
+            owner_path_registry.get_path(through_model_class, Group), "group"
+        )
+        self.assertFalse(
+            ContentType.objects.filter(
+                app_label="auth", model=through_model_class._meta.model_name
+            ).exists()
+        )
+
+    def test_database_not_ready(self):
+        with mock.patch.object(
+            ContentType.objects,
+            "get_for_models",
+            side_effect=OperationalError("no such table: django_content_type"),
+        ), self.assertLogs("smart_security", "WARNING"):
+            self.assertFalse(warm_up())
+        self.assertFalse(permission_translation_index.is_loaded())
+
+
 class ObjectPermissionBackendTests(TestCase):
     def setUp(self):
         self.user = User.objects.create(username="jack")
@@ -144,6 +759,12 @@ class ObjectPermissionBackendTests(TestCase):
         )
         self._assert_has_perm("not_unique_permission", self.broker)
 
+    def test_has_perm_with_app_label(self):
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        self._assert_has_perm("test_app.view_teststartmodel", self.start_model)
+
     def test_no_path_to_owner(self):
         self._assert_has_no_perm("view_dummymodel", self.dummy_model)
         UserObjectPermission.objects.assign_perm(
@@ -155,6 +776,47 @@ class ObjectPermissionBackendTests(TestCase):
         )
         self._assert_has_perm("view_dummymodel", self.dummy_model)
 
+    def test_security_model_class_is_cached(self):
+        self.backend._get_security_model_class()
+        with mock.patch("smart_security.smart_security.apps.get_model") as get_model:
+            self.assertEqual(self.backend._get_security_model_class(), TestOwner)
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    security_model_cache.get_content_type(TestOwner),
+                    ContentType.objects.get_for_model(TestOwner),
+                )
+        get_model.assert_not_called()
+
+    def test_security_model_class_cache_is_reset_on_settings_change(self):
+        self.assertEqual(self.backend._get_security_model_class(), TestOwner)
+        with override_settings(SMART_SECURITY_MODEL_CLASS="test_app.TestBroker"):
+            self.assertEqual(self.backend._get_security_model_class(), TestBroker)
+            self.assertEqual(
+                security_model_cache.get_content_type(TestBroker),
+                ContentType.objects.get_for_model(TestBroker),
+            )
+        self.assertEqual(self.backend._get_security_model_class(), TestOwner)
+
+    def test_app_must_be_installed(self):
+        broker = TestBroker.objects.create(owner=TestOwner.objects.create(name="x"))
+        security_model_cache.clear()
+        with modify_settings(INSTALLED_APPS={"remove": "smart_security"}):
+            with self.assertRaisesRegex(
+                SmartSecurityIncorrectConfigException, "INSTALLED_APPS"
+            ):
+                self.backend.has_perm(self.user, "test_app.view_testbroker", broker)
+            self.assertEqual(
+                [
+                    error.id
+                    for error in TestMaterializedModel._meta.get_field("owner").check()
+                ],
+                ["smart_security.E001"],
+            )
+        self.assertEqual(TestMaterializedModel._meta.get_field("owner").check(), [])
+        self.assertFalse(
+            self.backend.has_perm(self.user, "test_app.view_testbroker", broker)
+        )
+
     @override_settings(SMART_SECURITY_MODEL_CLASS=None)
     def test_no_smart_security_object_class(self):
         with self.assertRaisesRegex(
@@ -181,6 +843,11 @@ class ObjectPermissionBackendTests(TestCase):
         ):
             self._assert_has_no_perm("view_testbroker", self.broker)
 
+    @override_settings(SMART_SECURITY_MODEL_CLASS="incorrect_config")
+    def test_incorrect_config_is_reported_at_startup(self):
+        with self.assertRaises(SmartSecurityIncorrectConfigException):
+            apps.get_app_config("smart_security").ready()
+
     @override_settings(SMART_SECURITY_MODEL_CLASS="incorrect_config")
     def test_incorrect_smart_security_object_class(self):
         with self.assertRaisesRegex(
@@ -191,6 +858,1575 @@ class ObjectPermissionBackendTests(TestCase):
             self._assert_has_no_perm("view_testbroker", self.broker)
 
 
+class ExplainPermTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.owner = TestOwner.objects.create(name="owner")
+        self.start_model = TestStartModel.objects.create(
+            broker=TestBroker.objects.create(owner=self.owner)
+        )
+        self.dummy_model = DummyModel.objects.create(name="foobar")
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+
+    def get_start_model(self):
+        return TestStartModel.objects.get(pk=self.start_model.pk)
+
+    def test_delegated_permission(self):
+        trace = explain_perm(self.user, "view_teststartmodel", self.get_start_model())
+        self.assertTrue(trace["result"])
+        self.assertTrue(trace["delegated"])
+        self.assertEqual(
+            trace["paths"],
+            [
+                {
+                    "owner": "test_app.TestOwner",
+                    "path": "broker.owner",
+                    "cost": 2.0,
+                    "hops": 2,
+                    "chosen": True,
+                }
+            ],
+        )
+        self.assertEqual(trace["owner_perm"], "view_testowner")
+        self.assertEqual(
+            (trace["checked_model"], trace["checked_pk"]),
+            ("test_app.TestOwner", "owner"),
+        )
+        self.assertEqual(
+            [(step["name"], len(step["queries"])) for step in trace["steps"]],
+            [("owner_query", 1), ("guardian_check", 2)],
+        )
+        self.assertIn("test_app_testbroker", trace["steps"][0]["queries"][0]["sql"])
+        self.assertEqual(trace["queries"], 3)
+        json.dumps(trace)
+
+    def test_alternative_paths(self):
+        task = TestTask.objects.create(
+            broker=self.start_model.broker,
+            other_broker=TestOtherBroker.objects.create(another=self.owner),
+        )
+        estimator_settings = {
+            "SMART_SECURITY_PATH_COST_ESTIMATOR": (
+                "smart_security.estimators.FieldWeightCostEstimator"
+            ),
+            "SMART_SECURITY_PATH_WEIGHTS": {"test_app.TestTask.broker": 5},
+        }
+        self.addCleanup(owner_path_registry.clear)
+        for settings, chosen_path, paths in [
+            (
+                {},
+                "broker.owner",
+                [("broker.owner", 2.0), ("other_broker.another", 2.0)],
+            ),
+            (
+                estimator_settings,
+                "other_broker.another",
+                [("other_broker.another", 2.0), ("broker.owner", 6.0)],
+            ),
+        ]:
+            owner_path_registry.clear()
+            with override_settings(**settings):
+                trace = explain_perm(self.user, "view_testtask", task)
+            self.assertEqual(
+                [(path["path"], path["cost"], path["hops"]) for path in trace["paths"]],
+                [(path, cost, 2) for path, cost in paths],
+            )
+            self.assertEqual(
+                [path["path"] for path in trace["paths"] if path["chosen"]],
+                [chosen_path],
+            )
+
+    @override_settings(SMART_SECURITY_OWNER_RESOLUTION="traverse")
+    def test_traverse(self):
+        trace = explain_perm(self.user, "view_teststartmodel", self.get_start_model())
+        self.assertEqual(
+            [
+                (step["name"], step.get("accessor"), len(step["queries"]))
+                for step in trace["steps"][:2]
+            ],
+            [("traverse", "broker", 1), ("traverse", "owner", 1)],
+        )
+        self.assertTrue(trace["result"])
+
+    def test_not_delegated_permission(self):
+        trace = explain_perm(self.user, "view_dummymodel", self.dummy_model)
+        self.assertFalse(trace["result"])
+        self.assertFalse(trace["delegated"])
+        self.assertEqual(trace["checked_pk"], "foobar")
+        self.assertEqual([step["name"] for step in trace["steps"]], ["guardian_check"])
+        trace = explain_perm(self.user, "share_teststartmodel", self.start_model)
+        self.assertIn("doesn't have a permission", trace["reason"])
+
+    def test_query_budget(self):
+        with self.assertRaises(SmartSecurityQueryBudgetExceeded) as context:
+            explain_perm(
+                self.user, "view_teststartmodel", self.get_start_model(), query_budget=2
+            )
+        self.assertEqual(context.exception.trace["queries"], 3)
+        with override_settings(SMART_SECURITY_QUERY_BUDGET=3):
+            explain_perm(self.user, "view_teststartmodel", self.get_start_model())
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command(
+            "explain_perm",
+            "jack",
+            "view_teststartmodel",
+            "test_app.TestStartModel",
+            str(self.start_model.pk),
+            stdout=stdout,
+        )
+        trace = json.loads(stdout.getvalue())
+        self.assertTrue(trace["result"])
+        self.assertEqual(
+            stdout.getvalue(), json.dumps(trace, indent=2, default=str) + "\n"
+        )
+        with self.assertRaises(CommandError):
+            call_command(
+                "explain_perm",
+                "jack",
+                "view_teststartmodel",
+                "test_app.TestStartModel",
+                str(self.start_model.pk),
+                "--query-budget=1",
+                stdout=io.StringIO(),
+            )
+        with self.assertRaises(CommandError):
+            call_command(
+                "explain_perm",
+                "jill",
+                "view_dummymodel",
+                "test_app.DummyModel",
+                "foobar",
+            )
+
+
+class OwnerResolutionTests(TestCase):
+    def setUp(self):
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.start_model = TestStartModel.objects.create(broker=self.broker)
+        self.another_start_model = TestAnotherStartModel.objects.create(
+            test=self.start_model
+        )
+
+    def _get_owner(self, obj):
+        return self.backend._get_owner(
+            model_class=obj.__class__, obj=obj, security_model_class=TestOwner
+        )
+
+    def test_final_hop_reads_foreign_key_column(self):
+        broker = TestBroker.objects.get(pk=self.broker.pk)
+        with self.assertNumQueries(0):
+            owner = self._get_owner(broker)
+        self.assertEqual(owner, self.owner)
+
+    def test_long_path_costs_one_query(self):
+        another_start_model = TestAnotherStartModel.objects.get(
+            pk=self.another_start_model.pk
+        )
+        with self.assertNumQueries(1):
+            owner = self._get_owner(another_start_model)
+        self.assertEqual(owner, self.owner)
+        self.assertFalse(owner._state.adding)
+
+    def test_loaded_relations_are_reused(self):
+        another_start_model = TestAnotherStartModel.objects.select_related(
+            "test__broker__owner"
+        ).get(pk=self.another_start_model.pk)
+        with self.assertNumQueries(0):
+            owner = self._get_owner(another_start_model)
+        self.assertIs(owner, another_start_model.test.broker.owner)
+
+    @override_settings(SMART_SECURITY_OWNER_RESOLUTION="traverse")
+    def test_traverse_resolution(self):
+        another_start_model = TestAnotherStartModel.objects.get(
+            pk=self.another_start_model.pk
+        )
+        with self.assertNumQueries(3):
+            owner = self._get_owner(another_start_model)
+        self.assertEqual(owner, self.owner)
+
+    @override_settings(SMART_SECURITY_OWNER_RESOLUTION="incorrect")
+    def test_incorrect_owner_resolution(self):
+        with self.assertRaisesRegex(
+            expected_exception=SmartSecurityIncorrectConfigException,
+            expected_regex="SMART_SECURITY_OWNER_RESOLUTION must be 'query' or "
+            "'traverse', current is 'incorrect'!",
+        ):
+            self._get_owner(self.another_start_model)
+
+
+class HasPermManyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        self.start_models = [
+            TestStartModel.objects.create(broker=TestBroker.objects.create(owner=owner))
+            for owner in [self.owner, self.other_owner] * 10
+        ]
+        self.dummy_model = DummyModel.objects.create(name="foobar")
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+
+    def test_has_perm_many(self):
+        start_models = list(TestStartModel.objects.order_by("pk"))
+        self.backend.has_perm_many(self.user, "view_teststartmodel", start_models[:1])
+        with self.assertNumQueries(3):
+            results = self.backend.has_perm_many(
+                self.user, "view_teststartmodel", start_models
+            )
+        self.assertEqual(results, [True, False] * 10)
+        self.assertEqual(
+            results,
+            [
+                self.backend.has_perm(self.user, "view_teststartmodel", start_model)
+                for start_model in start_models
+            ],
+        )
+
+    def test_has_perm_many_mixed_models(self):
+        broker = self.start_models[0].broker
+        results = self.backend.has_perm_many(
+            self.user,
+            "not_unique_permission",
+            [broker, self.owner, self.other_owner, self.dummy_model],
+        )
+        self.assertEqual(results, [False, False, False, False])
+        UserObjectPermission.objects.assign_perm(
+            "not_unique_permission", self.user, self.owner
+        )
+        results = self.backend.has_perm_many(
+            self.user,
+            "not_unique_permission",
+            [broker, self.owner, self.other_owner, self.dummy_model],
+        )
+        self.assertEqual(results, [True, True, False, False])
+
+    def test_has_perm_many_not_delegated(self):
+        UserObjectPermission.objects.assign_perm(
+            "view_dummymodel", self.user, self.dummy_model
+        )
+        self.assertEqual(
+            self.backend.has_perm_many(
+                self.user, "view_dummymodel", [self.dummy_model]
+            ),
+            [True],
+        )
+
+    def test_has_perm_many_inactive_user(self):
+        self.user.is_active = False
+        self.assertEqual(
+            self.backend.has_perm_many(
+                self.user, "view_teststartmodel", self.start_models[:2]
+            ),
+            [False, False],
+        )
+
+    def test_has_perm_many_no_objects(self):
+        self.assertEqual(
+            self.backend.has_perm_many(self.user, "view_teststartmodel", []), []
+        )
+
+
+@skipUnless(async_to_sync, "asgiref isn't installed")
+class AsyncPermissionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        for owner in [self.owner, self.other_owner]:
+            TestStartModel.objects.create(broker=TestBroker.objects.create(owner=owner))
+        self.dummy_model = DummyModel.objects.create(name="foobar")
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+
+    def test_ahas_perm(self):
+        for start_model in TestStartModel.objects.order_by("pk"):
+            self.assertEqual(
+                async_to_sync(self.backend.ahas_perm)(
+                    self.user, "view_teststartmodel", start_model
+                ),
+                self.backend.has_perm(self.user, "view_teststartmodel", start_model),
+            )
+        self.assertFalse(
+            async_to_sync(self.backend.ahas_perm)(
+                self.user, "view_dummymodel", self.dummy_model
+            )
+        )
+
+    def test_ahas_perm_many(self):
+        start_models = list(TestStartModel.objects.order_by("pk"))
+        self.assertEqual(
+            async_to_sync(self.backend.ahas_perm_many)(
+                self.user, "view_teststartmodel", start_models
+            ),
+            [True, False],
+        )
+        self.assertEqual(
+            async_to_sync(self.backend.ahas_perm_many)(
+                self.user, "view_teststartmodel", []
+            ),
+            [],
+        )
+
+    @mock.patch.object(
+        SmartSecurityObjectPermissionBackend,
+        "_can_resolve_owners_async",
+        return_value=True,
+    )
+    def test_loaded_owners_are_resolved_without_queries(self, _):
+        permission_translation_index.clear()
+        start_models = list(
+            TestStartModel.objects.select_related("broker").order_by("pk")
+        )
+        self.assertEqual(
+            async_to_sync(self.backend.ahas_perm_many)(
+                self.user, "view_teststartmodel", start_models
+            ),
+            [True, False],
+        )
+        with mock.patch.object(
+            SmartSecurityObjectPermissionBackend, "_get_owner_pks"
+        ) as get_owner_pks:
+            self.assertTrue(
+                async_to_sync(self.backend.ahas_perm)(
+                    self.user, "view_teststartmodel", start_models[0]
+                )
+            )
+        get_owner_pks.assert_not_called()
+
+    @skipUnless(ASYNC_ORM_SUPPORTED, "Async ORM isn't supported")
+    def test_owners_are_resolved_with_async_orm(self):
+        start_models = list(TestStartModel.objects.order_by("pk"))
+        self.assertEqual(
+            async_to_sync(self.backend.ahas_perm_many)(
+                self.user, "view_teststartmodel", start_models
+            ),
+            [True, False],
+        )
+
+
+class TemplateTagsTests(TestCase):
+    TEMPLATE = Template(
+        "{% load smart_security %}"
+        '{% has_perm_many user "view_teststartmodel" objects as can_view %}'
+        "{% for obj in objects %}{{ can_view|allows:obj|yesno:'1,0' }}{% endfor %}"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        for owner in [self.owner, self.other_owner] * 10:
+            TestStartModel.objects.create(broker=TestBroker.objects.create(owner=owner))
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        # Warm up the permissions' index.
+        SmartSecurityObjectPermissionBackend().has_perm(
+            self.user, "view_teststartmodel", TestStartModel.objects.first()
+        )
+
+    def render(self, objects):
+        return self.TEMPLATE.render(Context({"user": self.user, "objects": objects}))
+
+    def test_has_perm_many(self):
+        objects = list(TestStartModel.objects.order_by("pk"))
+        with self.assertNumQueries(3):
+            self.assertEqual(self.render(objects[:2]), "10")
+        with self.assertNumQueries(3):
+            self.assertEqual(self.render(objects), "10" * 10)
+
+    def test_iterating_results(self):
+        objects = list(TestStartModel.objects.order_by("pk")[:2])
+        template = Template(
+            "{% load smart_security %}"
+            '{% has_perm_many user "view_teststartmodel" objects as can_view %}'
+            "{% for obj, allowed in can_view %}{{ obj.pk }}:{{ allowed }} {% endfor %}"
+        )
+        self.assertEqual(
+            template.render(Context({"user": self.user, "objects": objects})),
+            f"{objects[0].pk}:True {objects[1].pk}:False ",
+        )
+
+
+class GetObjectsForUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        self.start_models = [
+            TestStartModel.objects.create(broker=TestBroker.objects.create(owner=owner))
+            for owner in [self.owner, self.other_owner, self.owner]
+        ]
+        self.dummy_model = DummyModel.objects.create(name="foobar")
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+
+    def test_delegated_permission(self):
+        get_objects_for_user(self.user, "view_teststartmodel", TestStartModel)
+        with self.assertNumQueries(1):
+            objects = list(
+                get_objects_for_user(
+                    self.user,
+                    "view_teststartmodel",
+                    TestStartModel.objects.order_by("pk"),
+                )
+            )
+        self.assertEqual(objects, [self.start_models[0], self.start_models[2]])
+        self.assertEqual(
+            list(
+                get_objects_for_user(
+                    self.user,
+                    "test_app.view_testanotherstartmodel",
+                    TestAnotherStartModel,
+                )
+            ),
+            [],
+        )
+
+    def test_group_permission(self):
+        group = Group.objects.create(name="group")
+        self.user.groups.add(group)
+        GroupObjectPermission.objects.assign_perm(
+            "change_testowner", group, self.other_owner
+        )
+        self.assertEqual(
+            list(
+                get_objects_for_user(self.user, "change_teststartmodel", TestStartModel)
+            ),
+            [self.start_models[1]],
+        )
+
+    def test_not_delegated_permission(self):
+        self.assertEqual(
+            list(get_objects_for_user(self.user, "view_dummymodel", DummyModel)), []
+        )
+        UserObjectPermission.objects.assign_perm(
+            "view_dummymodel", self.user, self.dummy_model
+        )
+        self.assertEqual(
+            list(get_objects_for_user(self.user, "view_dummymodel", DummyModel)),
+            [self.dummy_model],
+        )
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.assertEqual(
+            list(
+                get_objects_for_user(self.user, "view_teststartmodel", TestStartModel)
+            ),
+            [],
+        )
+
+    def test_superuser(self):
+        self.user.is_superuser = True
+        self.assertEqual(
+            get_objects_for_user(
+                self.user, "view_teststartmodel", TestStartModel
+            ).count(),
+            3,
+        )
+
+
+class BulkPermissionsTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=name) for name in ["jack", "jill"]]
+        self.group = Group.objects.create(name="group")
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        self.brokers = [
+            TestBroker.objects.create(owner=owner)
+            for owner in [self.owner, self.other_owner, self.owner]
+        ]
+        self.dummy_model = DummyModel.objects.create(name="foobar")
+        self.backend = SmartSecurityObjectPermissionBackend()
+
+    def test_assign_delegated_permissions(self):
+        assigned = assign_perms(
+            ["view_testbroker", "test_app.change_testbroker"],
+            self.users + [self.group],
+            self.brokers,
+        )
+        # Permissions of three brokers are assigned to their two owners.
+        self.assertEqual(assigned, 2 * 2 * 3)
+        self.assertEqual(
+            set(
+                UserObjectPermission.objects.values_list(
+                    "user__username", "permission__codename", "object_pk"
+                )
+            ),
+            {
+                (username, codename, owner_pk)
+                for username in ["jack", "jill"]
+                for codename in ["view_testowner", "change_testowner"]
+                for owner_pk in ["owner", "other"]
+            },
+        )
+        self.assertEqual(GroupObjectPermission.objects.count(), 4)
+        self.assertTrue(
+            self.backend.has_perm(self.users[1], "change_testbroker", self.brokers[1])
+        )
+
+    def test_assign_existing_permissions(self):
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.users[0], self.owner
+        )
+        assign_perms(["view_testbroker"], self.users, self.brokers)
+        # Permissions are looked up once and every row is inserted separately.
+        with self.assertNumQueries(5):
+            assign_perms(["view_testbroker"], self.users, self.brokers, batch_size=1)
+        self.assertEqual(UserObjectPermission.objects.count(), 4)
+
+    def test_assign_not_delegated_permission(self):
+        assign_perms(["unique_permission"], self.users[:1], self.brokers[:1])
+        assign_perms(["view_dummymodel"], self.users[:1], [self.dummy_model])
+        self.assertEqual(
+            set(
+                UserObjectPermission.objects.values_list(
+                    "permission__codename", "object_pk"
+                )
+            ),
+            {
+                ("unique_permission", str(self.brokers[0].pk)),
+                ("view_dummymodel", "foobar"),
+            },
+        )
+
+    def test_assign_not_existing_permission(self):
+        with self.assertRaises(Permission.DoesNotExist):
+            assign_perms(["fly_testbroker"], self.users, self.brokers)
+        self.assertFalse(UserObjectPermission.objects.exists())
+
+    def test_remove_permissions(self):
+        assign_perms(
+            ["view_testbroker", "change_testbroker"],
+            self.users + [self.group],
+            self.brokers,
+        )
+        removed = remove_perms(
+            ["view_testbroker"], [self.users[0], self.group], self.brokers[:1]
+        )
+        self.assertEqual(removed, 2)
+        self.assertFalse(
+            self.backend.has_perm(self.users[0], "view_testbroker", self.brokers[2])
+        )
+        self.assertTrue(
+            self.backend.has_perm(self.users[0], "view_testbroker", self.brokers[1])
+        )
+        self.assertTrue(
+            self.backend.has_perm(self.users[1], "view_testbroker", self.brokers[0])
+        )
+        self.assertEqual(
+            remove_perms(
+                ["view_testbroker", "change_testbroker"],
+                self.users,
+                self.brokers,
+                batch_size=1,
+            ),
+            7,
+        )
+        self.assertEqual(GroupObjectPermission.objects.count(), 3)
+
+
+class InProcessExecutor:
+    max_workers = ranges = None
+
+    def __init__(self, max_workers, initializer):
+        InProcessExecutor.max_workers = max_workers
+        initializer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def map(self, function, arguments):
+        arguments = list(arguments)
+        InProcessExecutor.ranges = len(arguments)
+        return map(function, arguments)
+
+
+class AuditAccessTests(TestCase):
+    def setUp(self):
+        self.jack = User.objects.create(username="jack")
+        self.jill = User.objects.create(username="jill")
+        User.objects.create(username="inactive", is_active=False)
+        self.group = Group.objects.create(name="group")
+        self.group.user_set.add(self.jill, *User.objects.filter(username="inactive"))
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        self.start_models = [
+            TestStartModel.objects.create(broker=TestBroker.objects.create(owner=owner))
+            for owner in [self.owner, self.other_owner, self.owner]
+        ]
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.jack, self.owner
+        )
+        GroupObjectPermission.objects.assign_perm(
+            "view_testowner", self.group, self.other_owner
+        )
+
+    def test_delegated_permission(self):
+        # The permission, superusers, objects and grants of two chunks,
+        # only the first one has grants of groups.
+        with self.assertNumQueries(3 + 3 + 2):
+            records = list(
+                iter_effective_access(TestStartModel, "view_teststartmodel", 2)
+            )
+        self.assertEqual(
+            records,
+            [
+                AccessRecord(
+                    self.start_models[0].pk, "owner", self.jack.pk, "jack", None
+                ),
+                AccessRecord(
+                    self.start_models[1].pk, "other", self.jill.pk, "jill", "group"
+                ),
+                AccessRecord(
+                    self.start_models[2].pk, "owner", self.jack.pk, "jack", None
+                ),
+            ],
+        )
+        pk_range = (self.start_models[1].pk, self.start_models[1].pk)
+        self.assertEqual(
+            [
+                record.username
+                for record in iter_effective_access(
+                    TestStartModel, "view_teststartmodel", pk_range=pk_range
+                )
+            ],
+            ["jill"],
+        )
+
+    def test_superusers(self):
+        admin = User.objects.create(username="admin", is_superuser=True)
+        User.objects.create(
+            username="inactive_admin", is_superuser=True, is_active=False
+        )
+        # Grants of superusers don't duplicate their records.
+        UserObjectPermission.objects.assign_perm("view_testowner", admin, self.owner)
+        records = list(iter_effective_access(TestStartModel, "view_teststartmodel"))
+        self.assertEqual(
+            [record for record in records if record.username == "admin"],
+            [
+                AccessRecord(start_model.pk, owner_pk, admin.pk, "admin", None, True)
+                for start_model, owner_pk in zip(
+                    self.start_models, ["owner", "other", "owner"]
+                )
+            ],
+        )
+        self.assertEqual(len(records), 6)
+        self.assertEqual(
+            [
+                record.username
+                for record in iter_effective_access(
+                    TestStartModel, "view_teststartmodel", include_superusers=False
+                )
+            ],
+            ["jack", "jill", "jack"],
+        )
+
+    def test_not_delegated_permission(self):
+        broker = self.start_models[0].broker
+        UserObjectPermission.objects.assign_perm("unique_permission", self.jill, broker)
+        self.assertEqual(
+            list(iter_effective_access(TestBroker, "test_app.unique_permission")),
+            [AccessRecord(broker.pk, broker.pk, self.jill.pk, "jill", None)],
+        )
+        self.assertEqual(list(iter_effective_access(DummyModel, "fly_dummymodel")), [])
+
+    def test_get_pk_ranges(self):
+        first_pk = self.start_models[0].pk
+        self.assertEqual(
+            get_pk_ranges(TestStartModel, 2),
+            [(first_pk, first_pk + 1), (first_pk + 2, first_pk + 2)],
+        )
+        self.assertEqual(get_pk_ranges(DummyModel, 2), [])
+        DummyModel.objects.create(name="foobar")
+        with self.assertRaises(ValueError):
+            get_pk_ranges(DummyModel, 2)
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command(
+            "audit_access",
+            "test_app.TestStartModel",
+            "view_teststartmodel",
+            stdout=stdout,
+        )
+        self.assertEqual(
+            stdout.getvalue().splitlines(),
+            [
+                "object_pk,owner_pk,user_pk,username,group,is_superuser",
+                f"{self.start_models[0].pk},owner,{self.jack.pk},jack,,False",
+                f"{self.start_models[1].pk},other,{self.jill.pk},jill,group,False",
+                f"{self.start_models[2].pk},owner,{self.jack.pk},jack,,False",
+            ],
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "access.jsonl")
+            call_command(
+                "audit_access",
+                "test_app.TestStartModel",
+                "view_teststartmodel",
+                "--format=jsonl",
+                f"--output={path}",
+                stderr=io.StringIO(),
+            )
+            with open(path) as output:
+                records = [json.loads(line) for line in output]
+        self.assertEqual(
+            records[1],
+            {
+                "object_pk": self.start_models[1].pk,
+                "owner_pk": "other",
+                "user_pk": self.jill.pk,
+                "username": "jill",
+                "group": "group",
+                "is_superuser": False,
+            },
+        )
+        with self.assertRaises(CommandError):
+            call_command("audit_access", "test_app.Missing", "view_missing")
+
+    def test_command_workers(self):
+        User.objects.create(username="admin", is_superuser=True)
+        for options in [
+            ["--format=csv"],
+            ["--format=jsonl", "--exclude-superusers", "--chunk-size=1"],
+        ]:
+            arguments = [
+                "audit_access",
+                "test_app.TestStartModel",
+                "view_teststartmodel",
+            ]
+            serial_output = io.StringIO()
+            call_command(*arguments, *options, stdout=serial_output)
+            parallel_output = io.StringIO()
+            # The test database isn't shared with other processes,
+            # so workers audit their ranges in this one.
+            with mock.patch(
+                "smart_security.management.commands.audit_access.ProcessPoolExecutor",
+                InProcessExecutor,
+            ):
+                call_command(
+                    *arguments, *options, "--workers=2", stdout=parallel_output
+                )
+            self.assertEqual(parallel_output.getvalue(), serial_output.getvalue())
+            self.assertEqual(InProcessExecutor.max_workers, 2)
+            # Every object is audited in a separate range.
+            self.assertEqual(InProcessExecutor.ranges, 3)
+
+    def test_spawned_workers(self):
+        # Spawned workers import the workers' module in a new interpreter,
+        # which sets Django up. The test database isn't shared with them,
+        # so the worker looks up a missing model without queries.
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        ) as executor:
+            with self.assertRaisesRegex(LookupError, "MissingModel"):
+                executor.submit(
+                    audit_range,
+                    ("test_app.MissingModel", "view", (1, 2), 1, "csv", True),
+                ).result()
+
+
+class GetAllPermissionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.group = Group.objects.create(name="group")
+        self.user.groups.add(self.group)
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.start_model = TestStartModel.objects.create(broker=self.broker)
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        GroupObjectPermission.objects.assign_perm(
+            "change_testowner", self.group, self.owner
+        )
+
+    def test_get_all_permissions(self):
+        start_model = TestStartModel.objects.get(pk=self.start_model.pk)
+        permission_translation_index.get_model_codenames(TestStartModel)
+        with self.assertNumQueries(3):
+            perms = self.backend.get_all_permissions(self.user, start_model)
+        self.assertEqual(perms, {"view_teststartmodel", "change_teststartmodel"})
+        for codename in permission_translation_index.get_model_codenames(
+            TestStartModel
+        ):
+            self.assertEqual(
+                codename in perms,
+                self.backend.has_perm(self.user, codename, start_model),
+            )
+
+    def test_get_all_permissions_not_delegated(self):
+        UserObjectPermission.objects.assign_perm(
+            "unique_permission", self.user, self.broker
+        )
+        UserObjectPermission.objects.assign_perm(
+            "not_unique_permission", self.user, self.broker
+        )
+        self.assertEqual(
+            self.backend.get_all_permissions(self.user, self.broker),
+            {"view_testbroker", "change_testbroker", "unique_permission"},
+        )
+
+    def test_get_group_permissions(self):
+        self.assertEqual(
+            self.backend.get_group_permissions(self.user, self.start_model),
+            {"change_teststartmodel"},
+        )
+
+    def test_user_get_all_permissions(self):
+        self.assertEqual(
+            self.user.get_all_permissions(self.start_model),
+            {"view_teststartmodel", "change_teststartmodel"},
+        )
+
+    def test_get_perms(self):
+        self.assertEqual(
+            set(get_perms(self.user, self.start_model)),
+            {"view_teststartmodel", "change_teststartmodel"},
+        )
+        self.assertEqual(
+            get_perms(self.group, self.start_model), ["change_teststartmodel"]
+        )
+
+    def test_no_object(self):
+        self.assertEqual(self.backend.get_all_permissions(self.user), set())
+
+
+collected_metrics = []
+
+
+def collect_metric(metric):
+    collected_metrics.append(metric)
+
+
+@override_settings(
+    SMART_SECURITY_METRICS_COLLECTOR="smart_security.metrics.InMemoryMetricsCollector"
+)
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.start_model = TestStartModel.objects.create(
+            broker=TestBroker.objects.create(owner=self.owner)
+        )
+        self.dummy_model = DummyModel.objects.create(name="foobar")
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        self.collector = get_metrics_collector()
+        # Warm up the permissions' index.
+        self.backend.has_perm(self.user, "view_teststartmodel", self.start_model)
+        self.collector.reset()
+
+    def test_phases_and_counters(self):
+        start_model = TestStartModel.objects.get(pk=self.start_model.pk)
+        self.assertTrue(
+            self.backend.has_perm(self.user, "view_teststartmodel", start_model)
+        )
+        self.assertFalse(
+            self.backend.has_perm(self.user, "view_dummymodel", self.dummy_model)
+        )
+        stats = self.collector.get_stats()
+        self.assertEqual(
+            set(stats["phases"]),
+            {
+                "security_model_resolution",
+                "path_lookup",
+                "codename_translation",
+                "owner_resolution",
+                "guardian_check",
+            },
+        )
+        self.assertEqual(stats["phases"]["path_lookup"]["calls"], 2)
+        self.assertEqual(stats["phases"]["owner_resolution"]["queries"], 1)
+        self.assertEqual(stats["phases"]["path_lookup"]["queries"], 0)
+        self.assertEqual(stats["counters"], {"delegated": 1, "direct": 1})
+
+    def test_has_perm_many_counters(self):
+        self.backend.has_perm_many(
+            self.user,
+            "view_teststartmodel",
+            [self.start_model, self.start_model, self.dummy_model],
+        )
+        self.assertEqual(
+            self.collector.get_stats()["counters"], {"delegated": 2, "direct": 1}
+        )
+
+    def test_decision_cache_counters(self):
+        with permission_decision_cache():
+            for _ in range(3):
+                self.backend.has_perm(
+                    self.user, "view_teststartmodel", self.start_model
+                )
+        counters = self.collector.get_stats()["counters"]
+        self.assertEqual(counters["decision_cache_hits"], 2)
+        self.assertEqual(counters["decision_cache_misses"], 1)
+
+    def _get_concurrent_checks_phases(self):
+        """
+        Checks permissions of two coroutines concurrently
+        and the same ones synchronously.
+        @return: phases recorded by async and by sync checks
+        """
+        start_models = [
+            TestStartModel.objects.get(pk=self.start_model.pk) for _ in range(4)
+        ]
+
+        async def check_concurrently():
+            return await asyncio.gather(
+                *[
+                    self.backend.ahas_perm_many(
+                        self.user, "view_teststartmodel", [start_model]
+                    )
+                    for start_model in start_models[:2]
+                ]
+            )
+
+        self.assertEqual(async_to_sync(check_concurrently)(), [[True], [True]])
+        async_phases = self.collector.get_stats()["phases"]
+        self.collector.reset()
+        for start_model in start_models[2:]:
+            self.backend.has_perm_many(self.user, "view_teststartmodel", [start_model])
+        return async_phases, self.collector.get_stats()["phases"]
+
+    @skipUnless(async_to_sync, "asgiref isn't installed")
+    @override_settings(SMART_SECURITY_OWNER_RESOLUTION="traverse")
+    @mock.patch.object(
+        SmartSecurityObjectPermissionBackend,
+        "_can_resolve_owners_async",
+        return_value=True,
+    )
+    def test_concurrent_async_checks(self, _):
+        async_phases, sync_phases = self._get_concurrent_checks_phases()
+        for phase in ["owner_resolution", "guardian_check"]:
+            self.assertEqual(async_phases[phase]["calls"], 2)
+            self.assertEqual(
+                async_phases[phase]["queries"], sync_phases[phase]["queries"]
+            )
+        self.assertEqual(async_phases["owner_resolution"]["queries"], 4)
+        self.assertGreater(async_phases["guardian_check"]["queries"], 0)
+
+    @skipUnless(ASYNC_ORM_SUPPORTED, "Async ORM isn't supported")
+    def test_concurrent_async_orm_checks(self):
+        async_phases, sync_phases = self._get_concurrent_checks_phases()
+        for phase in ["owner_resolution", "guardian_check"]:
+            self.assertEqual(
+                async_phases[phase]["queries"], sync_phases[phase]["queries"]
+            )
+        self.assertEqual(async_phases["owner_resolution"]["queries"], 2)
+
+    @override_settings(SMART_SECURITY_METRICS_COLLECTOR="test_app.tests.collect_metric")
+    def test_callback(self):
+        collected_metrics.clear()
+        self.backend.has_perm(self.user, "view_dummymodel", self.dummy_model)
+        self.assertIn({"counter": "direct", "value": 1}, collected_metrics)
+        self.assertIn(
+            "guardian_check", [metric.get("phase") for metric in collected_metrics]
+        )
+
+    @override_settings(SMART_SECURITY_METRICS_COLLECTOR=None)
+    def test_disabled(self):
+        self.assertIsNone(get_metrics_collector())
+
+
+class PermissionDecisionCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.other_broker = TestBroker.objects.create(owner=self.owner)
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+
+    def test_decisions_are_cached_by_owner(self):
+        self.backend.has_perm(self.user, "view_testbroker", self.broker)
+        with permission_decision_cache() as cache:
+            self.assertTrue(
+                self.backend.has_perm(self.user, "view_testbroker", self.broker)
+            )
+            with self.assertNumQueries(0):
+                self.assertTrue(
+                    self.backend.has_perm(
+                        self.user, "view_testbroker", self.other_broker
+                    )
+                )
+                self.assertTrue(
+                    self.backend.has_perm(self.user, "view_testowner", self.owner)
+                )
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertIsNone(get_decision_cache())
+
+    def test_cache_is_bounded(self):
+        cache = PermissionDecisionCache(max_size=2)
+        cache.set((1, 1, "a", "view"), True)
+        cache.set((1, 1, "b", "view"), False)
+        self.assertTrue(cache.get((1, 1, "a", "view")))
+        cache.set((1, 1, "c", "view"), True)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get((1, 1, "b", "view")))
+        self.assertTrue(cache.get((1, 1, "a", "view")))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_middleware(self):
+        caches = []
+
+        def get_response(request):
+            caches.append(get_decision_cache())
+            return "response"
+
+        middleware = permission_decision_cache_middleware(get_response)
+        self.assertEqual(middleware(None), "response")
+        self.assertEqual(middleware(None), "response")
+        self.assertIsInstance(caches[0], PermissionDecisionCache)
+        self.assertIsNot(caches[0], caches[1])
+        self.assertIsNone(get_decision_cache())
+
+    @skipUnless(async_to_sync, "asgiref isn't installed")
+    @override_settings(SMART_SECURITY_DECISION_CACHE_SIZE=10)
+    def test_async_middleware(self):
+        async def get_response(request):
+            return get_decision_cache()
+
+        middleware = permission_decision_cache_middleware(get_response)
+        cache = async_to_sync(middleware)(None)
+        self.assertEqual(cache.max_size, 10)
+        self.assertIsNone(get_decision_cache())
+
+
+class OwnerPermissionSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        group = Group.objects.create(name="group")
+        self.user.groups.add(group)
+        self.brokers = [
+            TestBroker.objects.create(
+                owner=TestOwner.objects.create(name=f"owner{index}")
+            )
+            for index in range(5)
+        ]
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.brokers[0].owner
+        )
+        GroupObjectPermission.objects.assign_perm(
+            "view_testowner", group, self.brokers[1].owner
+        )
+        GroupObjectPermission.objects.assign_perm(
+            "change_testowner", group, self.brokers[2].owner
+        )
+        # Warm up the permissions' index.
+        self.backend.has_perm(self.user, "view_testbroker", self.brokers[0])
+
+    def test_snapshot_is_loaded_once(self):
+        with owner_permission_snapshot() as snapshot:
+            with self.assertNumQueries(1):
+                results = [
+                    self.backend.has_perm(self.user, "view_testbroker", broker)
+                    for broker in self.brokers
+                ]
+                self.assertTrue(
+                    self.backend.has_perm(
+                        self.user, "test_app.change_testowner", self.brokers[2].owner
+                    )
+                )
+        self.assertEqual(results, [True, True, False, False, False])
+        self.assertEqual(snapshot.loads, 1)
+        self.assertIsNone(get_owner_permission_snapshot())
+
+    def test_has_perm_many(self):
+        with owner_permission_snapshot():
+            with self.assertNumQueries(1):
+                results = self.backend.has_perm_many(
+                    self.user, "view_testbroker", self.brokers
+                )
+        self.assertEqual(results, [True, True, False, False, False])
+
+    def test_superuser_and_inactive_user(self):
+        with owner_permission_snapshot():
+            self.user.is_superuser = True
+            self.assertTrue(
+                self.backend.has_perm(self.user, "view_testbroker", self.brokers[4])
+            )
+            self.user.is_active = False
+            self.assertFalse(
+                self.backend.has_perm(self.user, "view_testbroker", self.brokers[0])
+            )
+
+    def test_not_owners_are_checked_by_guardian(self):
+        dummy_model = DummyModel.objects.create(name="foobar")
+        UserObjectPermission.objects.assign_perm(
+            "view_dummymodel", self.user, dummy_model
+        )
+        with owner_permission_snapshot() as snapshot:
+            self.assertTrue(
+                self.backend.has_perm(self.user, "view_dummymodel", dummy_model)
+            )
+        self.assertEqual(snapshot.loads, 0)
+
+    def test_middleware(self):
+        snapshots = []
+
+        def get_response(request):
+            snapshots.append(get_owner_permission_snapshot())
+            return "response"
+
+        middleware = owner_permission_snapshot_middleware(get_response)
+        self.assertEqual(middleware(None), "response")
+        self.assertIsInstance(snapshots[0], OwnerPermissionSnapshot)
+        self.assertIsNone(get_owner_permission_snapshot())
+
+
+@override_settings(SMART_SECURITY_OWNER_CACHE="default")
+class OwnerCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.start_model = TestStartModel.objects.create(broker=self.broker)
+        self.another_start_model = TestAnotherStartModel.objects.create(
+            test=self.start_model
+        )
+
+    def _get_owner(self, obj):
+        obj = obj.__class__.objects.get(pk=obj.pk)
+        return self.backend._get_owner(
+            model_class=obj.__class__, obj=obj, security_model_class=TestOwner
+        )
+
+    def test_owner_is_cached(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self._get_owner(self.another_start_model), self.owner)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get_owner(self.another_start_model), self.owner)
+
+    def test_cache_is_invalidated_when_path_changes(self):
+        self.assertEqual(self._get_owner(self.another_start_model), self.owner)
+        self.assertEqual(self._get_owner(self.start_model), self.owner)
+        self.broker.owner = self.other_owner
+        self.broker.save()
+        self.assertEqual(self._get_owner(self.another_start_model), self.other_owner)
+        self.assertEqual(self._get_owner(self.start_model), self.other_owner)
+
+    def test_cache_is_invalidated_when_object_changes(self):
+        self.assertEqual(self._get_owner(self.another_start_model), self.owner)
+        other_start_model = TestStartModel.objects.create(
+            broker=TestBroker.objects.create(owner=self.other_owner)
+        )
+        self.another_start_model.test = other_start_model
+        self.another_start_model.save()
+        self.assertEqual(self._get_owner(self.another_start_model), self.other_owner)
+
+    def test_cache_is_kept_when_path_is_not_updated(self):
+        self.assertEqual(self._get_owner(self.another_start_model), self.owner)
+        post_save.send(
+            sender=TestBroker,
+            instance=self.broker,
+            created=False,
+            update_fields=frozenset(["name"]),
+        )
+        with self.assertNumQueries(1):
+            self._get_owner(self.another_start_model)
+
+    def test_cache_is_kept_when_path_is_not_changed(self):
+        self.assertEqual(self._get_owner(self.another_start_model), self.owner)
+        self.assertEqual(self._get_owner(self.start_model), self.owner)
+        self.broker.save()
+        self.start_model.save(update_fields=["broker"])
+        with self.assertNumQueries(1):
+            self._get_owner(self.another_start_model)
+        with self.assertNumQueries(1):
+            self._get_owner(self.start_model)
+
+    def test_cache_is_invalidated_on_delete(self):
+        self.assertEqual(self._get_owner(self.another_start_model), self.owner)
+        broker_pk = self.broker.pk
+        self.broker.delete()
+        broker = TestBroker.objects.create(pk=broker_pk, owner=self.other_owner)
+        start_model = TestStartModel.objects.create(
+            pk=self.start_model.pk, broker=broker
+        )
+        another_start_model = TestAnotherStartModel.objects.create(
+            pk=self.another_start_model.pk, test=start_model
+        )
+        self.assertEqual(self._get_owner(another_start_model), self.other_owner)
+
+    @override_settings(SMART_SECURITY_OWNER_CACHE=None)
+    def test_cache_disabled(self):
+        self._get_owner(self.another_start_model)
+        with self.assertNumQueries(2):
+            self._get_owner(self.another_start_model)
+
+
+class MaterializedOwnerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.other_owner = TestOwner.objects.create(name="other")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.start_model = TestStartModel.objects.create(broker=self.broker)
+        self.another_start_model = TestAnotherStartModel.objects.create(
+            test=self.start_model
+        )
+        self.materialized = TestMaterializedModel.objects.create(
+            test=self.another_start_model
+        )
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+
+    def get_owner_pk(self):
+        return TestMaterializedModel.objects.get(pk=self.materialized.pk).owner_id
+
+    def test_owner_is_filled_on_save(self):
+        self.assertEqual(self.materialized.owner_id, "owner")
+        other_start_model = TestStartModel.objects.create(
+            broker=TestBroker.objects.create(owner=self.other_owner)
+        )
+        self.materialized.test = TestAnotherStartModel.objects.create(
+            test=other_start_model
+        )
+        self.materialized.save()
+        self.assertEqual(self.get_owner_pk(), "other")
+
+    def test_path_ignores_materialized_owner(self):
+        self.assertEqual(
+            OwnerPathRegistry().get_path(TestMaterializedModel, TestOwner),
+            "test.test.broker.owner",
+        )
+
+    def test_owner_is_resolved_with_materialized_owner(self):
+        materialized = TestMaterializedModel.objects.get(pk=self.materialized.pk)
+        with mock.patch.object(
+            SmartSecurityObjectPermissionBackend, "_get_owner_pks"
+        ) as get_owner_pks:
+            self.assertTrue(
+                self.backend.has_perm(
+                    self.user, "view_testmaterializedmodel", materialized
+                )
+            )
+        get_owner_pks.assert_not_called()
+
+    def test_not_filled_owner_is_resolved_by_path(self):
+        TestMaterializedModel.objects.update(owner=None)
+        materialized = TestMaterializedModel.objects.get(pk=self.materialized.pk)
+        self.assertTrue(
+            self.backend.has_perm(self.user, "view_testmaterializedmodel", materialized)
+        )
+
+    def test_intermediate_change_is_cascaded(self):
+        self.broker.owner = self.other_owner
+        self.broker.save()
+        self.assertEqual(self.get_owner_pk(), "other")
+        self.start_model.broker = TestBroker.objects.create(owner=self.owner)
+        self.start_model.save(update_fields=["broker"])
+        self.assertEqual(self.get_owner_pk(), "owner")
+
+    def test_not_saved_relations_are_not_cascaded(self):
+        TestMaterializedModel.objects.update(owner=self.other_owner)
+        post_save.send(
+            TestStartModel,
+            instance=self.start_model,
+            created=False,
+            update_fields=frozenset(),
+        )
+        self.assertEqual(self.get_owner_pk(), "other")
+        # Loads the old owner and saves the broker, nothing is cascaded.
+        with self.assertNumQueries(2):
+            self.broker.save()
+        self.assertEqual(self.get_owner_pk(), "other")
+        self.start_model.save(update_fields=["broker"])
+        self.assertEqual(self.get_owner_pk(), "other")
+        self.broker.owner = self.other_owner
+        self.broker.save()
+        self.broker.owner = self.owner
+        self.broker.save()
+        self.assertEqual(self.get_owner_pk(), "owner")
+
+    def test_update_fields_without_owner(self):
+        other_start_model = TestStartModel.objects.create(
+            broker=TestBroker.objects.create(owner=self.other_owner)
+        )
+        self.materialized.test = TestAnotherStartModel.objects.create(
+            test=other_start_model
+        )
+        self.materialized.save(update_fields=["test"])
+        self.assertEqual(self.get_owner_pk(), "other")
+
+    def test_get_objects_for_user(self):
+        other = TestMaterializedModel.objects.create(
+            test=TestAnotherStartModel.objects.create(
+                test=TestStartModel.objects.create(
+                    broker=TestBroker.objects.create(owner=self.other_owner)
+                )
+            )
+        )
+        TestMaterializedModel.objects.filter(pk=other.pk).update(owner=None)
+        self.assertEqual(
+            list(
+                get_objects_for_user(
+                    self.user, "view_testmaterializedmodel", TestMaterializedModel
+                )
+            ),
+            [self.materialized],
+        )
+        TestMaterializedModel.objects.update(owner=None)
+        self.assertEqual(
+            list(
+                get_objects_for_user(
+                    self.user, "view_testmaterializedmodel", TestMaterializedModel
+                )
+            ),
+            [self.materialized],
+        )
+
+    def test_backfill(self):
+        TestMaterializedModel.objects.create(test=self.another_start_model)
+        TestMaterializedModel.objects.update(owner=None)
+        out = io.StringIO()
+        call_command("backfill_owners", "--chunk-size", "1", stdout=out)
+        self.assertIn("2 objects updated", out.getvalue())
+        self.assertEqual(
+            set(TestMaterializedModel.objects.values_list("owner", flat=True)),
+            {"owner"},
+        )
+        out = io.StringIO()
+        call_command(
+            "backfill_owners",
+            "test_app.TestMaterializedModel",
+            "--only-missing",
+            stdout=out,
+        )
+        self.assertIn("0 objects updated", out.getvalue())
+
+    def test_backfill_model_without_materialized_owner(self):
+        with self.assertRaises(CommandError):
+            call_command("backfill_owners", "test_app.TestBroker")
+
+
+class SmartSecurityQuerySetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.start_model = TestStartModel.objects.create(broker=self.broker)
+        for _ in range(3):
+            TestAnotherStartModel.objects.create(test=self.start_model)
+
+    def _assert_owners_without_queries(self, objects):
+        with self.assertNumQueries(0):
+            for obj in objects:
+                owner = self.backend._get_owner(
+                    model_class=obj.__class__, obj=obj, security_model_class=TestOwner
+                )
+                self.assertEqual(owner.pk, self.owner.pk)
+
+    def test_with_owner(self):
+        with self.assertNumQueries(1):
+            objects = list(TestAnotherStartModel.objects.with_owner())
+        self._assert_owners_without_queries(objects)
+        self.assertEqual(objects[0].test.broker.owner.name, "owner")
+
+    def test_with_owner_only_path_columns(self):
+        with self.assertNumQueries(1):
+            objects = list(
+                TestAnotherStartModel.objects.with_owner(only_path_columns=True)
+            )
+        self._assert_owners_without_queries(objects)
+        self.assertEqual(objects[0].test.get_deferred_fields(), set())
+
+    def test_with_owner_one_hop(self):
+        with self.assertNumQueries(1):
+            objects = list(TestStartModel.objects.with_owner(only_path_columns=True))
+        self._assert_owners_without_queries(objects)
+
+    def test_has_perm_with_owner(self):
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        objects = list(TestAnotherStartModel.objects.with_owner())
+        self.backend.has_perm(self.user, "view_testanotherstartmodel", objects[0])
+        with self.assertNumQueries(2):
+            self.assertTrue(
+                self.backend.has_perm(
+                    self.user, "view_testanotherstartmodel", objects[1]
+                )
+            )
+
+
+@override_settings(
+    SMART_SECURITY_MODEL_CLASS=["test_app.TestOwner", "test_app.TestProject"]
+)
+class DirectPermissionModelsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.group = Group.objects.create(name="group")
+        self.member = User.objects.create(username="jill")
+        self.member.groups.add(self.group)
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.projects = [TestProject.objects.create(name=name) for name in "ab"]
+        self.tasks = [
+            TestProjectTask.objects.create(project=project)
+            for project in self.projects + self.projects
+        ]
+        assign_perms(["view_testprojecttask"], [self.user, self.group], self.tasks[:1])
+
+    def test_assign_perms(self):
+        self.assertFalse(UserObjectPermission.objects.exists())
+        self.assertFalse(GroupObjectPermission.objects.exists())
+        self.assertEqual(
+            list(
+                TestProjectUserObjectPermission.objects.values_list(
+                    "user__username", "permission__codename", "content_object"
+                )
+            ),
+            [("jack", "view_testproject", self.projects[0].pk)],
+        )
+        self.assertTrue(
+            self.backend.has_perm(self.member, "view_testprojecttask", self.tasks[2])
+        )
+        self.assertFalse(
+            self.backend.has_perm(self.member, "view_testprojecttask", self.tasks[1])
+        )
+
+    def test_remove_perms(self):
+        self.assertEqual(
+            remove_perms(["view_testprojecttask"], [self.group], self.tasks), 1
+        )
+        self.assertFalse(TestProjectGroupObjectPermission.objects.exists())
+        self.assertEqual(TestProjectUserObjectPermission.objects.count(), 1)
+
+    def test_owner_permission_snapshot(self):
+        with owner_permission_snapshot() as snapshot:
+            self.assertEqual(
+                [
+                    self.backend.has_perm(self.member, "view_testprojecttask", task)
+                    for task in self.tasks
+                ],
+                [True, False, True, False],
+            )
+        self.assertEqual(snapshot.loads, 1)
+
+    def test_get_objects_for_user(self):
+        self.assertEqual(
+            list(
+                get_objects_for_user(
+                    self.user,
+                    "view_testprojecttask",
+                    TestProjectTask.objects.order_by("pk"),
+                )
+            ),
+            [self.tasks[0], self.tasks[2]],
+        )
+
+    def test_audit(self):
+        self.assertEqual(
+            [
+                (record.object_pk, record.username, record.group)
+                for record in iter_effective_access(
+                    TestProjectTask, "view_testprojecttask"
+                )
+            ],
+            [
+                (self.tasks[0].pk, "jack", None),
+                (self.tasks[0].pk, "jill", "group"),
+                (self.tasks[2].pk, "jack", None),
+                (self.tasks[2].pk, "jill", "group"),
+            ],
+        )
+
+
+@override_settings(
+    SMART_SECURITY_MODEL_CLASS=["test_app.TestBroker", "test_app.TestOwner"]
+)
+class MultipleOwnersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="jack")
+        self.backend = SmartSecurityObjectPermissionBackend()
+        self.owner = TestOwner.objects.create(name="owner")
+        self.broker = TestBroker.objects.create(owner=self.owner)
+        self.other_broker = TestOtherBroker.objects.create(another=self.owner)
+        self.start_model = TestStartModel.objects.create(broker=self.broker)
+        self.task = TestTask.objects.create(
+            broker=self.broker, other_broker=self.other_broker
+        )
+
+    def test_nearest_owner_is_used(self):
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        self.assertFalse(
+            self.backend.has_perm(self.user, "view_teststartmodel", self.start_model)
+        )
+        self.assertFalse(
+            self.backend.has_perm(self.user, "view_testbroker", self.broker)
+        )
+        self.assertTrue(
+            self.backend.has_perm(self.user, "view_testotherbroker", self.other_broker)
+        )
+        UserObjectPermission.objects.assign_perm(
+            "view_testbroker", self.user, self.broker
+        )
+        self.assertTrue(
+            self.backend.has_perm(self.user, "view_teststartmodel", self.start_model)
+        )
+        self.assertTrue(self.backend.has_perm(self.user, "view_testtask", self.task))
+
+    def test_bulk_and_queryset(self):
+        UserObjectPermission.objects.assign_perm(
+            "view_testbroker", self.user, self.broker
+        )
+        UserObjectPermission.objects.assign_perm(
+            "view_testowner", self.user, self.owner
+        )
+        self.assertEqual(
+            self.backend.has_perm_many(
+                self.user, "view_testotherbroker", [self.other_broker]
+            ),
+            [True],
+        )
+        self.assertEqual(
+            list(
+                get_objects_for_user(self.user, "view_teststartmodel", TestStartModel)
+            ),
+            [self.start_model],
+        )
+
+    @override_settings(SMART_SECURITY_MODEL_CLASS=[])
+    def test_empty_owners(self):
+        with self.assertRaisesRegex(
+            expected_exception=SmartSecurityIncorrectConfigException,
+            expected_regex="SMART_SECURITY_MODEL_CLASS setting must contain at least one model!",
+        ):
+            self.backend.has_perm(self.user, "view_testbroker", self.broker)
+
+
 class UserTests(TestCase):
     def setUp(self):
         self.user = User.objects.create(username="jack")